@@ -1,18 +1,115 @@
+import os
+import time
 from dash import Dash, html, dcc, Input, Output, State, ctx, no_update
+from dash.exceptions import MissingCallbackContextException
 import dash_bootstrap_components as dbc
 import plotly.express as px
 import plotly.graph_objects as go
 import pandas as pd
 import mysql.connector
+from flask import request, jsonify, abort
 
 # Utility imports
-from utils import mysql_utils, mongodb_utils, neo4j_utils
+from utils import metrics_utils, payload_utils, tracing_utils, memory_utils
+
+# Figures use a compact template and are serialized with orjson when it is installed
+payload_utils.configure()
+
+# With SNAPSHOT_DIR set, the widgets are served from a snapshot written by export_snapshot.py
+# and no database is contacted; snapshot_utils has the same read functions as the
+# database utils modules and rejects every write. Otherwise the citation ranking, publications
+# over time and KRC widgets are routed by routing_utils to whichever database is answering
+# them fastest
+snapshot_dir = os.getenv("SNAPSHOT_DIR")
+if snapshot_dir:
+    from utils import snapshot_utils
+    snapshot_utils.open_snapshot(snapshot_dir)
+    mysql_utils = mongodb_utils = neo4j_utils = routing_utils = leaderboard_utils = collaborator_utils = snapshot_utils
+else:
+    from utils import mysql_utils, mongodb_utils, neo4j_utils, routing_utils, outbox_utils, leaderboard_utils, collaborator_utils, prewarm_utils, replica_utils
+
+
+# Background threads are started by start_background_workers, not on import
+workers_started = False
+
+
+# Function to start the background workers of the dashboard
+def start_background_workers():
+    """
+    Starts the background threads of a serving dashboard process. Importing app (e.g. from
+    benchmark.py) starts none of them; this is called when app.py is run and by wsgi.py.
+    Calling it again in the same process does nothing.
+    """
+
+    global workers_started
+    if snapshot_dir or workers_started:
+        return
+    workers_started = True
+
+    # Propagate edits made in MySQL to MongoDB and Neo4j, the top cited faculty leaderboard
+    # and the collaborator index in the background
+    outbox_utils.start_applier()
+    leaderboard_utils.start_updater()
+    collaborator_utils.start_updater()
+
+    # Precompute the university similarities behind the best fit widget and the keyword
+    # trends behind the keyword trends widget
+    mysql_utils.similarity_index.warm()
+    mysql_utils.trend_index.warm()
+
+    # Replay the most popular widget inputs, so the first users after a restart do not pay
+    # for cold database caches
+    prewarm_utils.start_prewarmer()
 
 
 ## Using Bootstrap for styling
 app = Dash(external_stylesheets = [dbc.themes.BOOTSTRAP])
 
 
+## Latency metrics for every callback, exposed in Prometheus format at /metrics
+metrics_utils.instrument_callbacks(app)
+metrics_utils.register_metrics_endpoint(app.server)
+
+
+## Figures returned by callbacks send their numbers as typed arrays, and responses are
+## compressed with brotli or gzip; payload sizes per callback are in the metrics
+payload_utils.compact_callbacks(app)
+payload_utils.register_compression(app.server)
+
+
+## Traces of sampled callback requests (TRACE_SAMPLE_RATE), with a profile of the requests
+## asked for (PROFILE_RATE, or the X-URI-Profile header from an allowed client)
+tracing_utils.register_tracing(app.server)
+
+
+## Peak and retained memory per callback and query function with MEMORY_PROFILING=1, and
+## the top allocation sites at /debug/memory
+memory_utils.register_memory_endpoint(app.server)
+
+
+## A browser session reads its own edits on every dashboard process, even with MYSQL_REPLICAS
+## set: a cookie holds the time of its last edit (see replica_utils.py)
+if not snapshot_dir:
+    replica_utils.register_write_cookie(app.server)
+
+
+## Top cited faculty as JSON, e.g. /api/leaderboard?keyword=machine%20learning&k=20
+@app.server.route("/api/leaderboard")
+def leaderboard_api():
+    keyword = request.args.get("keyword") or None
+    k = request.args.get("k", 10, type = int)
+    return jsonify(leaderboard_utils.get_top_faculty(keyword, max(1, k)))
+
+
+## Prewarm the widgets again after data has been reloaded, e.g. curl -X POST localhost:8050/api/prewarm
+@app.server.route("/api/prewarm", methods = ["POST"])
+def prewarm_api():
+    if snapshot_dir or not metrics_utils.is_local_request():
+        abort(403)
+    prewarm_utils.invalidate()
+    return jsonify({"status": "scheduled"})
+
+
 ## Defining color palette
 palette = {
     "dark_slate": "#354551", # RGB(53, 69, 81)
@@ -89,6 +186,17 @@ def create_top_left_widget():
             className = "mb-2"
 
         ),
+        dbc.RadioItems(
+            id = "citation-metric-input",
+            options = [
+                {"label": "Total citations", "value": "citations"},
+                {"label": "h-index", "value": "h_index"},
+                {"label": "i10-index", "value": "i10_index"}
+            ],
+            value = "citations",
+            inline = True,
+            className = "mb-2"
+        ),
         dcc.Graph(id='citation-ranking-chart', style={"width": "100%", "height": "400px"}),
     ])
 
@@ -235,6 +343,9 @@ def create_bottom_right_widget():
             ),
             id="publication-dropdown-container"
         ),
+        # Search term and next-page cursor of the faculty and publication pickers
+        dcc.Store(id = "faculty-cursor"),
+        dcc.Store(id = "publication-cursor"),
         html.Div(
             dbc.Button("Add", id="add-publication-btn", color="success", className="me-1"),
             className="mt-2",
@@ -248,6 +359,97 @@ def create_bottom_right_widget():
         html.Div(id="add-pub-status", className="mt-2"),
     ])
 
+# Bottom Right Widget 2
+def create_bottom_right_widget2():
+    return html.Div([
+        dbc.Label("Filter by Keyword (optional):"),
+        dcc.Dropdown(
+            id = "leaderboard-keyword-input",
+            options = [],
+            multi = False,
+            placeholder = "All fields",
+            style = {"color": "#000000"},
+            className = "mb-2"
+        ),
+        dcc.Graph(id = "leaderboard-chart", style = {"width": "100%", "height": "400px"}),
+        # The leaderboard is updated in the background as publications change, so it is
+        # re-read periodically
+        dcc.Interval(id = "leaderboard-refresh", interval = 30 * 1000)
+    ])
+
+# Best Fit Widget
+def create_best_fit_widget():
+    return html.Div([
+        dbc.Label("Find universities similar to:"),
+        dcc.Dropdown(
+            id = "fit-university-input",
+            options = [{"label": univ, "value": univ} for univ in university_options_mysql],
+            multi = False,
+            placeholder = "Select a university",
+            style = {"color": "#000000"},
+            className = "mb-2"
+        ),
+        dbc.Label("...or matching your interests:"),
+        dcc.Dropdown(
+            id = "fit-keyword-input",
+            options = [],
+            multi = True,
+            placeholder = "Type to search or select keywords",
+            style = {"color": "#000000"},
+            className = "mb-2"
+        ),
+        dcc.Graph(id = "fit-chart", style = {"width": "100%", "height": "400px"})
+    ])
+
+# Collaborators Widget
+def create_collaborators_widget():
+    return html.Div([
+        dbc.Label("Select University:"),
+        dcc.Dropdown(
+            id = "collab-university-input",
+            options = [{"label": univ, "value": univ} for univ in university_options_mysql],
+            multi = False,
+            placeholder = "Select a university",
+            style = {"color": "#000000"},
+            className = "mb-2"
+        ),
+        dbc.Label("Select Faculty:"),
+        dcc.Dropdown(
+            id = "collab-faculty-input",
+            options = [],
+            multi = False,
+            placeholder = "Type to search faculty",
+            style = {"color": "#000000"},
+            className = "mb-2"
+        ),
+        dcc.Graph(id = "collab-chart", style = {"width": "100%", "height": "400px"})
+    ])
+
+# Keyword Trends Widget
+def create_trends_widget():
+    return html.Div([
+        dbc.Label("Filter by University (optional):"),
+        dcc.Dropdown(
+            id = "trends-university-input",
+            options = [{"label": univ, "value": univ} for univ in university_options_mysql],
+            multi = False,
+            placeholder = "All universities",
+            style = {"color": "#000000"},
+            className = "mb-2"
+        ),
+        dbc.RadioItems(
+            id = "trends-metric-input",
+            options = [
+                {"label": "Publications", "value": "publications"},
+                {"label": "Citation-weighted score", "value": "citations"}
+            ],
+            value = "publications",
+            inline = True,
+            className = "mb-2"
+        ),
+        dcc.Graph(id = "trends-chart", style = {"width": "100%", "height": "500px"})
+    ])
+
 # Add Publication Modal
 add_pub_modal = dbc.Modal(
     [
@@ -322,6 +524,19 @@ app.layout = [
                     )
                 ]
             ),
+            # Freshness of the precomputed aggregates
+            html.Div(
+                id = "aggregate-freshness",
+                style = {
+                    "color": "#CBD5E1",
+                    "fontSize": "12px",
+                    "textAlign": "right",
+                    "padding": "0 16px",
+                    "marginTop": "-12px",
+                    "marginBottom": "4px"
+                }
+            ),
+            dcc.Interval(id = "freshness-refresh", interval = 60 * 1000),
             # Widget rows
             dbc.Container(
                 fluid = True,
@@ -398,6 +613,42 @@ app.layout = [
                             text_color = "#000000",
                             size = "large"
                         ), width = 6),
+                        dbc.Col(create_widget_card(
+                            title = "Top Cited Faculty Across Universities",
+                            content = create_bottom_right_widget2(),
+                            bg_color = palette["gray"],
+                            text_color = "#000000",
+                            size = "large"
+                        ), width = 6),
+                    ], style = {"flex": "2"}, className = "mb-3"),
+
+                    # Fifth row widgets
+                    dbc.Row([
+                        dbc.Col(create_widget_card(
+                            title = "Find Your Best Fit",
+                            content = create_best_fit_widget(),
+                            bg_color = palette["sky_blue"],
+                            text_color = "#FFFFFF",
+                            size = "large"
+                        ), width = 6),
+                        dbc.Col(create_widget_card(
+                            title = "Find Collaborators at Other Universities",
+                            content = create_collaborators_widget(),
+                            bg_color = palette["sky_blue"],
+                            text_color = "#FFFFFF",
+                            size = "large"
+                        ), width = 6),
+                    ], style = {"flex": "2"}, className = "mb-3"),
+
+                    # Sixth row widgets
+                    dbc.Row([
+                        dbc.Col(create_widget_card(
+                            title = "Rising and Declining Research Topics",
+                            content = create_trends_widget(),
+                            bg_color = palette["blue_gray"],
+                            text_color = "#FFFFFF",
+                            size = "large"
+                        ), width = 12),
                     ], style = {"flex": "2"})
                 ]
             ),
@@ -443,27 +694,92 @@ dbc.Modal(
 
 
 ## Callbacks for interactivity
+# Function to format an age in seconds for display
+def format_age(seconds):
+    if seconds < 120:
+        return f"{seconds:.0f} s"
+    if seconds < 2 * 3600:
+        return f"{seconds / 60:.0f} min"
+    if seconds < 2 * 86400:
+        return f"{seconds / 3600:.0f} h"
+    return f"{seconds / 86400:.0f} days"
+
+
+# Function to mark a chart drawn from a stale result
+def mark_stale(fig, data):
+    """
+    Adds a note to a chart drawn from a result that routing_utils served from its last good
+    results because no database answered in time, and returns the chart.
+    """
+
+    if getattr(data, "stale", False):
+        fig.add_annotation(
+            text = f"Stale: showing results from {format_age(data.age)} ago while the database recovers",
+            xref = "paper", yref = "paper", x = 0, y = 1.08,
+            xanchor = "left", showarrow = False,
+            font = dict(size = 11, color = "#b45309")
+        )
+    return fig
+
+
+# Callback to show how fresh the precomputed aggregates are
+@app.callback(
+    Output("aggregate-freshness", "children"),
+    Input("freshness-refresh", "n_intervals")
+)
+
+def update_aggregate_freshness(_):
+    rows = mysql_utils.get_aggregate_freshness()
+    if not rows:
+        return "Aggregates not precomputed: widgets are computed from the base tables"
+    if rows[0]["mode"] == "snapshot":
+        return f"Snapshot exported {format_age(time.time() - rows[0]['built_at'])} ago"
+
+    oldest = min(rows, key = lambda row: row["built_at"])
+    text = f"Aggregates built {format_age(time.time() - oldest['built_at'])} ago ({oldest['mode']})"
+    behind = [row for row in rows if not row["current"]]
+    if behind:
+        text += f"; {len(behind)} of {len(rows)} behind recent edits and computed from the base tables until the next run"
+    return text
+
+
 # Callback to update the citation ranking chart in top left widget
 @app.callback(
     Output("citation-ranking-chart", "figure"),
-    Input("citation-search-input", "value")
+    Input("citation-search-input", "value"),
+    Input("citation-metric-input", "value")
 )
 
-def update_citation_table(search_value):
+def update_citation_table(search_value, metric):
     if not search_value:
         return []
     try:
-        rows = mysql_utils.get_citation_ranking(search_value)
+        if metric in ("h_index", "i10_index"):
+            rows = mysql_utils.get_impact_ranking(search_value, metric)
+            university = mysql_utils.get_university_impact(search_value)
+        else:
+            rows = routing_utils.get_citation_ranking(search_value)
         if not rows:
             return go.Figure()  # Return empty if no data
     
-        df = pd.DataFrame(rows)
-        # Convert Decimal to int
-        df['totalCitations'] = df['totalCitations'].apply(int)
-    
-        fig = px.pie(df, names='name', values='totalCitations', title='Total Citations by Faculty')
-        fig.update_layout(margin=dict(t=40, b=40, l=40, r=40))
-        return fig
+        with tracing_utils.span("figure"):
+            df = pd.DataFrame(rows)
+            # Convert Decimal to int
+            df['totalCitations'] = df['totalCitations'].apply(int)
+
+            if metric in ("h_index", "i10_index"):
+                label = "h-index" if metric == "h_index" else "i10-index"
+                df['h_index'] = df['h_index'].apply(int)
+                df['i10_index'] = df['i10_index'].apply(int)
+                title = f"{label} by Faculty"
+                if university:
+                    title += f" (university h-index {int(university['h_index'])}, i10-index {int(university['i10_index'])})"
+                fig = px.bar(df, x = 'name', y = metric, hover_data = ['h_index', 'i10_index', 'totalCitations'],
+                             labels = {'name': 'Faculty', metric: label}, title = title)
+            else:
+                fig = px.pie(df, names='name', values='totalCitations', title='Total Citations by Faculty')
+            fig.update_layout(margin=dict(t=40, b=40, l=40, r=40))
+        return mark_stale(fig, rows)
     except Exception as e:
         print("Error fetching citations:", e)
         return []
@@ -497,51 +813,77 @@ def update_line_chart(selected_universities, selected_years):
     if not selected_years:
         return go.Figure()
     
-    # Query MongoDB for data
-    data = mongodb_utils.top_right_query(
-        universities = selected_universities,
-        years = selected_years
-    )
+    # Query whichever database is answering; the last good result is served if none is
+    try:
+        data = routing_utils.top_right_query(
+            universities = selected_universities,
+            years = selected_years
+        )
+    except Exception as e:
+        print("Error fetching publications over time:", e)
+        return go.Figure()
 
     # Return empty figure if no data is returned
     if not data:
         return go.Figure()
     
-    # Create dataframe
-    df = pd.DataFrame(data)
-    df["university"] = df["_id"].apply(lambda x: x["university"])
-    df["year"] = df["_id"].apply(lambda x: x["year"])
-    df = df[["university", "year", "university_publications"]]
-    df = df.sort_values(by = ["university", "year"])
-
-    # Create line chart
-    fig = px.line(
-        df,
-        x = "year",
-        y = "university_publications",
-        color = "university",
-        markers = True,
-        labels = {
-            "year": "Publication Year", 
-            "university_publications": "Number of Publications", 
-            "university": "University/Universities"
-        }
-    )
+    with tracing_utils.span("figure"):
+        # Create dataframe
+        df = pd.DataFrame(data)
+        df["university"] = df["_id"].apply(lambda x: x["university"])
+        df["year"] = df["_id"].apply(lambda x: x["year"])
+        df = df[["university", "year", "university_publications"]]
+        df = df.sort_values(by = ["university", "year"])
 
-    fig.update_layout(
-        plot_bgcolor = "white",
-        margin = dict(l = 40, r = 20, t = 40, b = 40),
-        autosize = True,
-        legend = dict(
-            font = dict(size = 10),
-            x = 1.02,
-            y = 1,
-            xanchor = "left"
+        # Create line chart
+        fig = px.line(
+            df,
+            x = "year",
+            y = "university_publications",
+            color = "university",
+            markers = True,
+            labels = {
+                "year": "Publication Year", 
+                "university_publications": "Number of Publications", 
+                "university": "University/Universities"
+            }
         )
-    )
 
-    return fig
+        fig.update_layout(
+            plot_bgcolor = "white",
+            margin = dict(l = 40, r = 20, t = 40, b = 40),
+            autosize = True,
+            legend = dict(
+                font = dict(size = 10),
+                x = 1.02,
+                y = 1,
+                xanchor = "left"
+            )
+        )
+
+    return mark_stale(fig, data)
+
+
+def keyword_option(keyword, search_value = None):
+    """
+    Returns a keyword dropdown option. The dropdown filters options by the typed text, so
+    typo-tolerant suggestions that do not contain it carry it as their search text.
+    """
 
+    option = {"label": keyword, "value": keyword}
+    if search_value and search_value.lower() not in keyword.lower():
+        option["search"] = search_value
+    return option
+
+def keyword_search_options(search_value, selected):
+    """
+    Returns the options of a keyword dropdown: the selected keywords followed by the
+    suggestions for the typed text, or by all keywords if nothing is typed.
+    """
+
+    selected = selected if isinstance(selected, list) else [selected] if selected else []
+    keywords = mysql_utils.search_keywords_by_prefix(search_value) if search_value else mysql_utils.get_all_keywords()
+    return [keyword_option(keyword, search_value) for keyword in dict.fromkeys(selected + keywords)]
 
 # Callback to update keyword search options in middle left and right widgets
 @app.callback(
@@ -574,8 +916,8 @@ def update_keyword_dropdown(search_value1, search_value2, selected_1, selected_2
         merged_1 = list(dict.fromkeys(selected_1 + matches))
         merged_2 = list(dict.fromkeys(selected_2 + matches))
 
-    dropdown_options_1 = [{"label": kw, "value": kw} for kw in merged_1]
-    dropdown_options_2 = [{"label": kw, "value": kw} for kw in merged_2]
+    dropdown_options_1 = [keyword_option(kw, search_value) for kw in merged_1]
+    dropdown_options_2 = [keyword_option(kw, search_value) for kw in merged_2]
 
     # Decide the default value for krc-keyword-input dropdown:
     # If the current selected value is None or not in the options, set it to the first option
@@ -620,28 +962,29 @@ def update_bar_chart(selected_keywords):
     if not data:
         return go.Figure()
     
-    # Create dataframe
-    df = pd.DataFrame(data, columns = ["university_name", "total_keyword_score"])
-
-    # Create bar chart
-    fig = px.bar(
-        df,
-        x = "university_name",
-        y = "total_keyword_score",
-        color = "university_name",
-        labels = {
-            "university_name": "University",
-            "total_keyword_score": "Total Keyword Score"
-        }
-    )
+    with tracing_utils.span("figure"):
+        # Create dataframe
+        df = pd.DataFrame(data, columns = ["university_name", "total_keyword_score"])
 
-    fig.update_layout(
-        plot_bgcolor = "white",
-        margin = dict(l = 40, r = 20, t = 40, b = 40),
-        autosize = True,
-        xaxis_tickangle = 45,
-        showlegend = False
-    )
+        # Create bar chart
+        fig = px.bar(
+            df,
+            x = "university_name",
+            y = "total_keyword_score",
+            color = "university_name",
+            labels = {
+                "university_name": "University",
+                "total_keyword_score": "Total Keyword Score"
+            }
+        )
+
+        fig.update_layout(
+            plot_bgcolor = "white",
+            margin = dict(l = 40, r = 20, t = 40, b = 40),
+            autosize = True,
+            xaxis_tickangle = 45,
+            showlegend = False
+        )
 
     return fig
 
@@ -656,34 +999,243 @@ def update_krc_chart(keyword):
         return go.Figure()
 
     try:
-        data = neo4j_utils.get_krc(keyword)
+        data = routing_utils.get_krc(keyword)
         if not data:
             return go.Figure()
 
-        # Convert to DataFrame
-        df = pd.DataFrame(data)
+        with tracing_utils.span("figure"):
+            # Convert to DataFrame
+            df = pd.DataFrame(data)
+
+            # Plot
+            fig = px.bar(
+                df,
+                x="university",
+                y="totalKRC",
+                color="university",
+                labels={
+                    "university": "University",
+                    "totalKRC": "Total KRC"
+                }
+            )
+            fig.update_layout(
+                plot_bgcolor="white",
+                margin=dict(l=40, r=20, t=40, b=40),
+                xaxis_tickangle=45,
+                showlegend=False
+            )
+        return mark_stale(fig, data)
+
+    except Exception as e:
+        print(f"Error in KRC query: {e}")
+        return go.Figure()
+
+# Callback to update keyword search options of the leaderboard (bottom right widget 2)
+@app.callback(
+    Output("leaderboard-keyword-input", "options"),
+    Input("leaderboard-keyword-input", "search_value"),
+    State("leaderboard-keyword-input", "value")
+)
+
+def update_leaderboard_keyword_options(search_value, selected):
+    return keyword_search_options(search_value, selected)
 
-        # Plot
+
+# Callback to update the top cited faculty leaderboard (bottom right widget 2)
+@app.callback(
+    Output("leaderboard-chart", "figure"),
+    Input("leaderboard-keyword-input", "value"),
+    Input("leaderboard-refresh", "n_intervals")
+)
+
+def update_leaderboard_chart(keyword, _):
+    """
+    Update the bar chart of the 10 most cited faculty across all universities, or among
+    the faculty associated with a keyword.
+    """
+
+    try:
+        rows = leaderboard_utils.get_top_faculty(keyword, 10)
+        if not rows:
+            return go.Figure()
+
+        df = pd.DataFrame(rows)
+        df["faculty"] = df["name"] + " (" + df["university"] + ")"
         fig = px.bar(
-            df,
-            x="university",
-            y="totalKRC",
-            color="university",
-            labels={
-                "university": "University",
-                "totalKRC": "Total KRC"
+            df.iloc[::-1],
+            x = "totalCitations",
+            y = "faculty",
+            orientation = "h",
+            labels = {
+                "totalCitations": "Total Citations",
+                "faculty": "Faculty"
             }
         )
         fig.update_layout(
-            plot_bgcolor="white",
-            margin=dict(l=40, r=20, t=40, b=40),
-            xaxis_tickangle=45,
-            showlegend=False
+            plot_bgcolor = "white",
+            margin = dict(l = 40, r = 20, t = 40, b = 40)
         )
         return fig
 
     except Exception as e:
-        print(f"Error in KRC query: {e}")
+        print(f"Error in leaderboard query: {e}")
+        return go.Figure()
+
+# Callback to update keyword search options of the best fit widget
+@app.callback(
+    Output("fit-keyword-input", "options"),
+    Input("fit-keyword-input", "search_value"),
+    State("fit-keyword-input", "value")
+)
+
+def update_fit_keyword_options(search_value, selected):
+    return keyword_search_options(search_value, selected)
+
+
+# Callback to update the best fit recommendations
+@app.callback(
+    Output("fit-chart", "figure"),
+    Input("fit-university-input", "value"),
+    Input("fit-keyword-input", "value")
+)
+
+def update_fit_chart(university, keywords):
+    """
+    Update the bar chart of the universities whose faculty keyword profile is most similar
+    to the selected university or, if none is selected, to the selected keywords.
+    """
+
+    if not university and not keywords:
+        return go.Figure()
+    try:
+        rows = mysql_utils.get_similar_universities(university, keywords, 10)
+        if not rows:
+            return go.Figure()
+
+        df = pd.DataFrame(rows)
+        fig = px.bar(
+            df.iloc[::-1],
+            x = "similarity",
+            y = "university",
+            orientation = "h",
+            labels = {
+                "similarity": "Keyword Profile Similarity",
+                "university": "University"
+            }
+        )
+        fig.update_layout(
+            plot_bgcolor = "white",
+            margin = dict(l = 40, r = 20, t = 40, b = 40),
+            xaxis_range = [0, 1]
+        )
+        return fig
+
+    except Exception as e:
+        print(f"Error in best fit query: {e}")
+        return go.Figure()
+
+# Callback to update the rising and declining research topics
+@app.callback(
+    Output("trends-chart", "figure"),
+    Input("trends-university-input", "value"),
+    Input("trends-metric-input", "value")
+)
+
+def update_trends_chart(university, metric):
+    """
+    Update the bar chart of the keywords whose publications grew and shrank the fastest,
+    overall or at the selected university.
+    """
+
+    try:
+        trends = mysql_utils.get_keyword_trends(university, metric or "publications", 10)
+        rows = [dict(row, direction = "Rising") for row in trends["rising"]] + [dict(row, direction = "Declining") for row in trends["declining"]]
+        if not rows:
+            return go.Figure()
+
+        df = pd.DataFrame(rows)
+        df["growth"] = df["growth"] * 100
+        first, last = trends["years"]
+        fig = px.bar(
+            df.iloc[::-1],
+            x = "growth",
+            y = "keyword",
+            color = "direction",
+            orientation = "h",
+            color_discrete_map = {"Rising": "#2ca02c", "Declining": "#d62728"},
+            labels = {
+                "growth": f"Annual Growth (%), {first}-{last}",
+                "keyword": "Keyword",
+                "direction": ""
+            }
+        )
+        fig.update_layout(
+            plot_bgcolor = "white",
+            margin = dict(l = 40, r = 20, t = 40, b = 40)
+        )
+        return fig
+
+    except Exception as e:
+        print(f"Error in keyword trends query: {e}")
+        return go.Figure()
+
+# Callback to search the faculty of the collaborators widget
+@app.callback(
+    Output("collab-faculty-input", "options"),
+    Input("collab-university-input", "value"),
+    Input("collab-faculty-input", "search_value"),
+    State("collab-faculty-input", "value"),
+    State("collab-faculty-input", "options")
+)
+
+def update_collab_faculty_options(university_name, search_value, faculty_id, options):
+    if not university_name:
+        return []
+    current = [option for option in options or [] if option["value"] == faculty_id and search_value]
+    rows, _ = mysql_utils.search_faculty(university_name, search_value or None, None, PAGE_SIZE)
+    return picker_options(current, rows, lambda row: row["name"], None)
+
+
+# Callback to update the possible collaborators of a faculty member
+@app.callback(
+    Output("collab-chart", "figure"),
+    Input("collab-faculty-input", "value")
+)
+
+def update_collab_chart(faculty_id):
+    """
+    Update the bar chart of the faculty at other universities with the most similar
+    keyword profiles to the selected faculty member.
+    """
+
+    if not faculty_id:
+        return go.Figure()
+    try:
+        rows = collaborator_utils.get_similar_faculty(faculty_id, 10)
+        if not rows:
+            return go.Figure()
+
+        df = pd.DataFrame(rows)
+        df["faculty"] = df["name"] + " (" + df["university"] + ")"
+        fig = px.bar(
+            df.iloc[::-1],
+            x = "similarity",
+            y = "faculty",
+            orientation = "h",
+            labels = {
+                "similarity": "Keyword Profile Similarity",
+                "faculty": "Faculty"
+            }
+        )
+        fig.update_layout(
+            plot_bgcolor = "white",
+            margin = dict(l = 40, r = 20, t = 40, b = 40),
+            xaxis_range = [0, 1]
+        )
+        return fig
+
+    except Exception as e:
+        print(f"Error in collaborator query: {e}")
         return go.Figure()
 
 # Callback to insert a new university into university table (bottom left widget 1)
@@ -780,32 +1332,113 @@ def refresh_delete_dropdown(_, __):
     universities = mysql_utils.get_all_universities()
     return [{"label": univ, "value": univ} for univ in universities]
 
+## Faculty and publication pickers
+# The pickers are searched on the server and load PAGE_SIZE options at a time; choosing the
+# last option ("Load more...") appends the next page
+PAGE_SIZE = 50
+LOAD_MORE = "load-more"
+
+
+def picker_options(current, rows, label, next_cursor):
+    """
+    Returns dropdown options for a page of rows appended to the current options, ending with
+    a "Load more..." option if there is a next page.
+    """
+
+    options = [option for option in current if option["value"] != LOAD_MORE]
+    seen = {option["value"] for option in options}
+    options += [{"label": label(row), "value": row["id"]} for row in rows if row["id"] not in seen]
+    if next_cursor is not None:
+        options.append({"label": "Load more...", "value": LOAD_MORE})
+    return options
+
+
+def triggered_prop():
+    """
+    Returns the "id.property" that triggered the running callback, or "" when the callback
+    function is called directly, e.g. by benchmark.py.
+    """
+
+    try:
+        return ctx.triggered[0]["prop_id"] if ctx.triggered else ""
+    except MissingCallbackContextException:
+        return ""
+
+
+def abbreviate(title, max_len=60):
+    return title if len(title) <= max_len else title[:max_len] + "..."
+
+
 @app.callback(
     Output("faculty-dropdown", "options"),
-    Input("update-pub-univ-input", "value")
+    Output("faculty-dropdown", "value"),
+    Output("faculty-cursor", "data"),
+    Input("update-pub-univ-input", "value"),
+    Input("faculty-dropdown", "search_value"),
+    Input("faculty-dropdown", "value"),
+    State("faculty-dropdown", "options"),
+    State("faculty-cursor", "data")
 )
-def update_faculty_options(university_name):
+def update_faculty_options(university_name, search_value, faculty_id, options, cursor):
+    """
+    Loads the first page of faculty when the university or the search term changes, and the
+    next page when "Load more..." is chosen.
+    """
+
     if not university_name:
-        return []
-    faculty = mysql_utils.get_faculty_by_university(university_name)
-    if not faculty:
-        return []
-    return [{"label": f["name"], "value": f["id"]} for f in faculty]
+        return [], None, None
+    triggered = triggered_prop()
+
+    if triggered == "faculty-dropdown.value":
+        if faculty_id != LOAD_MORE or not cursor:
+            return no_update, no_update, no_update
+        rows, next_cursor = mysql_utils.search_faculty(university_name, cursor["search"], cursor["after"], PAGE_SIZE)
+        return picker_options(options or [], rows, lambda row: row["name"], next_cursor), None, {**cursor, "after": next_cursor}
+
+    if triggered == "faculty-dropdown.search_value":
+        # Keep the selected faculty member while searching for another one
+        current = [option for option in options or [] if option["value"] == faculty_id]
+    else:
+        current, faculty_id = [], None
+    rows, next_cursor = mysql_utils.search_faculty(university_name, search_value or None, None, PAGE_SIZE)
+    return picker_options(current, rows, lambda row: row["name"], next_cursor), faculty_id, {"search": search_value or None, "after": next_cursor}
 
 @app.callback(
-    Output("publication-dropdown", "options"),  # <-- Add this line
+    Output("publication-dropdown", "options"),
+    Output("publication-dropdown", "value", allow_duplicate=True),
+    Output("publication-cursor", "data"),
     Input("faculty-dropdown", "value"),
     Input("pub-refresh-trigger", "data"),
+    Input("publication-dropdown", "search_value"),
+    Input("publication-dropdown", "value"),
+    State("publication-dropdown", "options"),
+    State("publication-cursor", "data"),
+    prevent_initial_call=True
 )
-def update_publication_options(faculty_id, pub_refresh):
+def update_publication_options(faculty_id, pub_refresh, search_value, pub_id, options, cursor):
+    """
+    Loads the first page of publications when the faculty member, the publications or the
+    search term change, and the next page when "Load more..." is chosen.
+    """
+
+    if faculty_id == LOAD_MORE:
+        return no_update, no_update, no_update
     if not faculty_id:
-        return []
-    pubs = mysql_utils.get_publications_by_faculty(faculty_id)
-    if not pubs:
-        return []
-    def abbreviate(title, max_len=60):
-        return title if len(title) <= max_len else title[:max_len] + "..."
-    return [{"label": abbreviate(p["title"]), "value": p["id"]} for p in pubs]
+        return [], None, None
+    triggered = triggered_prop()
+
+    if triggered == "publication-dropdown.value":
+        if pub_id != LOAD_MORE or not cursor:
+            return no_update, no_update, no_update
+        rows, next_cursor = mysql_utils.search_publications(faculty_id, cursor["search"], cursor["after"], PAGE_SIZE)
+        return picker_options(options or [], rows, lambda row: abbreviate(row["title"]), next_cursor), None, {**cursor, "after": next_cursor}
+
+    if triggered == "publication-dropdown.search_value":
+        current = [option for option in options or [] if option["value"] == pub_id]
+    else:
+        current, pub_id = [], no_update if triggered == "pub-refresh-trigger.data" else None
+    rows, next_cursor = mysql_utils.search_publications(faculty_id, search_value or None, None, PAGE_SIZE)
+    return picker_options(current, rows, lambda row: abbreviate(row["title"]), next_cursor), pub_id, {"search": search_value or None, "after": next_cursor}
 
 @app.callback(
     Output("add-pub-modal", "is_open"),
@@ -882,6 +1515,8 @@ def update_publication(confirm_click, pub_id, title, venue, year, num_citations)
     Input("publication-dropdown", "value"),
 )
 def toggle_pub_dropdown_and_buttons(faculty_id, pub_id):
+    faculty_id = None if faculty_id == LOAD_MORE else faculty_id
+    pub_id = None if pub_id == LOAD_MORE else pub_id
     # Show publication dropdown only if faculty is selected
     pub_dropdown_style = {} if faculty_id else {"display": "none"}
     # Show Add button only if faculty is selected
@@ -938,4 +1573,5 @@ def add_or_delete_publication(
     return no_update, no_update, no_update, no_update, no_update, no_update, no_update, no_update
 # Run the app
 if __name__ == '__main__':
+    start_background_workers()
     app.run(debug = False)
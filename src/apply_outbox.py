@@ -0,0 +1,37 @@
+"""
+Applies the MySQL outbox of dashboard edits (added, updated and deleted universities and
+publications) to MongoDB and Neo4j. The dashboard does this on a background thread unless
+OUTBOX_APPLIER=0 is set; this script runs the same applier as a separate process.
+
+Run from the src folder, e.g.
+
+    python apply_outbox.py                   # apply continuously
+    python apply_outbox.py --once            # apply everything pending and exit
+    python apply_outbox.py --replay-from 1200 --once
+"""
+
+import argparse
+
+from utils import outbox_utils
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Apply the outbox of dashboard edits to MongoDB and Neo4j.")
+    parser.add_argument("--once", action = "store_true", help = "apply every pending entry and exit")
+    parser.add_argument("--replay-from", type = int, metavar = "ID", help = "apply every retained entry from this id again")
+    args = parser.parse_args()
+
+    if args.replay_from is not None:
+        print(f"{outbox_utils.replay(args.replay_from)} entries marked for replay")
+
+    if args.once:
+        outbox_utils.create_indexes()
+        total = 0
+        while True:
+            applied = outbox_utils.apply_batch()
+            total += applied
+            if applied == 0:
+                break
+        print(f"Applied {total} entries")
+    else:
+        outbox_utils.run_applier()
@@ -0,0 +1,317 @@
+"""
+Benchmarks every data-access function in mysql_utils, mongodb_utils and neo4j_utils,
+plus the figure-building callbacks in app.py, against the synthetic academicworld
+dataset from generate_data.py, and compares the timings to a stored baseline.
+
+Run from the src folder, e.g.
+
+    python benchmark.py --scales 1 10 100 --load --save-baseline
+    python benchmark.py --scales 1 10 100
+
+Each scale is measured in a fresh subprocess so that the import-time setup in the
+utils modules (indexes, trigger) runs against the freshly loaded tables. The exit
+code is 1 when any case regressed past the tolerance.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import statistics
+import subprocess
+
+import generate_data
+
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+
+
+class Case:
+    """
+    A single benchmark case.
+
+    Parameters
+    ----------
+    name : str
+        Name of the case, i.e. "<module>.<function>".
+    run : callable
+        Function timed on each iteration. It is passed the value returned by setup.
+    setup : callable, optional
+        Untimed function called with the iteration number before run.
+    teardown : callable, optional
+        Untimed function called with the value returned by setup and the result of run.
+    """
+
+    def __init__(self, name, run, setup = None, teardown = None):
+        self.name = name
+        self.run = run
+        self.setup = setup or (lambda i: i)
+        self.teardown = teardown
+
+
+def _cycle(values):
+    """
+    Returns a setup function that cycles through a list of inputs.
+    """
+
+    return lambda i: values[i % len(values)]
+
+
+# Function to build the benchmark cases from the loaded dataset
+def build_cases(seed = 411):
+    """
+    Builds benchmark cases for every utils function and the figure-building callbacks.
+    Inputs are sampled from the loaded dataset with a fixed seed.
+
+    Returns
+    -------
+    list of Case
+    """
+
+    from utils import mysql_utils, mongodb_utils, neo4j_utils, leaderboard_utils, collaborator_utils
+    import app as dashboard
+
+    rng = random.Random(seed)
+    universities = mysql_utils.get_all_universities()
+    keywords = mysql_utils.get_all_keywords()
+    sample_universities = rng.sample(universities, min(5, len(universities)))
+    sample_keywords = rng.sample(keywords, min(5, len(keywords)))
+    keyword_sets = [rng.sample(keywords, min(3, len(keywords))) for _ in range(5)]
+    prefixes = [keyword[:2] for keyword in sample_keywords]
+    # Keywords with the middle letter doubled, which only typo-tolerant matching resolves
+    typos = [keyword[:len(keyword) // 2 + 1] + keyword[len(keyword) // 2:] for keyword in sample_keywords]
+    faculty_ids = [row["id"] for university in sample_universities for row in mysql_utils.get_faculty_by_university(university)[:2]]
+    publication_ids = [row["id"] for faculty_id in faculty_ids for row in mysql_utils.get_publications_by_faculty(faculty_id)[:1]]
+    years = mongodb_utils.get_publication_year_range()
+    university_sets = [rng.sample(universities, min(3, len(universities))) for _ in range(5)]
+
+    def new_publication(i):
+        return mysql_utils.add_publication(faculty_ids[i % len(faculty_ids)], {"title": f"Benchmark publication {i}", "venue": "BENCH", "year": 2020})
+
+    def new_university(i):
+        name = f"Benchmark University {os.getpid()}-{i}"
+        mysql_utils.insert_university(name)
+        return name
+
+    cases = [
+        # MySQL reads
+        Case("mysql_utils.validate_keywords", mysql_utils.validate_keywords, _cycle(keyword_sets)),
+        Case("mysql_utils.middle_left_query", mysql_utils.middle_left_query, _cycle(keyword_sets)),
+        Case("mysql_utils.get_all_keywords", lambda _: mysql_utils.get_all_keywords()),
+        Case("mysql_utils.search_keywords_by_prefix", mysql_utils.search_keywords_by_prefix, _cycle(prefixes)),
+        Case("mysql_utils.validate_keywords (typos)", lambda typo: mysql_utils.validate_keywords([typo]), _cycle(typos)),
+        Case("mysql_utils.search_keywords_by_prefix (typos)", mysql_utils.search_keywords_by_prefix, _cycle(typos)),
+        Case("mysql_utils.get_all_universities", lambda _: mysql_utils.get_all_universities()),
+        Case("mysql_utils.get_citation_ranking", mysql_utils.get_citation_ranking, _cycle(sample_universities)),
+        Case("mysql_utils.get_faculty_by_university", mysql_utils.get_faculty_by_university, _cycle(sample_universities)),
+        Case("mysql_utils.get_publications_by_faculty", mysql_utils.get_publications_by_faculty, _cycle(faculty_ids)),
+        Case("mysql_utils.search_faculty", lambda university: mysql_utils.search_faculty(university, None, None, 50), _cycle(sample_universities)),
+        Case("mysql_utils.search_faculty[search]", lambda university: mysql_utils.search_faculty(university, "a", None, 50), _cycle(sample_universities)),
+        Case("mysql_utils.search_publications", lambda faculty_id: mysql_utils.search_publications(faculty_id, None, None, 50), _cycle(faculty_ids)),
+        Case("mysql_utils.get_publication", mysql_utils.get_publication, _cycle(publication_ids)),
+
+        # MySQL writes, each cleaning up after itself
+        Case("mysql_utils.insert_university",
+             mysql_utils.insert_university,
+             lambda i: f"Benchmark University {os.getpid()}-{i}",
+             lambda name, _: mysql_utils.delete_university(name)),
+        Case("mysql_utils.delete_university", mysql_utils.delete_university, new_university),
+        Case("mysql_utils.add_publication",
+             lambda i: mysql_utils.add_publication(faculty_ids[i % len(faculty_ids)], {"title": f"Benchmark publication {i}", "venue": "BENCH", "year": 2020}),
+             teardown = lambda _, publication_id: mysql_utils.delete_publication(publication_id)),
+        Case("mysql_utils.update_publication",
+             lambda publication_id: mysql_utils.update_publication(publication_id, {"title": "Benchmark publication (updated)", "num_citations": 1}),
+             new_publication,
+             lambda publication_id, _: mysql_utils.delete_publication(publication_id)),
+        Case("mysql_utils.delete_publication", mysql_utils.delete_publication, new_publication),
+
+        # MongoDB
+        Case("mongodb_utils.top_right_query", lambda universities: mongodb_utils.top_right_query(universities, years), _cycle(university_sets)),
+        Case("mongodb_utils.top_right_query[all]", lambda _: mongodb_utils.top_right_query(None, years)),
+        Case("mongodb_utils.get_all_universities", lambda _: mongodb_utils.get_all_universities()),
+        Case("mongodb_utils.get_publication_year_range", lambda _: mongodb_utils.get_publication_year_range()),
+
+        # Neo4j
+        Case("neo4j_utils.get_krc", neo4j_utils.get_krc, _cycle(sample_keywords)),
+
+        # Routed widget queries on their other backends
+        Case("mongodb_utils.get_citation_ranking", mongodb_utils.get_citation_ranking, _cycle(sample_universities)),
+        Case("neo4j_utils.get_citation_ranking", neo4j_utils.get_citation_ranking, _cycle(sample_universities)),
+        Case("mysql_utils.top_right_query", lambda universities: mysql_utils.top_right_query(universities, years), _cycle(university_sets)),
+        Case("neo4j_utils.top_right_query", lambda universities: neo4j_utils.top_right_query(universities, years), _cycle(university_sets)),
+        Case("mysql_utils.get_krc", mysql_utils.get_krc, _cycle(sample_keywords)),
+        Case("mongodb_utils.get_krc", mongodb_utils.get_krc, _cycle(sample_keywords)),
+
+        # Best fit recommendations, read from the precomputed similarity index once built
+        Case("mysql_utils.get_similar_universities[university]", lambda university: mysql_utils.get_similar_universities(university), _cycle(sample_universities)),
+        Case("mysql_utils.get_similar_universities[keywords]", lambda keywords: mysql_utils.get_similar_universities(None, keywords), _cycle(keyword_sets)),
+
+        # Keyword trends, read from the keyword x year matrices once built
+        Case("mysql_utils.get_keyword_trends", lambda _: mysql_utils.get_keyword_trends(None, "publications", 10)),
+        Case("mysql_utils.get_keyword_trends[university]", lambda university: mysql_utils.get_keyword_trends(university, "citations", 10), _cycle(sample_universities)),
+
+        # Top cited faculty leaderboard, read from memory once built
+        Case("leaderboard_utils.get_top_faculty", lambda _: leaderboard_utils.get_top_faculty(None, 10)),
+        Case("leaderboard_utils.get_top_faculty[keyword]", lambda keyword: leaderboard_utils.get_top_faculty(keyword, 10), _cycle(sample_keywords)),
+
+        # Collaborator search, answered by the approximate nearest-neighbor index once built
+        Case("collaborator_utils.get_similar_faculty", lambda faculty_id: collaborator_utils.get_similar_faculty(faculty_id, 10), _cycle(faculty_ids)),
+
+        # Figure-building callbacks
+        Case("app.update_citation_table", dashboard.update_citation_table, _cycle(sample_universities)),
+        Case("app.update_line_chart", lambda universities: dashboard.update_line_chart(universities, years), _cycle(university_sets)),
+        Case("app.update_bar_chart", dashboard.update_bar_chart, _cycle(keyword_sets)),
+        Case("app.update_krc_chart", dashboard.update_krc_chart, _cycle(sample_keywords)),
+        Case("app.update_fit_chart", lambda keywords: dashboard.update_fit_chart(None, keywords), _cycle(keyword_sets)),
+        Case("app.update_collab_chart", dashboard.update_collab_chart, _cycle(faculty_ids)),
+        Case("app.update_trends_chart", lambda university: dashboard.update_trends_chart(university, "publications"), _cycle(sample_universities)),
+        Case("app.update_leaderboard_chart", lambda keyword: dashboard.update_leaderboard_chart(keyword, None), _cycle(sample_keywords)),
+        Case("app.update_keyword_dropdown", lambda prefix: dashboard.update_keyword_dropdown(prefix, None, [], None), _cycle(prefixes)),
+        Case("app.update_faculty_options", lambda university: dashboard.update_faculty_options(university, None, None, [], None), _cycle(sample_universities)),
+        Case("app.update_publication_options", lambda faculty_id: dashboard.update_publication_options(faculty_id, 0, None, None, [], None), _cycle(faculty_ids)),
+    ]
+    return cases
+
+
+# Function to time a single case
+def time_case(case, repeat, warmup):
+    """
+    Runs a case warmup + repeat times and returns latency statistics in milliseconds.
+    """
+
+    timings = []
+    for i in range(warmup + repeat):
+        state = case.setup(i)
+        start = time.perf_counter()
+        result = case.run(state)
+        elapsed = (time.perf_counter() - start) * 1000
+        if case.teardown:
+            case.teardown(state, result)
+        if i >= warmup:
+            timings.append(elapsed)
+
+    timings.sort()
+    return {
+        "min_ms": round(timings[0], 3),
+        "median_ms": round(statistics.median(timings), 3),
+        "p95_ms": round(timings[min(len(timings) - 1, int(0.95 * len(timings)))], 3),
+        "mean_ms": round(statistics.fmean(timings), 3),
+        "runs": len(timings)
+    }
+
+
+def run_scale(repeat, warmup, only = None):
+    """
+    Times every case against the currently loaded dataset.
+
+    Returns
+    -------
+    dict
+        Latency statistics keyed by case name.
+    """
+
+    results = {}
+    for case in build_cases():
+        if only and not any(pattern in case.name for pattern in only):
+            continue
+        results[case.name] = time_case(case, repeat, warmup)
+        print(f"  {case.name:<45} median {results[case.name]['median_ms']:>10.3f} ms", file = sys.stderr)
+    return results
+
+
+# Function to compare results against the stored baseline
+def compare(results, baseline, tolerance, min_delta_ms):
+    """
+    Prints a comparison table and returns the list of regressed cases.
+
+    Parameters
+    ----------
+    results : dict
+        {scale: {case: stats}} from this run.
+    baseline : dict
+        {scale: {case: stats}} from the stored baseline.
+    tolerance : float
+        Allowed relative slowdown of the median, e.g. 0.25 for 25%.
+    min_delta_ms : float
+        Slowdowns smaller than this many milliseconds are never reported as regressions.
+
+    Returns
+    -------
+    list of (scale, case, baseline_ms, current_ms)
+    """
+
+    regressions = []
+    print(f"\n{'scale':>6}  {'case':<45} {'baseline':>10} {'current':>10} {'change':>8}")
+    for scale, cases in results.items():
+        for name, stats in cases.items():
+            base = baseline.get(scale, {}).get(name)
+            if base is None:
+                print(f"{scale:>6}  {name:<45} {'-':>10} {stats['median_ms']:>10.3f} {'new':>8}")
+                continue
+            change = stats["median_ms"] / base["median_ms"] - 1 if base["median_ms"] else 0.0
+            regressed = change > tolerance and stats["median_ms"] - base["median_ms"] > min_delta_ms
+            flag = "  REGRESSION" if regressed else ""
+            print(f"{scale:>6}  {name:<45} {base['median_ms']:>10.3f} {stats['median_ms']:>10.3f} {change:>+8.1%}{flag}")
+            if regressed:
+                regressions.append((scale, name, base["median_ms"], stats["median_ms"]))
+    return regressions
+
+
+def _scale_key(scale):
+    return f"{scale:g}x"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Benchmark the dashboard's data-access functions and callbacks.")
+    parser.add_argument("--scales", type = float, nargs = "+", default = [1, 10, 100])
+    parser.add_argument("--database", default = "academicworld_synth", help = "MySQL/MongoDB database holding the synthetic dataset")
+    parser.add_argument("--neo4j-database", default = None, help = "Neo4j database holding the synthetic dataset (defaults to --database)")
+    parser.add_argument("--load", action = "store_true", help = "generate and load the dataset at each scale before timing it")
+    parser.add_argument("--repeat", type = int, default = 20)
+    parser.add_argument("--warmup", type = int, default = 3)
+    parser.add_argument("--only", nargs = "+", help = "only run cases whose name contains one of these strings")
+    parser.add_argument("--baseline", default = DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action = "store_true", help = "store this run as the new baseline")
+    parser.add_argument("--output", help = "also write the results of this run to a JSON file")
+    parser.add_argument("--tolerance", type = float, default = 0.25, help = "allowed relative slowdown of the median")
+    parser.add_argument("--min-delta-ms", type = float, default = 1.0)
+    parser.add_argument("--child", action = "store_true", help = argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        # Measure the currently loaded dataset and print the results as JSON
+        print(json.dumps(run_scale(args.repeat, args.warmup, args.only)))
+        sys.exit(0)
+
+    env = dict(os.environ, DB_NAME = args.database, NEO4J_DB_NAME = args.neo4j_database or args.database)
+    results = {}
+    for scale in args.scales:
+        if args.load:
+            generate_data.load_all(scale, args.database, args.neo4j_database)
+        print(f"Benchmarking scale {_scale_key(scale)}", file = sys.stderr)
+        command = [sys.executable, os.path.abspath(__file__), "--child", "--repeat", str(args.repeat), "--warmup", str(args.warmup)]
+        if args.only:
+            command += ["--only", *args.only]
+        child = subprocess.run(command, env = env, stdout = subprocess.PIPE, text = True, check = True)
+        results[_scale_key(scale)] = json.loads(child.stdout.strip().splitlines()[-1])
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent = 2)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    regressions = compare(results, baseline, args.tolerance, args.min_delta_ms)
+
+    if args.save_baseline:
+        baseline.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent = 2, sort_keys = True)
+        print(f"\nBaseline saved to {args.baseline}")
+    elif regressions:
+        print(f"\n{len(regressions)} case(s) regressed by more than {args.tolerance:.0%}")
+        sys.exit(1)
@@ -0,0 +1,95 @@
+"""
+Parity checks for the widget queries that routing_utils can send to any backend.
+
+Runs get_citation_ranking, top_right_query and get_krc on MySQL, MongoDB and Neo4j with
+inputs sampled from the loaded dataset and checks that every backend returns a result
+equivalent to the home backend's. The exit code is 1 when any result differs, so an
+implementation that drifts from the others fails the run.
+
+Run from the src folder, e.g.
+
+    python generate_data.py --scale 1
+    python check_parity.py --database academicworld_synth
+"""
+
+import os
+import sys
+import random
+import argparse
+
+
+# Function to build the inputs of every routed query
+def build_inputs(samples = 5, seed = 411):
+    """
+    Returns {query: [args, ...]} with inputs sampled from the loaded dataset.
+    """
+
+    from utils import mysql_utils, mongodb_utils
+
+    rng = random.Random(seed)
+    universities = mysql_utils.get_all_universities()
+    keywords = mysql_utils.get_all_keywords()
+    start, end = mongodb_utils.get_publication_year_range()
+    sample_universities = rng.sample(universities, min(samples, len(universities)))
+    sample_keywords = rng.sample(keywords, min(samples, len(keywords)))
+    middle = (start + end) // 2
+
+    return {
+        "get_citation_ranking": [(university, ) for university in sample_universities],
+        "top_right_query": [
+            (None, None),
+            (sample_universities, [start, end]),
+            (sample_universities[:2], [middle, end])
+        ],
+        "get_krc": [(keyword, ) for keyword in sample_keywords]
+    }
+
+
+# Function to run every parity check
+def run_checks(samples = 5, verbose = False):
+    """
+    Compares the result of every backend with the home backend's for each sampled input.
+
+    Returns
+    -------
+    list of str
+        One message per mismatch.
+    """
+
+    from utils import routing_utils
+
+    failures = []
+    for query, inputs in build_inputs(samples).items():
+        home = routing_utils.QUERIES[query]
+        for args in inputs:
+            expected = getattr(routing_utils.BACKENDS[home], query)(*args)
+            for backend, module in routing_utils.BACKENDS.items():
+                if backend == home:
+                    continue
+                result = getattr(module, query)(*args)
+                ok = routing_utils.equivalent(query, expected, result)
+                print(f"{'ok' if ok else 'FAIL':<5} {query}{args!r:.60} {backend} vs {home}")
+                if not ok:
+                    failures.append(f"{query}{args!r}: {backend} differs from {home}")
+                    if verbose:
+                        print(f"  {home}: {expected}\n  {backend}: {result}")
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Check that every backend answers the routed widget queries the same way.")
+    parser.add_argument("--database", help = "database to check (defaults to DB_NAME from the .env file)")
+    parser.add_argument("--neo4j-database", help = "Neo4j database to check (defaults to --database)")
+    parser.add_argument("--samples", type = int, default = 5, help = "number of universities and keywords to sample")
+    parser.add_argument("--verbose", action = "store_true", help = "print both results of every mismatch")
+    args = parser.parse_args()
+
+    if args.database:
+        os.environ["DB_NAME"] = args.database
+        os.environ["NEO4J_DB_NAME"] = args.neo4j_database or args.database
+
+    failures = run_checks(args.samples, args.verbose)
+    if failures:
+        print(f"\n{len(failures)} parity check(s) failed")
+        sys.exit(1)
+    print("\nAll backends agree")
@@ -0,0 +1,107 @@
+"""
+Checks that Dash callback responses send the numbers of their figures as typed arrays.
+
+Builds a small Dash app wrapped like app.py (see utils/payload_utils.py), with callbacks
+that return the kinds of figures the widgets draw from database rows (pie and bar charts
+from Decimal columns, a line chart from integer years), calls them through the Flask test
+client, and checks that every numeric array of every response is base64-encoded ("bdata")
+rather than a JSON list. No database is needed. The exit code is 1 when any check fails.
+
+Run from the src folder, e.g.
+
+    python check_payloads.py
+"""
+
+import sys
+import json
+import argparse
+from decimal import Decimal
+from dash import Dash, html, dcc, Input, Output
+import pandas as pd
+import plotly.express as px
+
+from utils import payload_utils
+
+
+ROWS = [
+    {"name": "Faculty A", "university": "University A", "year": 2001, "totalCitations": Decimal(1200), "score": Decimal("3.5")},
+    {"name": "Faculty B", "university": "University A", "year": 2002, "totalCitations": Decimal(800), "score": Decimal("2.25")},
+    {"name": "Faculty C", "university": "University B", "year": 2003, "totalCitations": Decimal(300), "score": Decimal("1.0")}
+]
+
+# Figure builders in the style of the widgets' callbacks
+FIGURES = {
+    "pie": lambda df: px.pie(df, names = "name", values = "totalCitations"),
+    "bar": lambda df: px.bar(df, x = "university", y = "score"),
+    "line": lambda df: px.line(df, x = "year", y = "totalCitations", color = "university")
+}
+
+
+def build_app():
+    app = Dash(__name__)
+    payload_utils.compact_callbacks(app)
+    payload_utils.register_compression(app.server)
+    app.layout = html.Div([dcc.Input(id = "input", value = "")] + [dcc.Graph(id = name) for name in FIGURES])
+
+    for name, build in FIGURES.items():
+        @app.callback(Output(name, "figure"), Input("input", "value"))
+        def figure(_, build = build):
+            return build(pd.DataFrame(ROWS))
+
+    return app
+
+
+def _lists(trace):
+    """
+    Yields the per-point attributes of a trace sent as JSON lists of numbers.
+    """
+
+    for attribute in payload_utils.ARRAY_ATTRIBUTES:
+        value = trace.get(attribute)
+        if isinstance(value, list) and value and all(isinstance(item, (int, float)) for item in value):
+            yield attribute
+
+
+# Function to call every callback and check its response
+def run_checks(verbose = False):
+    payload_utils.configure()
+    app = build_app()
+    client = app.server.test_client()
+    client.get("/")
+
+    failures = []
+    for name in FIGURES:
+        response = client.post("/_dash-update-component", json = {
+            "output": f"{name}.figure",
+            "outputs": {"id": name, "property": "figure"},
+            "inputs": [{"id": "input", "property": "value", "value": ""}],
+            "changedPropIds": ["input.value"]
+        })
+        body = response.get_data(as_text = True)
+        if response.status_code != 200:
+            failures.append((name, f"status {response.status_code}"))
+            continue
+        figure = json.loads(body)["response"][name]["figure"]
+        lists = [f"{trace.get('type')}.{attribute}" for trace in figure["data"] for attribute in _lists(trace)]
+        if "bdata" not in body or lists:
+            failures.append((name, f"numbers sent as JSON lists: {', '.join(lists) or 'no typed arrays'}"))
+            if verbose:
+                print(json.dumps(figure["data"], indent = 2))
+        else:
+            print(f"ok      {name}")
+
+    for name, reason in failures:
+        print(f"FAILED  {name}: {reason}")
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Check that callback responses send figure numbers as typed arrays.")
+    parser.add_argument("--verbose", action = "store_true", help = "print the traces of failed checks")
+    args = parser.parse_args()
+
+    failures = run_checks(args.verbose)
+    if failures:
+        print(f"\n{len(failures)} payload check(s) failed")
+        sys.exit(1)
+    print("\nAll payload checks passed")
@@ -0,0 +1,191 @@
+"""
+Query-plan regression checks for the dashboard's hot queries.
+
+Runs each hot query against the loaded dataset (normally the synthetic dataset from
+generate_data.py), captures the plans of every statement it issues, and asserts
+properties of those plans, e.g. that MySQL never scans faculty_keyword, that MongoDB
+never scans the publications collection and that Neo4j starts get_krc from an index
+seek on KEYWORD(name). The exit code is 1 when any check fails, so a code or schema
+change that degrades a plan fails the run.
+
+Run from the src folder, e.g.
+
+    python generate_data.py --scale 10
+    python check_query_plans.py --database academicworld_synth
+"""
+
+import os
+import sys
+import random
+import argparse
+
+
+## Plan walkers
+def _walk(node, namespace = None):
+    """
+    Yields every dict in a nested plan together with the nearest enclosing MongoDB
+    "namespace" value (None for MySQL and Neo4j plans).
+    """
+
+    if isinstance(node, dict):
+        namespace = node.get("namespace", namespace)
+        yield node, namespace
+        for value in node.values():
+            yield from _walk(value, namespace)
+    elif isinstance(node, list):
+        for item in node:
+            yield from _walk(item, namespace)
+
+
+## MySQL plan properties
+def mysql_no_full_scan(table):
+    """
+    Fails if EXPLAIN FORMAT=JSON shows a full table scan (access_type ALL) on the table.
+    """
+
+    def check(entry):
+        for node, _ in _walk(entry["plan"]):
+            if node.get("table_name") == table and node.get("access_type") == "ALL":
+                return f"full table scan on {table}"
+        return None
+
+    check.description = f"no full table scan on {table}"
+    check.required = "every"
+    return check
+
+
+## MongoDB plan properties
+def mongodb_no_collscan(collection):
+    """
+    Fails if explain("executionStats") shows a collection scan of the collection,
+    either as a COLLSCAN stage or as collection scans inside a $lookup/EQ_LOOKUP.
+    """
+
+    def check(entry):
+        for node, namespace in _walk(entry["plan"]):
+            lookup = node.get("$lookup")
+            if isinstance(lookup, dict) and lookup.get("from") == collection and node.get("collectionScans", 0) > 0:
+                return f"$lookup from {collection} performed {node['collectionScans']} collection scan(s)"
+            if node.get("stage") == "EQ_LOOKUP" and str(node.get("foreignCollection", "")).endswith(f".{collection}") \
+                    and node.get("strategy") != "IndexedLoopJoin":
+                return f"EQ_LOOKUP into {collection} uses {node.get('strategy')} instead of an index"
+            if node.get("stage") == "COLLSCAN" and str(namespace).endswith(f".{collection}"):
+                return f"COLLSCAN on {collection}"
+        return None
+
+    check.description = f"no COLLSCAN on {collection}"
+    check.required = "every"
+    return check
+
+
+## Neo4j plan properties
+def neo4j_index_seek(label, prop):
+    """
+    Fails unless the PROFILE plan contains an index seek on label(prop).
+    """
+
+    def check(entry):
+        for node, _ in _walk(entry["plan"]):
+            operator = str(node.get("operatorType", ""))
+            details = str((node.get("arguments") or {}).get("Details", ""))
+            if "IndexSeek" in operator and f"{label}({prop})" in details.replace(" ", ""):
+                return None
+        return f"no index seek on {label}({prop})"
+
+    check.description = f"index seek on {label}({prop})"
+    check.required = "any"
+    return check
+
+
+## Checks
+def build_checks(seed = 411):
+    """
+    Returns (name, backend, run, properties) for each hot query, with inputs sampled
+    from the loaded dataset.
+    """
+
+    from utils import mysql_utils, mongodb_utils, neo4j_utils
+
+    rng = random.Random(seed)
+    universities = mysql_utils.get_all_universities()
+    keywords = mysql_utils.get_all_keywords()
+    university = rng.choice(universities)
+    keyword_set = rng.sample(keywords, min(3, len(keywords)))
+    years = mongodb_utils.get_publication_year_range()
+    faculty = mysql_utils.get_faculty_by_university(university)
+    faculty_id = faculty[0]["id"] if faculty else None
+    faculty_cursor = [faculty[0]["name"], faculty[0]["id"]] if faculty else None
+
+    return [
+        ("get_citation_ranking", "mysql", lambda: mysql_utils.get_citation_ranking(university),
+         [mysql_no_full_scan("faculty"), mysql_no_full_scan("faculty_publication"), mysql_no_full_scan("publication")]),
+        ("middle_left_query", "mysql", lambda: mysql_utils.middle_left_query(keyword_set),
+         [mysql_no_full_scan("faculty_keyword")]),
+        ("get_faculty_by_university", "mysql", lambda: mysql_utils.get_faculty_by_university(university),
+         [mysql_no_full_scan("faculty")]),
+        ("get_publications_by_faculty", "mysql", lambda: mysql_utils.get_publications_by_faculty(faculty_id),
+         [mysql_no_full_scan("faculty_publication"), mysql_no_full_scan("publication")]),
+        ("search_faculty", "mysql", lambda: mysql_utils.search_faculty(university, None, faculty_cursor, 50),
+         [mysql_no_full_scan("faculty")]),
+        ("search_publications", "mysql", lambda: mysql_utils.search_publications(faculty_id, None, 0, 50),
+         [mysql_no_full_scan("faculty_publication"), mysql_no_full_scan("publication")]),
+        ("top_right_query", "mongodb", lambda: mongodb_utils.top_right_query([university], years),
+         [mongodb_no_collscan("publications")]),
+        ("get_krc", "neo4j", lambda: neo4j_utils.get_krc(keyword_set[0]),
+         [neo4j_index_seek("KEYWORD", "name")]),
+    ]
+
+
+# Function to run every check
+def run_checks(verbose = False):
+    """
+    Runs every hot query with plan capture and evaluates its plan properties.
+
+    Returns
+    -------
+    list of str
+        One message per failed property.
+    """
+
+    from utils import slow_query_utils
+
+    failures = []
+    for name, backend, run, properties in build_checks():
+        with slow_query_utils.capture_plans() as entries:
+            run()
+        planned = [entry for entry in entries if entry["backend"] == backend and entry["plan"] is not None]
+        if not planned:
+            failures.append(f"{name}: no plan was captured")
+            print(f"FAIL  {name}: no plan was captured")
+            continue
+        for check in properties:
+            problems = [problem for problem in (check(entry) for entry in planned) if problem]
+            # "every" properties must hold for each statement the query issues,
+            # "any" properties for at least one of them
+            failed = len(problems) == len(planned) if check.required == "any" else bool(problems)
+            status = "FAIL" if failed else "ok"
+            print(f"{status:<5} {name}: {check.description}" + (f" ({problems[0]})" if failed else ""))
+            if failed:
+                failures.append(f"{name}: {problems[0]}")
+                if verbose:
+                    for entry in planned:
+                        print(entry["query"].strip(), "\n", entry["plan"])
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Check that the hot queries keep using their indexes.")
+    parser.add_argument("--database", help = "database to check (defaults to DB_NAME from the .env file)")
+    parser.add_argument("--neo4j-database", help = "Neo4j database to check (defaults to --database)")
+    parser.add_argument("--verbose", action = "store_true", help = "print the queries and plans of failed checks")
+    args = parser.parse_args()
+
+    if args.database:
+        os.environ["DB_NAME"] = args.database
+        os.environ["NEO4J_DB_NAME"] = args.neo4j_database or args.database
+
+    failures = run_checks(args.verbose)
+    if failures:
+        print(f"\n{len(failures)} plan check(s) failed")
+        sys.exit(1)
+    print("\nAll plan checks passed")
@@ -0,0 +1,88 @@
+"""
+Recall checks for the approximate nearest-neighbor index behind collaborator search.
+
+Builds collaborator_utils' index from the loaded dataset, then, for every search setting,
+compares the approximate matches of sampled faculty with the exact matches found by
+comparing them with every other faculty member, and reports the mean recall@k and search
+latency next to the exact search's. The exit code is 1 when the configured setting
+(ANN_NPROBE, ANN_LIST_SIZE, ANN_RERANK) falls below --min-recall.
+
+Run from the src folder, e.g.
+
+    python generate_data.py --scale 10
+    python check_recall.py --database academicworld_synth --samples 200
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+
+
+# Search settings compared with the configured one, as (nprobe, list_size, rerank)
+SETTINGS = [(2, 1000, 10), (4, 1000, 10), (8, 250, 10), (8, 1000, 10), (16, 1000, 10), (16, 4000, 20)]
+
+
+# Function to time a search over every sampled faculty member
+def mean_latency(search, faculty_ids):
+    """
+    Returns the mean milliseconds of search(faculty_id) over faculty_ids.
+    """
+
+    start = time.perf_counter()
+    for faculty_id in faculty_ids:
+        search(faculty_id)
+    return (time.perf_counter() - start) * 1000 / max(len(faculty_ids), 1)
+
+
+# Function to measure recall and latency for every search setting
+def run_checks(samples = 100, k = 10, seed = 411):
+    """
+    Prints the recall@k and mean latency of every setting, and returns the recall of the
+    configured one.
+    """
+
+    from utils import collaborator_utils
+
+    start = time.perf_counter()
+    index = collaborator_utils.collaborators.get()
+    print(f"Built the index over {len(index)} faculty in {time.perf_counter() - start:.1f} s")
+
+    rng = random.Random(seed)
+    faculty_ids = rng.sample(sorted(index.slot), min(samples, len(index)))
+    # Builds the exact search's matrix before timing it
+    index.exact_search(faculty_ids[0], k)
+    exact_ms = mean_latency(lambda faculty_id: index.exact_search(faculty_id, k), faculty_ids)
+    print(f"{'exact':<36} recall@{k} 1.000  {exact_ms:8.3f} ms")
+
+    configured = (collaborator_utils.nprobe, collaborator_utils.list_size, collaborator_utils.rerank)
+    configured_recall = None
+    for nprobe, list_size, rerank in sorted(set(SETTINGS + [configured])):
+        options = {"nprobe": nprobe, "list_size": list_size, "rerank": rerank}
+        recall = index.recall(faculty_ids, k, **options)
+        ms = mean_latency(lambda faculty_id: index.search(faculty_id, k, **options), faculty_ids)
+        label = f"nprobe={nprobe} list_size={list_size} rerank={rerank}"
+        marker = "  (configured)" if (nprobe, list_size, rerank) == configured else ""
+        print(f"{label:<36} recall@{k} {recall:.3f}  {ms:8.3f} ms{marker}")
+        if (nprobe, list_size, rerank) == configured:
+            configured_recall = recall
+    return configured_recall
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Measure the recall of collaborator search against an exact search.")
+    parser.add_argument("--database", help = "database to check (defaults to DB_NAME from the .env file)")
+    parser.add_argument("--samples", type = int, default = 100, help = "number of faculty to search for")
+    parser.add_argument("--k", type = int, default = 10, help = "number of matches per search")
+    parser.add_argument("--min-recall", type = float, default = 0.9, help = "lowest acceptable recall of the configured setting")
+    args = parser.parse_args()
+
+    if args.database:
+        os.environ["DB_NAME"] = args.database
+
+    recall = run_checks(args.samples, args.k)
+    if recall < args.min_recall:
+        print(f"\nRecall {recall:.3f} of the configured setting is below {args.min_recall}")
+        sys.exit(1)
+    print("\nThe configured setting meets the recall target")
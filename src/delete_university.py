@@ -0,0 +1,35 @@
+"""
+Deletes a university with all of its faculty, their keyword scores and publication links,
+and the publications left without any author, in small transactions so the dashboard keeps
+answering reads. An interrupted deletion continues where it stopped when it is run again.
+
+Run from the src folder, e.g.
+
+    python delete_university.py "University of Illinois at Urbana-Champaign"
+    python delete_university.py --resume     # finish every interrupted deletion
+"""
+
+import argparse
+
+from utils import mysql_utils
+
+
+def print_progress(state):
+    print(f"{state['faculty_deleted']} faculty deleted, {state['faculty_remaining']} remaining, {state['rows_deleted']} rows deleted")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Delete a university and everything that depends on it in batches.")
+    parser.add_argument("name", nargs = "?", help = "name of the university to delete")
+    parser.add_argument("--resume", action = "store_true", help = "finish every interrupted deletion")
+    parser.add_argument("--batch-size", type = int, default = 1000, help = "maximum rows deleted per transaction")
+    args = parser.parse_args()
+
+    if args.resume:
+        names = mysql_utils.resume_deletions(args.batch_size, print_progress)
+        print(f"Resumed {len(names)} deletion(s)" + (f": {', '.join(names)}" if names else ""))
+    elif args.name:
+        mysql_utils.delete_university(args.name, args.batch_size, print_progress)
+        print(f'Deleted "{args.name}"')
+    else:
+        parser.error("give a university name or --resume")
@@ -0,0 +1,35 @@
+"""
+Exports the aggregates behind every read-only widget from MySQL, MongoDB and Neo4j
+into a directory of memory-mappable Arrow files, which the dashboard can then serve
+without any database.
+
+Run from the src folder, e.g.
+
+    python export_snapshot.py snapshots/2025-08-01
+    SNAPSHOT_DIR=snapshots/2025-08-01 python app.py
+
+Every dashboard process started with the same SNAPSHOT_DIR maps the same files, so
+the operating system keeps a single copy of the data in its page cache.
+"""
+
+import os
+import argparse
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Export a read-only snapshot of the dashboard's data.")
+    parser.add_argument("directory", help = "directory to write the snapshot to")
+    parser.add_argument("--database", help = "database to export (defaults to DB_NAME from the .env file)")
+    parser.add_argument("--neo4j-database", help = "Neo4j database to export (defaults to --database)")
+    args = parser.parse_args()
+
+    if args.database:
+        os.environ["DB_NAME"] = args.database
+        os.environ["NEO4J_DB_NAME"] = args.neo4j_database or args.database
+
+    from utils import snapshot_utils
+
+    manifest = snapshot_utils.export_snapshot(args.directory)
+    for table, rows in manifest["rows"].items():
+        print(f"{table:<28} {rows:>10} rows")
+    print(f"\nExported to {args.directory} in {manifest['export_seconds']} s")
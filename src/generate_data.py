@@ -0,0 +1,507 @@
+"""
+Generates a synthetic academicworld dataset and bulk-loads it into local MySQL,
+MongoDB and Neo4j instances so the dashboard can be run and benchmarked without
+the course database.
+
+Run from the src folder, e.g.
+
+    python generate_data.py --scale 10 --database academicworld_synth
+
+The connection settings are read from the same .env file as the dashboard.
+Point the dashboard at the synthetic dataset by setting DB_NAME (and
+NEO4J_DB_NAME on Neo4j Community Edition, which only has one user database).
+"""
+
+import os
+import argparse
+import itertools
+from collections import defaultdict
+
+import numpy as np
+import mysql.connector
+from pymongo import MongoClient
+from neo4j import GraphDatabase
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+## Dataset size at scale 1
+# Keywords grow with the square root of the scale, like a real vocabulary does
+BASE_SIZES = {
+    "universities": 200,
+    "faculty": 3000,
+    "keywords": 2000,
+    "publications": 30000
+}
+
+BATCH_SIZE = 10000
+
+# Never overwrite the real dataset unless explicitly asked to
+PROTECTED_DATABASES = {"academicworld"}
+
+_research_words = [
+    "learning", "deep", "neural", "network", "quantum", "computing", "graph", "theory",
+    "data", "mining", "database", "systems", "distributed", "security", "privacy", "cryptography",
+    "vision", "language", "natural", "processing", "robotics", "control", "optimization", "convex",
+    "statistics", "bayesian", "inference", "causal", "signal", "wireless", "communication", "energy",
+    "materials", "polymer", "chemistry", "biology", "genomics", "protein", "cell", "cancer",
+    "climate", "ocean", "atmospheric", "economics", "finance", "markets", "policy", "education",
+    "psychology", "cognitive", "social", "media", "health", "imaging", "medical", "clinical",
+    "software", "engineering", "verification", "compilers", "architecture", "hardware", "circuits", "sensor",
+    "algorithms", "complexity", "geometry", "topology", "dynamics", "fluid", "mechanics", "structural",
+    "history", "20th century", "literature", "philosophy", "ethics", "law", "urban", "transportation"
+]
+
+_place_syllables = ["ar", "bel", "cor", "dun", "el", "fair", "glen", "har", "is", "jun", "kel", "lin",
+                    "mor", "nor", "ol", "pem", "quin", "ros", "sal", "tor", "ul", "ver", "wes", "yor"]
+
+_university_templates = ["University of {}", "{} State University", "{} Institute of Technology",
+                         "{} College", "{} University"]
+
+_first_names = ["Alex", "Maria", "Wei", "Priya", "John", "Fatima", "Carlos", "Yuki", "Olga", "Ahmed",
+                "Emma", "Raj", "Sofia", "Chen", "David", "Aisha", "Lucas", "Mei", "Noah", "Sara"]
+
+_last_names = ["Smith", "Garcia", "Wang", "Patel", "Kim", "Nguyen", "Mueller", "Rossi", "Ivanova", "Khan",
+               "Brown", "Li", "Singh", "Lopez", "Chen", "Sato", "Cohen", "Silva", "Zhang", "Johnson"]
+
+_positions = ["Assistant Professor", "Associate Professor", "Professor", "Lecturer"]
+
+_venues = ["SIGMOD", "VLDB", "NeurIPS", "ICML", "CVPR", "ACL", "Nature", "Science", "PNAS", "KDD",
+           "ICSE", "OSDI", "CHI", "STOC", "AAAI", "Cell", "JAMA", "Physical Review Letters"]
+
+
+## Dataset generation
+def _power_law_weights(n, exponent, rng):
+    """
+    Returns shuffled Zipf-like probabilities for n items.
+    """
+
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    rng.shuffle(weights)
+    return weights / weights.sum()
+
+
+def _unique_pairs(left, right):
+    """
+    Removes duplicate (left, right) pairs from two equal-length integer arrays.
+    """
+
+    pairs = np.unique(np.stack([left, right], axis = 1), axis = 0)
+    return pairs[:, 0], pairs[:, 1]
+
+
+def _keyword_names(n):
+    """
+    Returns n unique keyword names built from combinations of research words.
+    """
+
+    names = list(_research_words)
+    for size in itertools.count(2):
+        if len(names) >= n:
+            break
+        for combo in itertools.permutations(_research_words, size):
+            names.append(" ".join(combo))
+            if len(names) >= n:
+                break
+    return names[:n]
+
+
+def _university_names(n, rng):
+    """
+    Returns n unique university names built from place-name syllables.
+    """
+
+    names = set()
+    result = []
+    while len(result) < n:
+        place = "".join(rng.choice(_place_syllables, size = rng.integers(2, 4))).capitalize()
+        name = _university_templates[rng.integers(len(_university_templates))].format(place)
+        if name not in names:
+            names.add(name)
+            result.append(name)
+    return result
+
+
+# Function to generate the synthetic dataset
+def generate_dataset(scale = 1, seed = 411):
+    """
+    Generates a synthetic academicworld dataset with skewed distributions: a few
+    large universities, a few prolific faculty, a few very popular keywords and
+    heavy-tailed citation counts.
+
+    Parameters
+    ----------
+    scale : float
+        Size multiplier relative to BASE_SIZES.
+    seed : int
+        Random seed, so the same scale always produces the same dataset.
+
+    Returns
+    -------
+    dict
+        Rows for each academicworld table as lists of tuples, keyed by table name.
+    """
+
+    rng = np.random.default_rng(seed)
+    n_univ = max(1, int(BASE_SIZES["universities"] * scale))
+    n_fac = max(1, int(BASE_SIZES["faculty"] * scale))
+    n_kw = max(1, int(BASE_SIZES["keywords"] * np.sqrt(scale)))
+    n_pub = max(1, int(BASE_SIZES["publications"] * scale))
+
+    # Universities
+    university_names = _university_names(n_univ, rng)
+    universities = [(i + 1, name, f"https://example.edu/logos/{i + 1}.png") for i, name in enumerate(university_names)]
+
+    # Keywords, with Zipf-distributed popularity
+    keyword_names = _keyword_names(n_kw)
+    keywords = [(i + 1, name) for i, name in enumerate(keyword_names)]
+    keyword_weights = _power_law_weights(n_kw, 1.0, rng)
+
+    # Faculty, assigned to universities with a power-law size distribution
+    faculty_university = rng.choice(n_univ, size = n_fac, p = _power_law_weights(n_univ, 1.1, rng)) + 1
+    first = rng.choice(_first_names, size = n_fac)
+    last = rng.choice(_last_names, size = n_fac)
+    position = rng.choice(_positions, size = n_fac)
+    faculty = [
+        (i + 1, f"{first[i]} {last[i]}", str(position[i]), None, f"faculty{i + 1}@example.edu", None, None, int(faculty_university[i]))
+        for i in range(n_fac)
+    ]
+
+    # Faculty keywords: 3-10 keywords per faculty member drawn by popularity
+    per_faculty = rng.integers(3, 11, size = n_fac)
+    fk_faculty = np.repeat(np.arange(1, n_fac + 1), per_faculty)
+    fk_keyword = rng.choice(n_kw, size = fk_faculty.size, p = keyword_weights) + 1
+    fk_faculty, fk_keyword = _unique_pairs(fk_faculty, fk_keyword)
+    fk_score = np.round(rng.gamma(2.0, 5.0, size = fk_faculty.size), 4)
+    faculty_keyword = list(zip(fk_faculty.tolist(), fk_keyword.tolist(), fk_score.tolist()))
+
+    # Publications with heavy-tailed citations, skewed towards recent years
+    years = np.clip(2022 - rng.exponential(12, size = n_pub).astype(int), 1950, 2022)
+    citations = (rng.pareto(1.3, size = n_pub) * 4).astype(int)
+    venues = rng.choice(_venues, size = n_pub)
+    title_words = rng.choice(_research_words, size = (n_pub, 4))
+    publications = [
+        (i + 1, " ".join(title_words[i]).capitalize(), str(venues[i]), int(years[i]), int(citations[i]))
+        for i in range(n_pub)
+    ]
+
+    # Faculty publications: 1-3 authors per publication, drawn by (Pareto) productivity
+    authors = 1 + rng.binomial(2, 0.3, size = n_pub)
+    fp_publication = np.repeat(np.arange(1, n_pub + 1), authors)
+    productivity = rng.pareto(1.2, size = n_fac) + 1
+    fp_faculty = rng.choice(n_fac, size = fp_publication.size, p = productivity / productivity.sum()) + 1
+    fp_faculty, fp_publication = _unique_pairs(fp_faculty, fp_publication)
+    faculty_publication = list(zip(fp_faculty.tolist(), fp_publication.tolist()))
+
+    # Publication keywords: 1-5 keywords per publication drawn by popularity
+    per_publication = rng.integers(1, 6, size = n_pub)
+    pk_publication = np.repeat(np.arange(1, n_pub + 1), per_publication)
+    pk_keyword = rng.choice(n_kw, size = pk_publication.size, p = keyword_weights) + 1
+    pk_publication, pk_keyword = _unique_pairs(pk_publication, pk_keyword)
+    pk_score = np.round(rng.uniform(0.05, 1.0, size = pk_publication.size), 4)
+    publication_keyword = list(zip(pk_publication.tolist(), pk_keyword.tolist(), pk_score.tolist()))
+
+    return {
+        "university": universities,
+        "keyword": keywords,
+        "faculty": faculty,
+        "publication": publications,
+        "faculty_keyword": faculty_keyword,
+        "faculty_publication": faculty_publication,
+        "publication_keyword": publication_keyword
+    }
+
+
+def _batches(rows, size = BATCH_SIZE):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+## MySQL loader
+mysql_schema = [
+    """CREATE TABLE university (
+        id INT PRIMARY KEY,
+        name VARCHAR(255) NOT NULL UNIQUE,
+        photo_url VARCHAR(512)
+    )""",
+    """CREATE TABLE keyword (
+        id INT PRIMARY KEY,
+        name VARCHAR(512)
+    )""",
+    """CREATE TABLE faculty (
+        id INT PRIMARY KEY,
+        name VARCHAR(512),
+        position VARCHAR(512),
+        research_interest VARCHAR(512),
+        email VARCHAR(512),
+        phone VARCHAR(512),
+        photo_url VARCHAR(512),
+        university_id INT,
+        FOREIGN KEY (university_id) REFERENCES university(id)
+    )""",
+    """CREATE TABLE publication (
+        id INT PRIMARY KEY,
+        title VARCHAR(512),
+        venue VARCHAR(512),
+        year INT,
+        num_citations INT
+    )""",
+    """CREATE TABLE faculty_keyword (
+        faculty_id INT,
+        keyword_id INT,
+        score FLOAT,
+        PRIMARY KEY (faculty_id, keyword_id),
+        FOREIGN KEY (faculty_id) REFERENCES faculty(id),
+        FOREIGN KEY (keyword_id) REFERENCES keyword(id)
+    )""",
+    """CREATE TABLE faculty_publication (
+        faculty_id INT,
+        publication_id INT,
+        PRIMARY KEY (faculty_id, publication_id),
+        FOREIGN KEY (faculty_id) REFERENCES faculty(id),
+        FOREIGN KEY (publication_id) REFERENCES publication(id)
+    )""",
+    """CREATE TABLE publication_keyword (
+        publication_id INT,
+        keyword_id INT,
+        score FLOAT,
+        PRIMARY KEY (publication_id, keyword_id),
+        FOREIGN KEY (publication_id) REFERENCES publication(id),
+        FOREIGN KEY (keyword_id) REFERENCES keyword(id)
+    )"""
+]
+
+mysql_tables = ["university", "keyword", "faculty", "publication", "faculty_keyword", "faculty_publication", "publication_keyword"]
+
+
+# Function to load the dataset into MySQL
+def load_mysql(dataset, database):
+    """
+    Drops and recreates the academicworld tables in the given MySQL database and bulk-loads the dataset.
+
+    Parameters
+    ----------
+    dataset : dict
+        The dataset returned by generate_dataset.
+    database : str
+        The MySQL database to load into. It is created if it does not exist.
+    """
+
+    mysql_conn = mysql.connector.connect(
+        host = "localhost",
+        port = os.getenv("MYSQL_DB_PORT"),
+        user = os.getenv("MYSQL_DB_USER"),
+        password = os.getenv("MYSQL_DB_PASSWORD")
+    )
+    mysql_cursor = mysql_conn.cursor()
+    try:
+        mysql_cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{database}`")
+        mysql_cursor.execute(f"USE `{database}`")
+        mysql_cursor.execute("SET foreign_key_checks = 0")
+        mysql_cursor.execute("SET unique_checks = 0")
+        mysql_cursor.execute("DROP VIEW IF EXISTS university_keyword_score")
+        mysql_cursor.execute("DROP TABLE IF EXISTS outbox")
+        mysql_cursor.execute("DROP TABLE IF EXISTS deletion_job")
+        # The precomputed aggregates (see utils/aggregate_utils.py), with their build copies,
+        # describe the previous dataset and its outbox
+        mysql_cursor.execute("DROP TABLE IF EXISTS aggregate_freshness")
+        mysql_cursor.execute("SELECT table_name FROM information_schema.tables WHERE table_schema = %s AND table_name LIKE 'agg\\_%%'", (database, ))
+        for (table, ) in mysql_cursor.fetchall():
+            mysql_cursor.execute(f"DROP TABLE IF EXISTS `{table}`")
+        for table in reversed(mysql_tables):
+            mysql_cursor.execute(f"DROP TABLE IF EXISTS {table}")
+        for statement in mysql_schema:
+            mysql_cursor.execute(statement)
+
+        for table in mysql_tables:
+            rows = dataset[table]
+            placeholders = ", ".join(["%s"] * len(rows[0]))
+            for batch in _batches(rows):
+                mysql_cursor.executemany(f"INSERT INTO {table} VALUES ({placeholders})", batch)
+            mysql_conn.commit()
+            print(f"MySQL: loaded {len(rows)} rows into {table}")
+
+        mysql_cursor.execute("SET foreign_key_checks = 1")
+        mysql_cursor.execute("SET unique_checks = 1")
+    finally:
+        mysql_cursor.close()
+        mysql_conn.close()
+
+
+## MongoDB loader
+# Function to load the dataset into MongoDB
+def load_mongodb(dataset, database):
+    """
+    Replaces the faculty and publications collections in the given MongoDB database with the dataset.
+
+    Parameters
+    ----------
+    dataset : dict
+        The dataset returned by generate_dataset.
+    database : str
+        The MongoDB database to load into.
+    """
+
+    mongo_client = MongoClient(f"mongodb://localhost:{os.getenv('MONGO_PORT')}/")
+    mongo_db = mongo_client[database]
+
+    universities = {row[0]: row for row in dataset["university"]}
+    keyword_names = {row[0]: row[1] for row in dataset["keyword"]}
+
+    faculty_keywords = defaultdict(list)
+    for faculty_id, keyword_id, score in dataset["faculty_keyword"]:
+        faculty_keywords[faculty_id].append({"name": keyword_names[keyword_id], "score": score})
+    faculty_publications = defaultdict(list)
+    for faculty_id, publication_id in dataset["faculty_publication"]:
+        faculty_publications[faculty_id].append(publication_id)
+    publication_keywords = defaultdict(list)
+    for publication_id, keyword_id, score in dataset["publication_keyword"]:
+        publication_keywords[publication_id].append({"name": keyword_names[keyword_id], "score": score})
+
+    faculty_docs = []
+    for faculty_id, name, position, interest, email, phone, photo_url, university_id in dataset["faculty"]:
+        university = universities[university_id]
+        faculty_docs.append({
+            "id": faculty_id,
+            "name": name,
+            "position": position,
+            "researchInterest": interest,
+            "email": email,
+            "phone": phone,
+            "photoUrl": photo_url,
+            "affiliation": {"id": university[0], "name": university[1], "photoUrl": university[2]},
+            "keywords": faculty_keywords[faculty_id],
+            "publications": faculty_publications[faculty_id]
+        })
+    publication_docs = [
+        {
+            "id": publication_id,
+            "title": title,
+            "venue": venue,
+            "year": year,
+            "numCitations": num_citations,
+            "keywords": publication_keywords[publication_id]
+        }
+        for publication_id, title, venue, year, num_citations in dataset["publication"]
+    ]
+
+    for collection, docs in (("faculty", faculty_docs), ("publications", publication_docs)):
+        mongo_db.drop_collection(collection)
+        for batch in _batches(docs):
+            mongo_db[collection].insert_many(batch, ordered = False)
+        print(f"MongoDB: loaded {len(docs)} documents into {collection}")
+
+    mongo_db.publications.create_index([("id", 1)])
+    mongo_client.close()
+
+
+## Neo4j loader
+neo4j_node_queries = {
+    "university": ("UNWIND $rows AS row CREATE (:INSTITUTE {id: row[0], name: row[1], photoUrl: row[2]})"),
+    "keyword": ("UNWIND $rows AS row CREATE (:KEYWORD {id: row[0], name: row[1]})"),
+    "faculty": ("UNWIND $rows AS row CREATE (:FACULTY {id: row[0], name: row[1], position: row[2], "
+                "researchInterest: row[3], email: row[4], phone: row[5], photoUrl: row[6]})"),
+    "publication": ("UNWIND $rows AS row CREATE (:PUBLICATION {id: row[0], title: row[1], venue: row[2], "
+                    "year: row[3], numCitations: row[4]})")
+}
+
+neo4j_relationship_queries = {
+    "faculty": ("UNWIND $rows AS row MATCH (f:FACULTY {id: row[0]}), (u:INSTITUTE {id: row[7]}) "
+                "CREATE (f)-[:AFFILIATION_WITH]->(u)"),
+    "faculty_keyword": ("UNWIND $rows AS row MATCH (f:FACULTY {id: row[0]}), (k:KEYWORD {id: row[1]}) "
+                        "CREATE (f)-[:INTERESTED_IN {score: row[2]}]->(k)"),
+    "faculty_publication": ("UNWIND $rows AS row MATCH (f:FACULTY {id: row[0]}), (p:PUBLICATION {id: row[1]}) "
+                            "CREATE (f)-[:PUBLISH]->(p)"),
+    "publication_keyword": ("UNWIND $rows AS row MATCH (p:PUBLICATION {id: row[0]}), (k:KEYWORD {id: row[1]}) "
+                            "CREATE (p)-[:LABEL_BY {score: row[2]}]->(k)")
+}
+
+
+# Function to load the dataset into Neo4j
+def load_neo4j(dataset, database):
+    """
+    Deletes every node in the given Neo4j database and loads the dataset with batched UNWIND writes.
+
+    Parameters
+    ----------
+    dataset : dict
+        The dataset returned by generate_dataset.
+    database : str
+        The Neo4j database to load into.
+    """
+
+    driver = GraphDatabase.driver(
+        f"bolt://localhost:{os.getenv('NEO4J_DB_PORT')}",
+        auth = (os.getenv("NEO4J_DB_USER"), os.getenv("NEO4J_DB_PASSWORD"))
+    )
+    try:
+        # Delete in batches so the transaction state stays small
+        while True:
+            records, _, _ = driver.execute_query(
+                "MATCH (n) WITH n LIMIT $limit DETACH DELETE n RETURN count(*) AS deleted",
+                {"limit": BATCH_SIZE},
+                database_ = database
+            )
+            if records[0]["deleted"] == 0:
+                break
+
+        for label in ("INSTITUTE", "KEYWORD", "FACULTY", "PUBLICATION"):
+            driver.execute_query(
+                f"CREATE INDEX {label.lower()}_id IF NOT EXISTS FOR (n:{label}) ON (n.id)",
+                database_ = database
+            )
+
+        for table, query in neo4j_node_queries.items():
+            for batch in _batches(dataset[table]):
+                driver.execute_query(query, {"rows": [list(row) for row in batch]}, database_ = database)
+            print(f"Neo4j: created {len(dataset[table])} nodes from {table}")
+        for table, query in neo4j_relationship_queries.items():
+            for batch in _batches(dataset[table]):
+                driver.execute_query(query, {"rows": [list(row) for row in batch]}, database_ = database)
+            print(f"Neo4j: created {len(dataset[table])} relationships from {table}")
+    finally:
+        driver.close()
+
+
+# Function to generate and load the dataset into every store
+def load_all(scale, database, neo4j_database = None, seed = 411, force = False):
+    """
+    Generates the dataset at the given scale and loads it into MySQL, MongoDB and Neo4j.
+
+    Parameters
+    ----------
+    scale : float
+        Size multiplier relative to BASE_SIZES.
+    database : str
+        The MySQL and MongoDB database to load into.
+    neo4j_database : str, optional
+        The Neo4j database to load into. Defaults to database.
+    seed : int
+        Random seed for the generator.
+    force : bool
+        Allow loading into a protected database such as academicworld.
+    """
+
+    neo4j_database = neo4j_database or database
+    if not force and (database in PROTECTED_DATABASES or neo4j_database in PROTECTED_DATABASES):
+        raise ValueError(f"Refusing to overwrite the {database} database without --force.")
+
+    dataset = generate_dataset(scale, seed)
+    load_mysql(dataset, database)
+    load_mongodb(dataset, database)
+    load_neo4j(dataset, neo4j_database)
+    return dataset
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Generate and load a synthetic academicworld dataset.")
+    parser.add_argument("--scale", type = float, default = 1, help = "size multiplier (1 = %d universities, %d faculty, %d publications)" % (
+        BASE_SIZES["universities"], BASE_SIZES["faculty"], BASE_SIZES["publications"]))
+    parser.add_argument("--database", default = "academicworld_synth", help = "MySQL/MongoDB database to load into")
+    parser.add_argument("--neo4j-database", default = None, help = "Neo4j database to load into (defaults to --database)")
+    parser.add_argument("--seed", type = int, default = 411)
+    parser.add_argument("--force", action = "store_true", help = "allow overwriting the academicworld database")
+    args = parser.parse_args()
+
+    load_all(args.scale, args.database, args.neo4j_database, args.seed, args.force)
@@ -0,0 +1,399 @@
+"""
+Load-tests the running dashboard by replaying realistic Dash callback traffic
+against its /_dash-update-component endpoint with concurrent virtual users.
+
+Each virtual user repeatedly runs one of the session scripts below, keeping its
+own copy of the component values and updating it from the callback responses
+the same way the browser does:
+
+- typeahead: types a keyword one character at a time, then selects it in both keyword widgets
+- slider: drags the year range slider of the publications-over-time widget
+- multiselect: selects universities one by one in the publications-over-time and citation widgets
+- publication: picks a faculty member, then adds, edits and deletes a publication (only with --with-writes)
+
+Run it fully locally against the synthetic dataset, e.g.
+
+    python generate_data.py --scale 10
+    python load_test.py --start-app --database academicworld_synth --users 25 --duration 60
+    python load_test.py --start-app --database academicworld_synth --users 25 --duration 60 --with-writes
+
+The report lists p50/p95/p99 latency and throughput for every callback.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+import subprocess
+from collections import defaultdict
+
+import requests
+
+
+## Callbacks, identified by one of their outputs and their first input
+CALLBACKS = {
+    "update_citation_table": ("citation-ranking-chart.figure", "citation-search-input.value"),
+    "update_line_chart": ("university-publications-over-time.figure", "university-dropdown.value"),
+    "update_keyword_dropdown": ("keyword-input.options", "keyword-input.search_value"),
+    "update_bar_chart": ("top-universities-by-keyword-score.figure", "keyword-input.value"),
+    "update_krc_chart": ("krc-bar-chart.figure", "krc-keyword-input.value"),
+    "update_faculty_options": ("faculty-dropdown.options", "update-pub-univ-input.value"),
+    "update_publication_options": ("publication-dropdown.options", "faculty-dropdown.value"),
+    "fill_update_pub_modal": ("update-pub-title.value", "edit-publication-btn.n_clicks"),
+    "update_publication": ("update-pub-modal.is_open", "confirm-update-pub.n_clicks"),
+    "add_or_delete_publication": ("pub-refresh-trigger.data", "confirm-add-pub.n_clicks"),
+}
+
+
+def _split_output(output):
+    """
+    Splits a Dash output string ("id.prop" or "..id1.prop1...id2.prop2..") into its parts.
+    """
+
+    if output.startswith(".."):
+        parts = output[2:-2].split("...")
+    else:
+        parts = [output]
+    return [dict(zip(("id", "property"), part.rsplit(".", 1))) for part in parts]
+
+
+def _strip(prop_id):
+    """
+    Removes the allow_duplicate suffix from an "id.prop@hash" string.
+    """
+
+    return prop_id.split("@")[0]
+
+
+def _find_component(node, component_id):
+    """
+    Returns the props of the component with the given id in a serialized Dash layout.
+    """
+
+    if isinstance(node, dict):
+        props = node.get("props")
+        if isinstance(props, dict) and props.get("id") == component_id:
+            return props
+        children = node.get("props", {}).get("children") if isinstance(node.get("props"), dict) else None
+        return _find_component(children, component_id)
+    if isinstance(node, list):
+        for child in node:
+            found = _find_component(child, component_id)
+            if found is not None:
+                return found
+    return None
+
+
+class Dashboard:
+    """
+    Describes the callbacks and initial data of a running dashboard.
+
+    Parameters
+    ----------
+    url : str
+        Base URL of the dashboard, e.g. http://127.0.0.1:8050.
+    """
+
+    def __init__(self, url):
+        self.url = url.rstrip("/")
+        dependencies = requests.get(f"{self.url}/_dash-dependencies", timeout = 30).json()
+        layout = requests.get(f"{self.url}/_dash-layout", timeout = 30).json()
+
+        self.callbacks = {}
+        for name, (output, first_input) in CALLBACKS.items():
+            for dependency in dependencies:
+                outputs = [_strip(f"{part['id']}.{part['property']}") for part in _split_output(dependency["output"])]
+                inputs = [f"{item['id']}.{item['property']}" for item in dependency["inputs"]]
+                if output in outputs and inputs and inputs[0] == first_input:
+                    self.callbacks[name] = dependency
+                    break
+            else:
+                raise RuntimeError(f"Callback {name} not found in {self.url}/_dash-dependencies")
+
+        universities = _find_component(layout, "citation-search-input") or {}
+        self.universities = [option["value"] for option in universities.get("options", [])]
+        slider = _find_component(layout, "year-range-slider") or {}
+        self.year_range = [slider.get("min"), slider.get("max")]
+        self.keywords = []
+
+    def load_keywords(self, session):
+        """
+        Fetches the default keyword options the same way the page does on load.
+        """
+
+        response = session.call("update_keyword_dropdown", {})
+        options = response.get("keyword-input", {}).get("options", []) if response else []
+        self.keywords = [option["value"] for option in options]
+
+
+class Session:
+    """
+    A virtual user: holds component values and sends callback requests.
+    """
+
+    def __init__(self, dashboard, recorder, rng):
+        self.dashboard = dashboard
+        self.recorder = recorder
+        self.rng = rng
+        self.http = requests.Session()
+        self.values = {}
+
+    def call(self, name, changes):
+        """
+        Applies the changed component values and fires the named callback.
+
+        Parameters
+        ----------
+        name : str
+            Callback name from CALLBACKS.
+        changes : dict
+            {"id.prop": value} of the properties that changed and trigger the callback.
+
+        Returns
+        -------
+        dict or None
+            The response as {component_id: {prop: value}}, or None on error or no update.
+        """
+
+        self.values.update(changes)
+        dependency = self.dashboard.callbacks[name]
+        outputs = _split_output(dependency["output"])
+        payload = {
+            "output": dependency["output"],
+            "outputs": outputs if dependency["output"].startswith("..") else outputs[0],
+            "inputs": [dict(item, value = self.values.get(f"{item['id']}.{item['property']}")) for item in dependency["inputs"]],
+            "state": [dict(item, value = self.values.get(f"{item['id']}.{item['property']}")) for item in dependency["state"]],
+            "changedPropIds": list(changes) or [f"{dependency['inputs'][0]['id']}.{dependency['inputs'][0]['property']}"]
+        }
+
+        start = time.perf_counter()
+        try:
+            response = self.http.post(f"{self.dashboard.url}/_dash-update-component", json = payload, timeout = 60)
+            ok = response.status_code in (200, 204)
+        except requests.RequestException:
+            response, ok = None, False
+        self.recorder.record(name, time.perf_counter() - start, ok)
+
+        if not ok or response.status_code == 204:
+            return None
+        body = response.json().get("response", {})
+        for component_id, props in body.items():
+            for prop, value in props.items():
+                self.values[f"{component_id}.{prop}"] = value
+        return body
+
+    def think(self, low, high):
+        time.sleep(self.rng.uniform(low, high))
+
+    ## Session scripts
+    def typeahead(self):
+        if not self.dashboard.keywords:
+            return
+        keyword = self.rng.choice(self.dashboard.keywords)
+        for i in range(1, min(len(keyword), 8) + 1):
+            self.call("update_keyword_dropdown", {"keyword-input.search_value": keyword[:i]})
+            self.think(0.05, 0.15)
+        selected = (self.values.get("keyword-input.value") or [])[-2:] + [keyword]
+        self.call("update_bar_chart", {"keyword-input.value": selected})
+        self.think(0.5, 2.0)
+        self.call("update_krc_chart", {"krc-keyword-input.value": keyword})
+        self.think(0.5, 2.0)
+
+    def slider(self):
+        start, end = self.dashboard.year_range
+        if start is None or end is None:
+            return
+        low, high = start, end
+        for _ in range(self.rng.randint(5, 15)):
+            if self.rng.random() < 0.5:
+                low = min(high, low + self.rng.randint(1, 3))
+            else:
+                high = max(low, high - self.rng.randint(1, 3))
+            self.call("update_line_chart", {"year-range-slider.value": [low, high]})
+            self.think(0.03, 0.08)
+        self.think(0.5, 2.0)
+
+    def multiselect(self):
+        if not self.dashboard.universities:
+            return
+        selected = []
+        for university in self.rng.sample(self.dashboard.universities, min(self.rng.randint(1, 5), len(self.dashboard.universities))):
+            selected.append(university)
+            self.call("update_line_chart", {"university-dropdown.value": list(selected)})
+            self.think(0.3, 1.0)
+        self.call("update_citation_table", {"citation-search-input.value": selected[-1]})
+        self.think(0.5, 2.0)
+
+    def publication(self):
+        if not self.dashboard.universities:
+            return
+        response = self.call("update_faculty_options", {"update-pub-univ-input.value": self.rng.choice(self.dashboard.universities)})
+        faculty = [option for option in (response or {}).get("faculty-dropdown", {}).get("options") or [] if option["value"] != "load-more"]
+        if not faculty:
+            return
+        self.think(0.5, 1.5)
+        self.call("update_publication_options", {"faculty-dropdown.value": self.rng.choice(faculty)["value"]})
+        self.think(0.5, 1.5)
+
+        # Add
+        title = f"Load test publication {self.rng.getrandbits(32):08x}"
+        clicks = self.values.get("confirm-add-pub.n_clicks") or 0
+        self.values.update({"add-pub-title.value": title, "add-pub-venue.value": "LOAD", "add-pub-year.value": 2024})
+        self.call("add_or_delete_publication", {"confirm-add-pub.n_clicks": clicks + 1})
+        self.call("update_publication_options", {"pub-refresh-trigger.data": self.values.get("pub-refresh-trigger.data")})
+        response = self.call("update_publication_options", {"publication-dropdown.search_value": title})
+        publications = (response or {}).get("publication-dropdown", {}).get("options") or []
+        created = [option["value"] for option in publications if option["label"] == title]
+        if not created:
+            return
+        self.values["publication-dropdown.value"] = created[0]
+        self.think(0.5, 1.5)
+
+        # Edit
+        self.call("fill_update_pub_modal", {"edit-publication-btn.n_clicks": (self.values.get("edit-publication-btn.n_clicks") or 0) + 1})
+        self.think(1.0, 3.0)
+        self.values["update-pub-num-citations.value"] = self.rng.randint(0, 50)
+        self.call("update_publication", {"confirm-update-pub.n_clicks": (self.values.get("confirm-update-pub.n_clicks") or 0) + 1})
+        self.think(0.5, 1.5)
+
+        # Delete
+        self.call("add_or_delete_publication", {"delete-publication-btn.n_clicks": (self.values.get("delete-publication-btn.n_clicks") or 0) + 1})
+        self.call("update_publication_options", {"pub-refresh-trigger.data": self.values.get("pub-refresh-trigger.data")})
+
+
+# Session scripts and their weights; the write scripts only run with --with-writes
+SCRIPTS = {"typeahead": 4, "slider": 3, "multiselect": 3, "publication": 1}
+WRITE_SCRIPTS = ("publication", )
+
+
+class Recorder:
+    """
+    Thread-safe collection of (callback, latency, ok) samples.
+    """
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.lock = threading.Lock()
+
+    def record(self, name, seconds, ok):
+        with self.lock:
+            self.samples[name].append(seconds)
+            if not ok:
+                self.errors[name] += 1
+
+
+def _percentile(sorted_values, q):
+    """
+    Nearest-rank percentile of an already sorted list.
+    """
+
+    index = max(0, min(len(sorted_values) - 1, int(round(q / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+# Function to summarize the recorded samples
+def report(recorder, elapsed):
+    """
+    Returns per-callback request counts, error counts, throughput and p50/p95/p99 latency in ms.
+    """
+
+    summary = {}
+    for name, samples in sorted(recorder.samples.items()):
+        samples = sorted(samples)
+        summary[name] = {
+            "requests": len(samples),
+            "errors": recorder.errors[name],
+            "throughput_rps": round(len(samples) / elapsed, 2),
+            "p50_ms": round(_percentile(samples, 50) * 1000, 1),
+            "p95_ms": round(_percentile(samples, 95) * 1000, 1),
+            "p99_ms": round(_percentile(samples, 99) * 1000, 1)
+        }
+    return summary
+
+
+def run(url, users, duration, ramp_up, scripts, seed):
+    """
+    Runs the virtual users for the given duration and returns the report.
+    """
+
+    dashboard = Dashboard(url)
+    recorder = Recorder()
+    dashboard.load_keywords(Session(dashboard, Recorder(), random.Random(seed)))
+
+    names = [name for name in SCRIPTS if name in scripts]
+    weights = [SCRIPTS[name] for name in names]
+    deadline = time.monotonic() + ramp_up + duration
+
+    def virtual_user(index):
+        rng = random.Random(seed + index)
+        time.sleep(ramp_up * index / max(1, users))
+        session = Session(dashboard, recorder, rng)
+        while time.monotonic() < deadline:
+            getattr(session, rng.choices(names, weights)[0])()
+
+    threads = [threading.Thread(target = virtual_user, args = (i,), daemon = True) for i in range(users)]
+    start = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return report(recorder, time.monotonic() - start)
+
+
+def start_app(url, database):
+    """
+    Starts app.py against the given database and waits until it serves the layout.
+    """
+
+    env = dict(os.environ, DB_NAME = database, NEO4J_DB_NAME = os.getenv("NEO4J_DB_NAME", database))
+    process = subprocess.Popen([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")], env = env)
+    for _ in range(120):
+        try:
+            if requests.get(f"{url}/_dash-layout", timeout = 1).ok:
+                return process
+        except requests.RequestException:
+            pass
+        time.sleep(1)
+    process.terminate()
+    raise RuntimeError("The dashboard did not start within 2 minutes")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Replay concurrent Dash callback traffic against the dashboard.")
+    parser.add_argument("--url", default = "http://127.0.0.1:8050")
+    parser.add_argument("--users", type = int, default = 10, help = "number of concurrent virtual users")
+    parser.add_argument("--duration", type = float, default = 60, help = "seconds to run after ramp-up")
+    parser.add_argument("--ramp-up", type = float, default = 10, help = "seconds over which users are started")
+    parser.add_argument("--scripts", nargs = "+", choices = list(SCRIPTS), help = "session scripts to run (defaults to every read-only script, and the write scripts with --with-writes)")
+    parser.add_argument("--with-writes", action = "store_true", help = "also run the publication add/edit/delete script, which writes to the database")
+    parser.add_argument("--seed", type = int, default = 411)
+    parser.add_argument("--start-app", action = "store_true", help = "start app.py against --database for the duration of the test")
+    parser.add_argument("--database", default = "academicworld_synth")
+    parser.add_argument("--output", help = "also write the report to a JSON file")
+    args = parser.parse_args()
+
+    scripts = args.scripts or [name for name in SCRIPTS if args.with_writes or name not in WRITE_SCRIPTS]
+    writes = [name for name in scripts if name in WRITE_SCRIPTS]
+    if writes and not args.with_writes:
+        parser.error(f"the {', '.join(writes)} script writes to the database; pass --with-writes to run it")
+    if args.start_app and args.database == "academicworld" and writes:
+        sys.exit("Refusing to run the publication script against the academicworld database; drop --with-writes.")
+
+    app_process = start_app(args.url, args.database) if args.start_app else None
+    try:
+        summary = run(args.url, args.users, args.duration, args.ramp_up, scripts, args.seed)
+    finally:
+        if app_process:
+            app_process.terminate()
+
+    print(f"\n{'callback':<28} {'requests':>9} {'errors':>7} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, stats in summary.items():
+        print(f"{name:<28} {stats['requests']:>9} {stats['errors']:>7} {stats['throughput_rps']:>8} "
+              f"{stats['p50_ms']:>9} {stats['p95_ms']:>9} {stats['p99_ms']:>9}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent = 2)
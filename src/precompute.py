@@ -0,0 +1,51 @@
+"""
+Rebuilds the precomputed aggregates behind the citation ranking, publications over time,
+keyword score and KRC widgets in MySQL (see utils/aggregate_utils.py). Aggregates are
+built in dependency order, each split into partitions by university or publication that a
+pool of worker processes computes in parallel.
+
+By default only the universities and publications changed since the last run, according to
+the outbox, are recomputed; aggregates never built before are built in full. Run with --full
+after loading data outside the dashboard (e.g. with generate_data.py), since such loads do
+not write to the outbox.
+
+Run from the src folder, e.g.
+
+    python precompute.py --full                 # after loading the academicworld data
+    python precompute.py                        # e.g. every few minutes from cron
+    python precompute.py --only agg_publication_krc --workers 4
+"""
+
+import os
+import time
+import argparse
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Rebuild the precomputed aggregates read by the dashboard.")
+    parser.add_argument("--database", help = "database to precompute (defaults to DB_NAME from the .env file)")
+    parser.add_argument("--full", action = "store_true", help = "rebuild every aggregate from scratch instead of only what changed")
+    parser.add_argument("--only", nargs = "+", metavar = "AGGREGATE", help = "rebuild only these aggregates and those that depend on them")
+    parser.add_argument("--workers", type = int, default = os.cpu_count(), help = "number of worker processes (defaults to the number of cores)")
+    parser.add_argument("--partitions", type = int, help = "number of partitions of a full rebuild (defaults to 4 per worker)")
+    parser.add_argument("--list", action = "store_true", help = "list the aggregates in build order and exit")
+    args = parser.parse_args()
+
+    if args.database:
+        os.environ["DB_NAME"] = args.database
+
+    from utils import aggregate_utils
+
+    if args.list:
+        for number, level in enumerate(aggregate_utils.levels(), 1):
+            for name in level:
+                depends_on = aggregate_utils.AGGREGATES[name].depends_on
+                print(f"{number}. {name}" + (f" (after {', '.join(depends_on)})" if depends_on else ""))
+        raise SystemExit
+
+    start = time.perf_counter()
+    try:
+        summary = aggregate_utils.precompute(args.only, args.full, args.workers, args.partitions)
+    except ValueError as e:
+        parser.error(str(e))
+    print(f"\nPrecomputed {len(summary)} aggregates with {args.workers} workers in {time.perf_counter() - start:.1f} s")
@@ -0,0 +1,50 @@
+"""
+Lists the worst offenders in the slow query log written by the utils modules when
+SLOW_QUERY_THRESHOLD_MS is set.
+
+Run from the src folder, e.g.
+
+    python slow_queries.py                  # slowest queries by max duration
+    python slow_queries.py --sort total     # queries that cost the most time overall
+    python slow_queries.py --plan 3f2a9c01  # print the captured plan of one query
+"""
+
+import json
+import argparse
+from datetime import datetime
+
+from utils import slow_query_utils
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Show the worst offenders in the slow query log.")
+    parser.add_argument("--log", default = slow_query_utils.log_path, help = "path of the slow query log")
+    parser.add_argument("--sort", choices = ["max", "total", "count"], default = "max")
+    parser.add_argument("--limit", type = int, default = 20)
+    parser.add_argument("--backend", choices = ["mysql", "mongodb", "neo4j"])
+    parser.add_argument("--plan", metavar = "FINGERPRINT", help = "print the slowest entry and latest plan of one query")
+    args = parser.parse_args()
+
+    entries = slow_query_utils.read_log(args.log)
+    if args.backend:
+        entries = [entry for entry in entries if entry["backend"] == args.backend]
+    if not entries:
+        print(f"No slow queries logged in {args.log}")
+        raise SystemExit(0)
+
+    if args.plan:
+        groups = [group for group in slow_query_utils.worst_offenders(entries, limit = None) if group["fingerprint"].startswith(args.plan)]
+        if not groups:
+            raise SystemExit(f"No query with fingerprint {args.plan}")
+        group = groups[0]
+        print(f"{group['backend']} {group['function']}: {group['count']} slow runs, max {group['max_ms']:.1f} ms\n")
+        print(group["slowest"]["query"].strip())
+        print(f"\nParameters: {json.dumps(group['slowest']['params'], default = str)}\n")
+        print(json.dumps(group["plan"], indent = 2, default = str) if group["plan"] else "No plan captured yet.")
+        raise SystemExit(0)
+
+    print(f"{'fingerprint':<13} {'backend':<8} {'function':<32} {'count':>6} {'max ms':>10} {'total ms':>11} {'plan':>5}  slowest run at")
+    for group in slow_query_utils.worst_offenders(entries, args.sort, args.limit):
+        slowest_at = datetime.fromtimestamp(group["slowest"]["time"]).strftime("%Y-%m-%d %H:%M:%S")
+        print(f"{group['fingerprint']:<13} {group['backend']:<8} {group['function']:<32} {group['count']:>6} "
+              f"{group['max_ms']:>10.1f} {group['total_ms']:>11.1f} {'yes' if group['plan'] else 'no':>5}  {slowest_at}")
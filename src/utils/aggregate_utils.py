@@ -0,0 +1,564 @@
+import os
+import time
+import heapq
+import multiprocessing
+import mysql.connector
+from dotenv import load_dotenv
+from . import mysql_utils
+
+load_dotenv()
+
+
+## Precompute configuration
+# Outbox entries written this many seconds before the previous run's watermark are read
+# again by an incremental run, since an entry with a lower id can commit after a higher one
+# (see mysql_utils.read_outbox)
+overlap_seconds = float(os.getenv("PRECOMPUTE_OVERLAP_SECONDS", "60"))
+
+# Applied outbox entries are deleted after this many hours (see outbox_utils.py), so
+# aggregates built longer ago than that are rebuilt in full
+retention_hours = float(os.getenv("OUTBOX_RETENTION_HOURS", "24"))
+
+# Number of ids in the IN list of one incremental partition
+incremental_batch_size = int(os.getenv("PRECOMPUTE_BATCH_SIZE", "500"))
+
+# Outbox events whose effect on the aggregates is known; any other event makes an
+# incremental run fall back to a full rebuild
+KNOWN_EVENTS = ("university_inserted", "university_deleted", "faculty_deleted", "publication_added", "publication_updated", "publication_deleted")
+
+
+class Aggregate:
+    """
+    A table of precomputed widget results, rebuilt from the base tables (and the aggregates
+    it depends on) one partition at a time.
+
+    Parameters
+    ----------
+    name : str
+        The table name.
+    columns : str
+        The column and index definitions of the table.
+    select : str
+        The SELECT computing the rows of one partition, with {partition} where the partition
+        condition goes.
+    partition_by : str
+        "university" or "publication", the ids the table is partitioned by.
+    partition_column : str
+        The column of select that the partition condition filters on.
+    depends_on : tuple of str
+        The aggregates select reads, which are built first.
+    maintained : bool
+        Whether edits keep the table current themselves (see mysql_utils.refresh_impact), in
+        which case a full rebuild replaces it one partition at a time instead of swapping in a
+        new copy, which would discard the edits made while it was being built.
+    """
+
+    def __init__(self, name, columns, select, partition_by, partition_column, depends_on = (), maintained = False):
+        self.name = name
+        self.columns = columns
+        self.select = select
+        self.partition_by = partition_by
+        self.partition_column = partition_column
+        self.depends_on = depends_on
+        self.maintained = maintained
+
+    @property
+    def key_column(self):
+        return f"{self.partition_by}_id"
+
+
+## The aggregates and their dependencies
+AGGREGATES = {aggregate.name: aggregate for aggregate in [
+    # Keyword-relevant citations of every publication (keyword score x citations)
+    Aggregate(
+        "agg_publication_krc",
+        """publication_id INT NOT NULL,
+           keyword_id INT NOT NULL,
+           krc DOUBLE,
+           INDEX (publication_id)""",
+        """SELECT pk.publication_id, pk.keyword_id, pk.score * p.num_citations
+           FROM publication_keyword pk
+           JOIN publication p ON p.ID = pk.publication_id
+           WHERE {partition}""",
+        "publication", "pk.publication_id"
+    ),
+    # KRC widget: keyword-relevant citations per university and keyword
+    Aggregate(
+        "agg_university_keyword_krc",
+        """university_id INT NOT NULL,
+           keyword_id INT NOT NULL,
+           krc DOUBLE,
+           INDEX (university_id),
+           INDEX (keyword_id, krc)""",
+        """SELECT f.university_id, a.keyword_id, SUM(a.krc)
+           FROM agg_publication_krc a
+           JOIN faculty_publication fp ON fp.publication_id = a.publication_id
+           JOIN faculty f ON f.id = fp.faculty_id
+           JOIN university u ON u.id = f.university_id
+           WHERE {partition}
+           GROUP BY f.university_id, a.keyword_id""",
+        "university", "f.university_id",
+        depends_on = ("agg_publication_krc", )
+    ),
+    # Citation ranking widget: citations per university and faculty name
+    Aggregate(
+        "agg_faculty_citations",
+        """university_id INT NOT NULL,
+           faculty_name VARCHAR(512),
+           total_citations BIGINT,
+           INDEX (university_id, total_citations)""",
+        """SELECT f.university_id, f.name, SUM(p.num_citations)
+           FROM faculty f
+           JOIN university u ON u.id = f.university_id
+           JOIN faculty_publication fp ON fp.faculty_id = f.id
+           JOIN publication p ON p.ID = fp.publication_id
+           WHERE {partition}
+           GROUP BY f.university_id, f.name""",
+        "university", "f.university_id"
+    ),
+    # Publications over time widget: faculty publications per university and year
+    Aggregate(
+        "agg_university_year",
+        """university_id INT NOT NULL,
+           year INT,
+           publications BIGINT NOT NULL,
+           INDEX (university_id, year)""",
+        """SELECT f.university_id, p.year, COUNT(*)
+           FROM faculty f
+           JOIN university u ON u.id = f.university_id
+           JOIN faculty_publication fp ON fp.faculty_id = f.id
+           JOIN publication p ON p.ID = fp.publication_id
+           WHERE {partition}
+           GROUP BY f.university_id, p.year""",
+        "university", "f.university_id"
+    ),
+    # Citation ranking widget: h-index (the largest h such that h of a faculty member's
+    # publications have at least h citations each) and i10-index (publications with at least
+    # 10 citations) of every faculty member. Kept current by publication edits (see
+    # mysql_utils.refresh_impact)
+    Aggregate(
+        "agg_faculty_impact",
+        """faculty_id INT NOT NULL,
+           university_id INT NOT NULL,
+           faculty_name VARCHAR(512),
+           h_index INT NOT NULL,
+           i10_index INT NOT NULL,
+           total_citations BIGINT NOT NULL,
+           INDEX (faculty_id),
+           INDEX (university_id, h_index, total_citations),
+           INDEX (university_id, i10_index, total_citations)""",
+        # Ranked by citations within each faculty member, the publications at or above their
+        # rank in citations are exactly the first h
+        """SELECT faculty_id, university_id, name, SUM(citations >= citation_rank), SUM(citations >= 10), SUM(citations)
+           FROM (SELECT f.id AS faculty_id, f.university_id, f.name, COALESCE(p.num_citations, 0) AS citations,
+                        ROW_NUMBER() OVER (PARTITION BY f.id ORDER BY COALESCE(p.num_citations, 0) DESC) AS citation_rank
+                 FROM faculty f
+                 JOIN university u ON u.id = f.university_id
+                 JOIN faculty_publication fp ON fp.faculty_id = f.id
+                 JOIN publication p ON p.ID = fp.publication_id
+                 WHERE {partition}) ranked
+           GROUP BY faculty_id, university_id, name""",
+        "university", "f.university_id",
+        maintained = True
+    ),
+    # h-index and i10-index of every university, over the distinct publications of its faculty
+    Aggregate(
+        "agg_university_impact",
+        """university_id INT NOT NULL,
+           h_index INT NOT NULL,
+           i10_index INT NOT NULL,
+           publications BIGINT NOT NULL,
+           INDEX (university_id),
+           INDEX (h_index)""",
+        """SELECT university_id, SUM(citations >= citation_rank), SUM(citations >= 10), COUNT(*)
+           FROM (SELECT university_id, citations,
+                        ROW_NUMBER() OVER (PARTITION BY university_id ORDER BY citations DESC) AS citation_rank
+                 FROM (SELECT DISTINCT f.university_id, p.ID, COALESCE(p.num_citations, 0) AS citations
+                       FROM faculty f
+                       JOIN university u ON u.id = f.university_id
+                       JOIN faculty_publication fp ON fp.faculty_id = f.id
+                       JOIN publication p ON p.ID = fp.publication_id
+                       WHERE {partition}) publications) ranked
+           GROUP BY university_id""",
+        "university", "f.university_id",
+        maintained = True
+    ),
+    # Keyword score widget: faculty keyword scores per university and keyword
+    Aggregate(
+        "agg_university_keyword_score",
+        """university_id INT NOT NULL,
+           keyword_id INT NOT NULL,
+           score DOUBLE,
+           INDEX (university_id),
+           INDEX (keyword_id, score),
+           INDEX (score)""",
+        """SELECT f.university_id, fk.keyword_id, SUM(fk.score)
+           FROM faculty f
+           JOIN university u ON u.id = f.university_id
+           JOIN faculty_keyword fk ON fk.faculty_id = f.id
+           WHERE {partition}
+           GROUP BY f.university_id, fk.keyword_id""",
+        "university", "f.university_id"
+    )
+]}
+
+
+def levels(names = None):
+    """
+    Returns the aggregates in dependency order, as a list of levels whose aggregates only
+    depend on those of earlier levels and can be built at the same time.
+
+    Parameters
+    ----------
+    names : iterable of str, optional
+        The aggregates to order, by default all of them.
+    """
+
+    remaining = set(names or AGGREGATES)
+    ordered = []
+    while remaining:
+        level = sorted(name for name in remaining if not remaining.intersection(AGGREGATES[name].depends_on))
+        if not level:
+            raise ValueError(f"The aggregates {sorted(remaining)} depend on each other")
+        ordered.append(level)
+        remaining.difference_update(level)
+    return ordered
+
+
+def dependents(names):
+    """
+    Returns names and every aggregate that depends on them, directly or not.
+    """
+
+    selected = set(names)
+    changed = True
+    while changed:
+        changed = False
+        for aggregate in AGGREGATES.values():
+            if aggregate.name not in selected and selected.intersection(aggregate.depends_on):
+                selected.add(aggregate.name)
+                changed = True
+    return selected
+
+
+## Partitions
+def _condition(column, partition):
+    """
+    Returns the SQL condition and parameters selecting a partition, which is either
+    ("between", low, high) or ("in", ids).
+    """
+
+    if partition[0] == "between":
+        return f"{column} BETWEEN %s AND %s", list(partition[1:])
+    return f"{column} IN ({', '.join(['%s'] * len(partition[1]))})", list(partition[1])
+
+
+def university_partitions(mysql_cursor, count):
+    """
+    Splits the universities into count partitions with about the same number of faculty each,
+    since university sizes follow a power law and equal-sized lists of ids would leave most
+    workers idle behind the one holding the largest universities.
+    """
+
+    mysql_utils.execute(mysql_cursor, "SELECT u.id, COUNT(f.id) FROM university u LEFT JOIN faculty f ON f.university_id = u.id GROUP BY u.id")
+    weights = sorted(mysql_cursor.fetchall(), key = lambda row: row[1], reverse = True)
+
+    # Largest first, each into the lightest partition so far
+    heap = [(0, index, []) for index in range(max(min(count, len(weights)), 1))]
+    for university_id, faculty in weights:
+        load, index, ids = heapq.heappop(heap)
+        ids.append(university_id)
+        heapq.heappush(heap, (load + faculty, index, ids))
+    return [("in", sorted(ids)) for _, _, ids in heap if ids]
+
+
+def publication_partitions(mysql_cursor, count):
+    """
+    Splits the publication ids into count ranges of the same width.
+    """
+
+    mysql_utils.execute(mysql_cursor, "SELECT MIN(ID), MAX(ID) FROM publication")
+    low, high = mysql_cursor.fetchone()
+    if low is None:
+        return []
+    width = max((high - low + 1 + count - 1) // count, 1)
+    return [("between", start, min(start + width - 1, high)) for start in range(low, high + 1, width)]
+
+
+def _batches(ids):
+    ids = sorted(ids)
+    return [("in", ids[start:start + incremental_batch_size]) for start in range(0, len(ids), incremental_batch_size)]
+
+
+## Work done by the pool's processes
+_connection = None
+
+
+def _worker_connection():
+    # One connection per worker process, reused by all of its tasks
+    global _connection
+    if _connection is None or not _connection.is_connected():
+        _connection = mysql_utils.get_connection()
+    return _connection
+
+
+def refresh_partition(mysql_cursor, name, table, incremental, partition):
+    """
+    Computes one partition of an aggregate into table, in the cursor's transaction. An
+    incremental refresh replaces the partition's rows; a full rebuild fills an empty build
+    table. Returns the number of rows inserted.
+    """
+
+    aggregate = AGGREGATES[name]
+    if incremental:
+        condition, params = _condition(aggregate.key_column, partition)
+        mysql_utils.execute(mysql_cursor, f"DELETE FROM {table} WHERE {condition}", params)
+    condition, params = _condition(aggregate.partition_column, partition)
+    mysql_utils.execute(mysql_cursor, f"INSERT INTO {table} {aggregate.select.format(partition = condition)}", params)
+    return mysql_cursor.rowcount
+
+
+def build_partition(task):
+    """
+    Computes one partition of an aggregate in one transaction (see refresh_partition).
+
+    Parameters
+    ----------
+    task : tuple
+        (aggregate name, table, incremental, partition).
+
+    Returns
+    -------
+    int
+        The number of rows inserted.
+    """
+
+    mysql_conn = _worker_connection()
+    mysql_cursor = mysql_conn.cursor()
+    try:
+        for attempt in range(3):
+            try:
+                mysql_conn.start_transaction()
+                rows = refresh_partition(mysql_cursor, *task)
+                mysql_conn.commit()
+                return rows
+            except mysql.connector.Error as e:
+                # A partition of a maintained aggregate can deadlock with an edit refreshing
+                # the same university; InnoDB rolls one of them back
+                if e.errno != 1213 or attempt == 2:
+                    raise
+                mysql_conn.rollback()
+    except mysql.connector.Error:
+        mysql_conn.rollback()
+        raise
+    finally:
+        mysql_cursor.close()
+
+
+## Orchestration
+def ensure_tables(mysql_cursor):
+    for aggregate in AGGREGATES.values():
+        mysql_utils.execute(mysql_cursor, f"CREATE TABLE IF NOT EXISTS {aggregate.name} ({aggregate.columns})")
+
+
+def get_freshness(mysql_cursor):
+    """
+    Returns {aggregate name: (watermark, UNIX time built)} for the aggregates built so far.
+    """
+
+    mysql_utils.execute(mysql_cursor, "SELECT name, watermark, UNIX_TIMESTAMP(built_at) FROM aggregate_freshness")
+    return {name: (watermark, float(built_at)) for name, watermark, built_at in mysql_cursor.fetchall()}
+
+
+def changes_since(mysql_cursor, watermark, since):
+    """
+    Returns the universities and publications whose aggregates changed after an outbox
+    watermark, and whether a university or publication was deleted, or None if the changes
+    cannot be told from the outbox (entries were pruned or of an unknown kind), which calls
+    for a full rebuild.
+
+    Parameters
+    ----------
+    watermark : int
+        The last outbox entry the aggregates include.
+    since : float
+        The UNIX time the aggregates were built at, to find university deletions.
+
+    Returns
+    -------
+    tuple or None
+        (university ids, publication ids, deleted).
+    """
+
+    mysql_utils.execute(mysql_cursor, "SELECT MIN(id) FROM outbox")
+    oldest = mysql_cursor.fetchone()[0]
+    if time.time() - since > retention_hours * 3600 or (oldest is not None and oldest > watermark + 1):
+        print(f"Outbox entries after {watermark} may have been deleted; rebuilding in full")
+        return None
+
+    universities, publications, faculty, deleted = set(), set(), set(), False
+    for _, event, payload in mysql_utils.read_outbox(mysql_cursor, watermark, overlap_seconds):
+        if event not in KNOWN_EVENTS:
+            print(f"Cannot apply {event} outbox entries incrementally; rebuilding in full")
+            return None
+        if event == "university_inserted":
+            universities.add(payload["id"])
+        elif event in ("university_deleted", "faculty_deleted"):
+            deleted = True
+        else:
+            publications.add(payload["id"])
+            deleted = deleted or event == "publication_deleted"
+            faculty.update(payload.get("faculty_ids", []))
+            if payload.get("faculty_id") is not None:
+                faculty.add(payload["faculty_id"])
+
+    # The faculty of updated publications, and of the universities being deleted, whose
+    # faculty_deleted and publication_deleted entries do not say which university they were at
+    if publications:
+        mysql_utils.execute(mysql_cursor, f"SELECT DISTINCT faculty_id FROM faculty_publication WHERE publication_id IN ({', '.join(['%s'] * len(publications))})", list(publications))
+        faculty.update(row[0] for row in mysql_cursor.fetchall())
+    if faculty:
+        mysql_utils.execute(mysql_cursor, f"SELECT DISTINCT university_id FROM faculty WHERE id IN ({', '.join(['%s'] * len(faculty))}) AND university_id IS NOT NULL", list(faculty))
+        universities.update(row[0] for row in mysql_cursor.fetchall())
+    mysql_utils.execute(mysql_cursor, "SELECT university_id FROM deletion_job WHERE updated_at >= FROM_UNIXTIME(%s) - INTERVAL %s SECOND", (since, overlap_seconds))
+    deletions = [row[0] for row in mysql_cursor.fetchall()]
+    universities.update(deletions)
+    return universities, publications, deleted or bool(deletions)
+
+
+def _plan(mysql_cursor, names, full, partitions):
+    """
+    Decides how every aggregate is built: returns {name: (incremental, partitions)} and the
+    watermark the run covers.
+    """
+
+    watermark = mysql_utils.last_outbox_id(mysql_cursor)
+    freshness = get_freshness(mysql_cursor)
+
+    # Aggregates never built, and everything depending on an aggregate rebuilt in full, are
+    # rebuilt in full too
+    rebuild = set(names) if full else dependents(name for name in names if name not in freshness)
+    changes = None
+    incremental = [name for name in names if name not in rebuild]
+    if incremental:
+        oldest = min(incremental, key = lambda name: freshness[name][0])
+        changes = changes_since(mysql_cursor, *freshness[oldest])
+        if changes is None:
+            rebuild = set(names)
+
+    plan = {}
+    for name in names:
+        aggregate = AGGREGATES[name]
+        if name in rebuild:
+            split = university_partitions if aggregate.partition_by == "university" else publication_partitions
+            plan[name] = (False, split(mysql_cursor, partitions))
+        else:
+            universities, publications, _ = changes
+            plan[name] = (True, _batches(universities if aggregate.partition_by == "university" else publications))
+    return plan, watermark, changes
+
+
+def _record_freshness(mysql_cursor, name, watermark, mode, partitions, seconds):
+    mysql_utils.execute(mysql_cursor, f"SELECT COUNT(*) FROM {name}")
+    rows = mysql_cursor.fetchone()[0]
+    mysql_utils.execute(mysql_cursor, """REPLACE INTO aggregate_freshness (name, built_at, watermark, mode, partitions, row_count, seconds)
+                                         VALUES (%s, NOW(6), %s, %s, %s, %s, %s)""",
+                        (name, watermark, mode, partitions, rows, round(seconds, 3)))
+    return rows
+
+
+# Function to rebuild the precomputed aggregates
+def precompute(names = None, full = False, workers = None, partitions = None, progress = print):
+    """
+    Rebuilds the aggregates level by level in dependency order, with the partitions of every
+    aggregate of a level computed in parallel by a pool of worker processes, each on its own
+    MySQL connection.
+
+    A full rebuild fills a new copy of each table and swaps it in with one RENAME, so the
+    dashboard never reads a half-built aggregate. Aggregates maintained by edits are instead
+    replaced one partition per transaction in place, so no edit is lost, and are marked as
+    building until their first build completes. An incremental run recomputes only the
+    universities and publications changed by the outbox entries after each aggregate's
+    watermark. Either way, every aggregate's watermark, build time, mode and size are written
+    to the aggregate_freshness table.
+
+    Parameters
+    ----------
+    names : list of str, optional
+        The aggregates to rebuild, with everything that depends on them; by default all.
+    full : bool
+        Rebuild every aggregate in full. Aggregates never built before, or whose changes
+        cannot be told from the outbox, are rebuilt in full anyway.
+    workers : int, optional
+        Number of worker processes, by default the number of cores.
+    partitions : int, optional
+        Number of partitions of a full rebuild, by default four per worker so that workers
+        finishing early pick up more.
+    progress : callable, optional
+        Called with a line of progress text.
+
+    Returns
+    -------
+    dict
+        {aggregate name: {"mode", "partitions", "rows", "seconds"}}.
+    """
+
+    workers = workers or os.cpu_count() or 1
+    partitions = partitions or workers * 4
+    unknown = set(names or ()) - set(AGGREGATES)
+    if unknown:
+        raise ValueError(f"Unknown aggregates: {', '.join(sorted(unknown))}")
+
+    mysql_conn = mysql_utils.get_connection()
+    mysql_cursor = mysql_conn.cursor()
+    summary = {}
+    try:
+        ensure_tables(mysql_cursor)
+        selected = dependents(names or AGGREGATES)
+        plan, watermark, changes = _plan(mysql_cursor, selected, full, partitions)
+        mysql_conn.commit()
+
+        with multiprocessing.Pool(workers) as pool:
+            for level in levels(selected):
+                start = time.perf_counter()
+                tasks = []
+                for name in level:
+                    incremental, parts = plan[name]
+                    if AGGREGATES[name].maintained:
+                        # Edits maintain the live table once it has a freshness row, which
+                        # marks it as building until the first build completes
+                        mysql_utils.execute(mysql_cursor, """INSERT IGNORE INTO aggregate_freshness (name, built_at, watermark, mode, partitions, row_count, seconds)
+                                                             VALUES (%s, NOW(6), 0, 'building', 0, 0, 0)""", (name, ))
+                        mysql_conn.commit()
+                        tasks.extend((name, name, True, part) for part in parts)
+                        continue
+                    table = name if incremental else f"{name}__build"
+                    if not incremental:
+                        mysql_utils.execute(mysql_cursor, f"DROP TABLE IF EXISTS {table}")
+                        mysql_utils.execute(mysql_cursor, f"CREATE TABLE {table} LIKE {name}")
+                    tasks.extend((name, table, incremental, part) for part in parts)
+
+                # One task at a time per worker, so that workers finishing early pick up more
+                pool.map(build_partition, tasks, chunksize = 1)
+
+                for name in level:
+                    incremental, parts = plan[name]
+                    if (incremental and changes[2]) or (AGGREGATES[name].maintained and not incremental):
+                        # Rows of universities and publications that no longer exist
+                        reference = "university" if AGGREGATES[name].partition_by == "university" else "publication"
+                        mysql_utils.execute(mysql_cursor, f"DELETE a FROM {name} a LEFT JOIN {reference} r ON r.id = a.{AGGREGATES[name].key_column} WHERE r.id IS NULL")
+                    if not incremental and not AGGREGATES[name].maintained:
+                        mysql_utils.execute(mysql_cursor, f"RENAME TABLE {name} TO {name}__old, {name}__build TO {name}")
+                        mysql_utils.execute(mysql_cursor, f"DROP TABLE {name}__old")
+                    mode, seconds = "incremental" if incremental else "full", time.perf_counter() - start
+                    rows = _record_freshness(mysql_cursor, name, watermark, mode, len(parts), seconds)
+                    mysql_conn.commit()
+                    summary[name] = {"mode": mode, "partitions": len(parts), "rows": rows, "seconds": seconds}
+                    progress(f"{name:<30} {mode:<12} {len(parts):>5} partitions {rows:>10} rows {seconds:>8.1f} s")
+        return summary
+    except mysql.connector.Error:
+        mysql_conn.rollback()
+        raise
+    finally:
+        mysql_cursor.close()
+        mysql_conn.close()
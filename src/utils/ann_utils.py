@@ -0,0 +1,186 @@
+import math
+import numpy as np
+
+
+def _normalized(vector):
+    norm = math.sqrt(sum(score * score for score in vector.values()))
+    return {keyword_id: score / norm for keyword_id, score in vector.items()} if norm else {}
+
+
+def _cosine(a, b):
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(score * b[keyword_id] for keyword_id, score in a.items() if keyword_id in b)
+
+
+## Inverted file index over sparse keyword vectors
+class IVFIndex:
+    """
+    Approximate nearest-neighbor index over faculty keyword-score vectors by cosine
+    similarity.
+
+    Every keyword has an inverted list of the faculty with that keyword, ordered by their
+    normalized score for it. A query only reads the first list_size entries of the lists of
+    its nprobe highest-scored keywords, accumulates the partial dot products of the faculty
+    found there, and reranks the best rerank x k of them by their exact cosine similarity.
+    Faculty that share only low-scored keywords with the query are the ones that can be
+    missed. Raising nprobe, list_size and rerank trades latency for recall.
+
+    Faculty can be added, replaced and removed after the index is built. The rows of
+    removed faculty are reused by the next faculty added, so churn does not grow the index.
+    """
+
+    def __init__(self):
+        self.slot = {}
+        self.ids = []
+        self.vectors = []
+        # Rows of removed faculty, reused by add
+        self.free = []
+        self.university_codes = {}
+        self.university = np.zeros(0, dtype = np.int32)
+        # keyword id -> (rows, scores), highest score first
+        self.lists = {}
+        self._exact = None
+
+    def __len__(self):
+        return len(self.slot)
+
+    def _university_code(self, university):
+        return self.university_codes.setdefault(university, len(self.university_codes))
+
+    def build(self, faculty):
+        """
+        Builds the index from {faculty_id: (university, {keyword_id: score})}.
+        """
+
+        self.__init__()
+        entries = {}
+        universities = []
+        for faculty_id, (university, vector) in faculty.items():
+            vector = _normalized(vector)
+            if not vector:
+                continue
+            row = len(self.ids)
+            self.slot[faculty_id] = row
+            self.ids.append(faculty_id)
+            self.vectors.append(vector)
+            universities.append(self._university_code(university))
+            for keyword_id, score in vector.items():
+                entries.setdefault(keyword_id, ([], []))
+                entries[keyword_id][0].append(row)
+                entries[keyword_id][1].append(score)
+        self.university = np.asarray(universities, dtype = np.int32)
+
+        for keyword_id, (rows, scores) in entries.items():
+            rows, scores = np.asarray(rows, dtype = np.int32), np.asarray(scores, dtype = np.float32)
+            order = np.argsort(-scores, kind = "stable")
+            self.lists[keyword_id] = (rows[order], scores[order])
+        return self
+
+    def add(self, faculty_id, university, vector):
+        """
+        Adds a faculty member, or replaces their vector if they are already indexed.
+        """
+
+        self.remove(faculty_id)
+        vector = _normalized(vector)
+        if not vector:
+            return
+        if self.free:
+            row = self.free.pop()
+            self.ids[row], self.vectors[row] = faculty_id, vector
+        else:
+            row = len(self.ids)
+            if row == len(self.university):
+                self.university = np.resize(self.university, max(16, 2 * row))
+            self.ids.append(faculty_id)
+            self.vectors.append(vector)
+        self.university[row] = self._university_code(university)
+        self.slot[faculty_id] = row
+        for keyword_id, score in vector.items():
+            rows, scores = self.lists.get(keyword_id, (np.zeros(0, dtype = np.int32), np.zeros(0, dtype = np.float32)))
+            position = np.searchsorted(-scores, -score, side = "right")
+            self.lists[keyword_id] = (np.insert(rows, position, row), np.insert(scores, position, score))
+        self._exact = None
+
+    def remove(self, faculty_id):
+        row = self.slot.pop(faculty_id, None)
+        if row is None:
+            return
+        for keyword_id in self.vectors[row]:
+            rows, scores = self.lists[keyword_id]
+            keep = rows != row
+            self.lists[keyword_id] = (rows[keep], scores[keep])
+        self.ids[row], self.vectors[row] = None, {}
+        self.free.append(row)
+        self._exact = None
+
+    def _results(self, candidates, similarities, k):
+        order = sorted(range(len(candidates)), key = lambda i: (-similarities[i], self.ids[candidates[i]]))
+        return [(self.ids[candidates[i]], similarities[i]) for i in order[:k] if similarities[i] > 0]
+
+    def search(self, faculty_id, k = 10, nprobe = 8, list_size = 1000, rerank = 10):
+        """
+        Returns [(faculty_id, similarity)] for up to k approximately most similar faculty at
+        other universities, most similar first.
+        """
+
+        row = self.slot.get(faculty_id)
+        if row is None:
+            return []
+        vector = self.vectors[row]
+        probed = sorted(vector.items(), key = lambda item: -item[1])[:nprobe]
+        rows = np.concatenate([self.lists[keyword_id][0][:list_size] for keyword_id, _ in probed])
+        scores = np.concatenate([self.lists[keyword_id][1][:list_size] * weight for keyword_id, weight in probed])
+        candidates, inverse = np.unique(rows, return_inverse = True)
+        partial = np.bincount(inverse, weights = scores)
+        other = self.university[candidates] != self.university[row]
+        candidates, partial = candidates[other], partial[other]
+        if len(candidates) > rerank * k:
+            candidates = candidates[np.argpartition(-partial, rerank * k - 1)[:rerank * k]]
+        return self._results(candidates, [_cosine(vector, self.vectors[c]) for c in candidates], k)
+
+    def exact_search(self, faculty_id, k = 10):
+        """
+        Returns the exact answer to search by comparing the faculty member with everyone.
+        """
+
+        row = self.slot.get(faculty_id)
+        if row is None:
+            return []
+        if self._exact is None:
+            self._exact = self._exact_matrix()
+        matrix, keyword_position = self._exact
+        query = np.zeros(matrix.shape[1], dtype = np.float32)
+        for keyword_id, score in self.vectors[row].items():
+            query[keyword_position[keyword_id]] = score
+        similarities = matrix @ query
+        candidates = np.flatnonzero(similarities > 0)
+        candidates = candidates[self.university[candidates] != self.university[row]]
+        return self._results(candidates, [float(similarities[c]) for c in candidates], k)
+
+    def _exact_matrix(self):
+        from scipy import sparse
+
+        keyword_position = {}
+        rows, columns, scores = [], [], []
+        for row, vector in enumerate(self.vectors):
+            for keyword_id, score in vector.items():
+                rows.append(row)
+                columns.append(keyword_position.setdefault(keyword_id, len(keyword_position)))
+                scores.append(score)
+        shape = (len(self.vectors), max(len(keyword_position), 1))
+        return sparse.csr_matrix((np.asarray(scores, dtype = np.float32), (rows, columns)), shape = shape), keyword_position
+
+    def recall(self, faculty_ids, k = 10, **search_options):
+        """
+        Returns the mean fraction of the exact top k that search finds for faculty_ids.
+        """
+
+        fractions = []
+        for faculty_id in faculty_ids:
+            exact = {match for match, _ in self.exact_search(faculty_id, k)}
+            if exact:
+                found = {match for match, _ in self.search(faculty_id, k, **search_options)}
+                fractions.append(len(exact & found) / len(exact))
+        return sum(fractions) / len(fractions) if fractions else 1.0
@@ -0,0 +1,389 @@
+import os
+import time
+import threading
+from collections import deque, OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from dotenv import load_dotenv
+from . import metrics_utils, tracing_utils
+
+load_dotenv()
+
+
+## Circuit breaker configuration
+# Seconds a widget waits for a backend before serving its last good result instead. The
+# call keeps running in the background and stores its result when it completes
+call_timeout = float(os.getenv("BREAKER_TIMEOUT", "2"))
+
+# Calls slower than this many seconds count as slow
+slow_call = float(os.getenv("BREAKER_SLOW_CALL", "1"))
+
+# A breaker trips when, over its last BREAKER_WINDOW calls (and at least BREAKER_MIN_CALLS),
+# the fraction of failed calls or of slow calls reaches these rates
+window = int(os.getenv("BREAKER_WINDOW", "20"))
+min_calls = int(os.getenv("BREAKER_MIN_CALLS", "5"))
+error_rate = float(os.getenv("BREAKER_ERROR_RATE", "0.5"))
+slow_rate = float(os.getenv("BREAKER_SLOW_RATE", "0.5"))
+
+# Seconds an open breaker rejects calls before letting a probe through, and the number of
+# consecutive successful probes that close it again
+open_seconds = float(os.getenv("BREAKER_OPEN_SECONDS", "10"))
+probes = int(os.getenv("BREAKER_PROBES", "3"))
+
+# Number of last good results kept
+cache_size = int(os.getenv("BREAKER_CACHE_SIZE", "1024"))
+
+# Threads running the calls of each backend. Every backend has its own threads (a bulkhead),
+# so a hung backend cannot hold up the calls to the others; a call to a backend whose threads
+# are all busy is rejected rather than queued
+workers = int(os.getenv("BREAKER_WORKERS", "8"))
+
+STATES = ("closed", "half_open", "open")
+
+STATE = metrics_utils.gauge(
+    "uri_breaker_state",
+    "Circuit breaker state of every backend (0: closed, 1: half-open, 2: open).",
+    ("backend", )
+)
+TRANSITIONS = metrics_utils.counter(
+    "uri_breaker_transitions_total",
+    "Circuit breaker state changes, by backend and the state entered.",
+    ("backend", "state")
+)
+STALE = metrics_utils.counter(
+    "uri_stale_results_total",
+    "Widget queries answered with the last good result because no backend answered in time.",
+    ("query", )
+)
+REJECTED = metrics_utils.counter(
+    "uri_bulkhead_rejected_total",
+    "Backend calls rejected because every thread of the backend's bulkhead was busy.",
+    ("backend", )
+)
+
+
+class BackendUnavailable(Exception):
+    """
+    Raised when a backend did not answer in time.
+    """
+
+
+class BreakerOpen(BackendUnavailable):
+    """
+    Raised instead of calling a backend whose breaker is open.
+    """
+
+
+class BulkheadFull(BackendUnavailable):
+    """
+    Raised instead of calling a backend whose bulkhead has no free thread.
+    """
+
+
+class CircuitBreaker:
+    """
+    Closed, a backend gets every call and the outcomes of its last calls are kept. Too
+    many failed or slow calls open the breaker, which then rejects calls for open_seconds
+    so a struggling backend is not kept busy by requests that would time out anyway. It
+    then half-opens and lets one probe call through at a time: `probes` successful calls
+    close it again, and a failed or slow one opens it again.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.state = "closed"
+        self.outcomes = deque(maxlen = window)
+        self.opened_at = 0.0
+        self.successes = 0
+        self.probing = False
+        self.lock = threading.Lock()
+        STATE.set((backend, ), 0)
+
+    def _enter(self, state):
+        self.state = state
+        self.outcomes.clear()
+        self.successes = 0
+        self.probing = False
+        if state == "open":
+            self.opened_at = time.monotonic()
+        STATE.set((self.backend, ), STATES.index(state))
+        TRANSITIONS.inc((self.backend, state))
+
+    def allow(self):
+        """
+        Returns True if a call may be sent to the backend. In the half-open state this
+        claims the single probe slot, released by record().
+        """
+
+        with self.lock:
+            if self.state == "open":
+                if time.monotonic() - self.opened_at < open_seconds:
+                    return False
+                self._enter("half_open")
+            if self.state == "half_open":
+                if self.probing:
+                    return False
+                self.probing = True
+            return True
+
+    def release(self):
+        """
+        Releases the probe slot claimed by allow() for a call that was never run.
+        """
+
+        with self.lock:
+            if self.state == "half_open":
+                self.probing = False
+
+    def record(self, ok, elapsed):
+        """
+        Records the outcome of an allowed call, which may change the state.
+        """
+
+        slow = elapsed >= slow_call
+        with self.lock:
+            if self.state == "half_open":
+                self.probing = False
+                if not ok or slow:
+                    self._enter("open")
+                    return
+                self.successes += 1
+                if self.successes >= probes:
+                    self._enter("closed")
+                return
+            if self.state == "open":
+                return  # a call that started before the breaker opened
+
+            self.outcomes.append((ok, slow))
+            if len(self.outcomes) >= min_calls:
+                failed = sum(1 for ok, _ in self.outcomes if not ok) / len(self.outcomes)
+                slowed = sum(1 for _, slow in self.outcomes if slow) / len(self.outcomes)
+                if failed >= error_rate or slowed >= slow_rate:
+                    print(f"Circuit breaker for {self.backend} opened ({failed:.0%} failed, {slowed:.0%} slow calls)")
+                    self._enter("open")
+
+
+class Bulkhead:
+    """
+    The threads running the calls of one backend. At most `workers` calls run at once and
+    none waits for a thread, so the time a call takes is all spent in the backend.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.executor = ThreadPoolExecutor(max_workers = workers, thread_name_prefix = f"breaker-{backend}")
+        self.slots = threading.BoundedSemaphore(workers)
+
+    def submit(self, run):
+        """
+        Runs run() on a free thread and returns its future, or raises BulkheadFull.
+        """
+
+        if not self.slots.acquire(blocking = False):
+            REJECTED.inc((self.backend, ))
+            raise BulkheadFull(f"all {workers} threads calling {self.backend} are busy")
+
+        def release():
+            try:
+                return run()
+            finally:
+                self.slots.release()
+
+        return self.executor.submit(release)
+
+
+class Call:
+    """
+    One backend call, recorded once: as a failure when the caller stops waiting for it, or
+    with its outcome when it completes first. A call the caller stops waiting for before it
+    started is not recorded, since the backend was never asked.
+    """
+
+    def __init__(self, breaker):
+        self.breaker = breaker
+        self.started = False
+        self.recorded = False
+        self.lock = threading.Lock()
+
+    def start(self):
+        """
+        Returns False if the caller already stopped waiting, in which case the call must not run.
+        """
+
+        with self.lock:
+            self.started = not self.recorded
+            return self.started
+
+    def record(self, ok, elapsed):
+        with self.lock:
+            if self.recorded:
+                return
+            self.recorded = True
+        self.breaker.record(ok, elapsed)
+
+    def abandon(self, elapsed):
+        """
+        Records the call as failed if it is running, or gives it up if it has not started.
+        """
+
+        with self.lock:
+            if self.recorded:
+                return
+            self.recorded = True
+            started = self.started
+        if started:
+            self.breaker.record(False, elapsed)
+        else:
+            self.breaker.release()
+
+
+class ResultCache:
+    """
+    The last good result of every recent (query, arguments), least recently used first.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.results = OrderedDict()
+        self.lock = threading.Lock()
+
+    def put(self, key, result):
+        with self.lock:
+            self.results[key] = (result, time.time())
+            self.results.move_to_end(key)
+            while len(self.results) > self.capacity:
+                self.results.popitem(last = False)
+
+    def get(self, key):
+        """
+        Returns (result, stored_at), or None.
+        """
+
+        with self.lock:
+            entry = self.results.get(key)
+            if entry is not None:
+                self.results.move_to_end(key)
+            return entry
+
+
+class StaleResult(list):
+    """
+    A last good result served in place of a fresh one, with the time it was stored.
+    """
+
+    stale = True
+
+    def __init__(self, rows, stored_at):
+        super().__init__(rows)
+        self.stored_at = stored_at
+
+    @property
+    def age(self):
+        return time.time() - self.stored_at
+
+
+breakers = {}
+bulkheads = {}
+results = ResultCache(cache_size)
+_refreshing = set()
+_lock = threading.Lock()
+
+
+def breaker(backend):
+    with _lock:
+        if backend not in breakers:
+            breakers[backend] = CircuitBreaker(backend)
+        return breakers[backend]
+
+
+def bulkhead(backend):
+    with _lock:
+        if backend not in bulkheads:
+            bulkheads[backend] = Bulkhead(backend)
+        return bulkheads[backend]
+
+
+# Function to run a backend call behind its circuit breaker
+def call(backend, key, function, *args, timeout = None, **kwargs):
+    """
+    Runs function(*args, **kwargs) against a backend, waiting at most timeout seconds
+    (call_timeout by default), and stores its result as the last good result of key.
+
+    Raises
+    ------
+    BreakerOpen
+        If the backend's breaker is open, without calling it.
+    BulkheadFull
+        If every thread calling the backend is busy, without calling it or counting it
+        against the backend.
+    BackendUnavailable
+        If the call did not complete in time.
+    ValueError
+        Raised by the function for invalid input; not counted against the backend.
+    Exception
+        Anything else raised by the function, after counting it as a failure.
+    """
+
+    backend_breaker = breaker(backend)
+    if not backend_breaker.allow():
+        raise BreakerOpen(f"circuit breaker for {backend} is {backend_breaker.state}")
+
+    attempt = Call(backend_breaker)
+
+    def run():
+        if not attempt.start():
+            return None
+        start = time.perf_counter()
+        try:
+            result = function(*args, **kwargs)
+        except ValueError:
+            attempt.record(True, time.perf_counter() - start)
+            raise
+        except Exception:
+            attempt.record(False, time.perf_counter() - start)
+            raise
+        attempt.record(True, time.perf_counter() - start)
+        results.put(key, result)
+        return result
+
+    timeout = call_timeout if timeout is None else timeout
+    try:
+        future = bulkhead(backend).submit(tracing_utils.propagate(run))
+    except BulkheadFull:
+        backend_breaker.release()
+        raise
+    try:
+        return future.result(timeout = timeout)
+    except FutureTimeoutError:
+        attempt.abandon(max(timeout, slow_call))
+        raise BackendUnavailable(f"{backend} did not answer within {timeout:.2g} s")
+
+
+# Function to serve the last good result while a fresh one is fetched
+def stale(query, key, refresh):
+    """
+    Returns the last good result of key as a StaleResult, running refresh() in the
+    background unless it is already running for key, or None if there is none.
+    """
+
+    entry = results.get(key)
+    if entry is None:
+        return None
+
+    with _lock:
+        start = key not in _refreshing
+        _refreshing.add(key)
+    if start:
+        def run():
+            try:
+                refresh()
+            except BackendUnavailable:
+                pass  # already reported, and retried on the next request
+            except Exception as e:
+                print(f"Error refreshing {query} in the background:", e)
+            finally:
+                with _lock:
+                    _refreshing.discard(key)
+        threading.Thread(target = run, name = "breaker-refresh", daemon = True).start()
+
+    STALE.inc((query, ))
+    return StaleResult(*entry)
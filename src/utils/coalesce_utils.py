@@ -0,0 +1,191 @@
+import os
+import json
+import time
+import pickle
+import hashlib
+import inspect
+import functools
+import threading
+from dotenv import load_dotenv
+from . import metrics_utils
+
+try:
+    import fcntl
+except ImportError:  # Windows, where only threads of one process are coalesced
+    fcntl = None
+
+load_dotenv()
+
+
+## Coalescing configuration
+# COALESCE=0 runs every call, even when an identical one is already running
+enabled = os.getenv("COALESCE", "1") != "0"
+
+# Directory shared by the dashboard processes on a host, e.g. the workers of a WSGI server.
+# When set, identical calls are also coalesced across processes: one process runs the
+# query while the others wait for a file lock and read its result
+directory = os.getenv("COALESCE_DIR") or None
+
+# Lock and result files older than this many seconds are removed
+file_ttl = float(os.getenv("COALESCE_FILE_TTL", "600"))
+
+COALESCED = metrics_utils.counter(
+    "uri_coalesced_calls_total",
+    "Calls answered with the result of an identical call already running, by function and whether it ran in this process (thread) or another one (process).",
+    ("function", "scope")
+)
+RUNS = metrics_utils.counter(
+    "uri_coalesce_runs_total",
+    "Calls that ran their query rather than sharing the result of an identical call, by function.",
+    ("function", )
+)
+
+if directory is not None and fcntl is None:
+    print("COALESCE_DIR needs file locks, which this platform does not have; coalescing within each process only")
+    directory = None
+
+
+def normalize(*args, **kwargs):
+    """
+    Returns the key of a call: its arguments as canonical JSON, so equal arguments give the
+    same key whatever their type (list or tuple) or keyword order.
+    """
+
+    return json.dumps([args, kwargs], sort_keys = True, default = str, separators = (",", ":"))
+
+
+class Flight:
+    """
+    One running call and, once it completes, its result or exception.
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Runs one call per key at a time: a call made while an identical one is running waits
+    for it and returns the same result (or raises the same exception) instead of querying
+    again. Results are shared, so callers must not modify them.
+
+    Parameters
+    ----------
+    name : str
+        The function coalesced, for metrics and file names.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.flights = {}
+        self.lock = threading.Lock()
+        self.runs = 0
+
+    def do(self, key, function):
+        """
+        Returns function(), or the result of the identical call already running for key.
+        """
+
+        if not enabled:
+            return function()
+
+        with self.lock:
+            flight = self.flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.flights[key] = Flight()
+
+        if not leader:
+            COALESCED.inc((self.name, "thread"))
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = self._run(key, function)
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.flights[key]
+            flight.done.set()
+        return flight.result
+
+    def _run(self, key, function):
+        """
+        Runs function() unless another process ran it for key while this one waited.
+        """
+
+        if directory is None:
+            RUNS.inc((self.name, ))
+            return function()
+
+        path = os.path.join(directory, f"{self.name}-{hashlib.sha1(key.encode()).hexdigest()}")
+        started = time.time_ns()
+        with open(path + ".lock", "a") as lock_file:
+            # Blocks while another process runs the same call
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                try:
+                    if os.stat(path + ".result").st_mtime_ns >= started:
+                        with open(path + ".result", "rb") as result_file:
+                            result = pickle.load(result_file)
+                        COALESCED.inc((self.name, "process"))
+                        return result
+                except (OSError, EOFError, pickle.UnpicklingError):
+                    pass
+
+                RUNS.inc((self.name, ))
+                result = function()
+                try:
+                    with open(path + ".tmp", "wb") as result_file:
+                        pickle.dump(result, result_file, protocol = pickle.HIGHEST_PROTOCOL)
+                    os.replace(path + ".tmp", path + ".result")
+                except (OSError, pickle.PicklingError, TypeError, AttributeError) as e:
+                    print(f"Error sharing the result of {self.name} with other processes:", e)
+                return result
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+                self._prune()
+
+    def _prune(self):
+        """
+        Removes old lock and result files every 256 calls. A removed lock file that another
+        process still holds at most lets one identical call run twice.
+        """
+
+        self.runs += 1
+        if self.runs % 256:
+            return
+        cutoff = time.time() - file_ttl
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.name.startswith(self.name + "-") and entry.stat().st_mtime < cutoff:
+                        os.remove(entry.path)
+        except OSError as e:
+            print("Error removing old coalescing files:", e)
+
+
+# Decorator for coalescing identical concurrent calls of a query function
+def coalesced(func):
+    """
+    Decorator that runs one call of a query function per distinct arguments at a time,
+    with identical concurrent calls sharing its result (see SingleFlight). Arguments are
+    matched by parameter, so passing one by position or by name makes no difference.
+    """
+
+    flights = SingleFlight(func.__name__)
+    signature = inspect.signature(func)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        return flights.do(normalize(**bound.arguments), lambda: func(*args, **kwargs))
+
+    return wrapper
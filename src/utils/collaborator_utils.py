@@ -0,0 +1,200 @@
+import os
+import time
+import threading
+from dotenv import load_dotenv
+from . import mysql_utils, metrics_utils, ann_utils
+
+load_dotenv()
+
+
+## Search configuration (see ann_utils.IVFIndex); higher values find more of the exact
+## matches at the cost of latency
+# Number of the faculty member's highest-scored keywords whose inverted lists are read
+nprobe = int(os.getenv("ANN_NPROBE", "8"))
+
+# Number of entries read from each inverted list
+list_size = int(os.getenv("ANN_LIST_SIZE", "1000"))
+
+# Number of candidates per requested match whose exact similarity is computed
+rerank = int(os.getenv("ANN_RERANK", "10"))
+
+# Seconds between polls of the outbox for deleted faculty
+poll_interval = float(os.getenv("ANN_POLL_INTERVAL", "5"))
+
+# Seconds after which the index is rebuilt from scratch, picking up changes made outside the
+# dashboard (e.g. by generate_data.py), which are not recorded in the outbox
+rebuild_interval = float(os.getenv("ANN_REBUILD_INTERVAL", "3600"))
+
+# Outbox events that change faculty keyword vectors, and the faculty they name. Publication
+# edits do not change faculty_keyword, university_inserted adds no faculty, and deleting a
+# university records faculty_deleted for its faculty, so no other event needs handling
+FACULTY_EVENTS = {
+    "faculty_deleted": lambda payload: payload["ids"]
+}
+
+# Faculty keyword vectors, with university names, optionally only for some faculty
+VECTORS_QUERY = """SELECT f.id, f.name, u.name, fk.keyword_id, fk.score
+                   FROM faculty f
+                   JOIN university u ON u.id = f.university_id
+                   JOIN faculty_keyword fk ON fk.faculty_id = f.id
+                   {where}"""
+
+
+class CollaboratorIndex:
+    """
+    Approximate nearest-neighbor index over every faculty member's keyword scores, kept up
+    to date with the faculty changes recorded in the outbox and rebuilt every
+    rebuild_interval seconds.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.index = None
+        self.faculty = {}
+        self.last_id = 0
+        self.built_at = 0.0
+
+    @staticmethod
+    def _vectors(rows):
+        vectors, names = {}, {}
+        for faculty_id, name, university, keyword_id, score in rows:
+            names[faculty_id] = (name, university)
+            vectors.setdefault(faculty_id, (university, {}))[1][keyword_id] = float(score)
+        return vectors, names
+
+    def build(self):
+        mysql_conn = mysql_utils.get_connection()
+        mysql_cursor = mysql_conn.cursor()
+        try:
+            last_id = mysql_utils.last_outbox_id(mysql_cursor)
+            mysql_utils.execute(mysql_cursor, VECTORS_QUERY.format(where = ""))
+            vectors, names = self._vectors(mysql_cursor.fetchall())
+        finally:
+            mysql_cursor.close()
+            mysql_conn.close()
+
+        index = ann_utils.IVFIndex().build(vectors)
+        with self.lock:
+            self.index, self.faculty, self.last_id = index, names, last_id
+            self.built_at = time.monotonic()
+
+    def get(self):
+        with self.lock:
+            if self.index is None:
+                self.build()
+            return self.index
+
+    def refresh(self, faculty_ids):
+        """
+        Reads the keyword vectors of faculty_ids again and adds, replaces or removes them.
+        """
+
+        faculty_ids = list(set(faculty_ids))
+        mysql_conn = mysql_utils.get_connection()
+        mysql_cursor = mysql_conn.cursor()
+        try:
+            placeholders = ", ".join(["%s"] * len(faculty_ids))
+            mysql_utils.execute(mysql_cursor, VECTORS_QUERY.format(where = f"WHERE f.id IN ({placeholders})"), faculty_ids)
+            vectors, names = self._vectors(mysql_cursor.fetchall())
+        finally:
+            mysql_cursor.close()
+            mysql_conn.close()
+
+        with self.lock:
+            for faculty_id in faculty_ids:
+                if faculty_id in vectors:
+                    self.index.add(faculty_id, *vectors[faculty_id])
+                    self.faculty[faculty_id] = names[faculty_id]
+                else:
+                    self.index.remove(faculty_id)
+                    self.faculty.pop(faculty_id, None)
+
+    def poll(self):
+        """
+        Applies the faculty changes recorded in the outbox since the last poll, after
+        rebuilding the index if it is older than rebuild_interval.
+        """
+
+        self.get()
+        if time.monotonic() - self.built_at > rebuild_interval:
+            self.build()
+        mysql_conn = mysql_utils.get_connection()
+        mysql_cursor = mysql_conn.cursor()
+        try:
+            entries = mysql_utils.read_outbox(mysql_cursor, self.last_id)
+        finally:
+            mysql_cursor.close()
+            mysql_conn.close()
+
+        faculty_ids = [faculty_id for _, event, payload in entries if event in FACULTY_EVENTS for faculty_id in FACULTY_EVENTS[event](payload)]
+        if faculty_ids:
+            self.refresh(faculty_ids)
+        if entries:
+            with self.lock:
+                self.last_id = max(self.last_id, entries[-1][0])
+
+    def similar(self, faculty_id, k = 10):
+        index = self.get()
+        with self.lock:
+            matches = index.search(faculty_id, k, nprobe, list_size, rerank)
+            return [
+                {"id": match, "name": self.faculty[match][0], "university": self.faculty[match][1], "similarity": round(similarity, 4)}
+                for match, similarity in matches
+            ]
+
+
+collaborators = CollaboratorIndex()
+
+
+# Function to find possible collaborators of a faculty member
+@metrics_utils.timed_query("ann")
+def get_similar_faculty(faculty_id, k = 10):
+    """
+    Returns the faculty at other universities whose keyword profiles are most similar to a
+    faculty member's, found with an approximate nearest-neighbor index.
+
+    Parameters
+    ----------
+    faculty_id : int
+        The faculty member's ID.
+    k : int
+        Maximum number of faculty to return.
+
+    Returns
+    -------
+    list of dict
+        {"id", "name", "university", "similarity"} per faculty member, most similar first.
+    """
+
+    return collaborators.similar(faculty_id, k)
+
+
+def run_updater(stop = None):
+    """
+    Builds the index, then applies faculty changes every poll_interval seconds until stop
+    is set.
+    """
+
+    stop = stop or threading.Event()
+    while not stop.is_set():
+        try:
+            collaborators.poll()
+        except Exception as e:
+            print("Error updating the collaborator index:", e)
+        stop.wait(poll_interval)
+
+
+_updater = None
+
+
+# Function to start the collaborator index updater in the background
+def start_updater():
+    """
+    Starts the updater on a daemon thread, once per process.
+    """
+
+    global _updater
+    if _updater is None:
+        _updater = threading.Thread(target = run_updater, name = "collaborator-updater", daemon = True)
+        _updater.start()
+    return _updater
@@ -0,0 +1,311 @@
+import os
+import bisect
+from collections import defaultdict
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+## Matching configuration
+# KEYWORD_AUTOCORRECT=0 only accepts keywords that match exactly, ignoring case
+autocorrect_enabled = os.getenv("KEYWORD_AUTOCORRECT", "1") != "0"
+
+
+## Edit distance
+def edit_distance(a, b, limit):
+    """
+    Returns the Levenshtein distance between a and b, or limit + 1 as soon as it is known
+    to be larger than limit. Only the diagonal band of width 2 * limit + 1 is computed.
+    """
+
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    over = limit + 1
+    previous = [j if j <= limit else over for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        low, high = max(1, i - limit), min(len(b), i + limit)
+        current = [over] * (len(b) + 1)
+        current[0] = i if i <= limit else over
+        ca = a[i - 1]
+        smallest = current[0]
+        for j in range(low, high + 1):
+            cost = previous[j - 1] + (ca != b[j - 1])
+            if previous[j] + 1 < cost:
+                cost = previous[j] + 1
+            if current[j - 1] + 1 < cost:
+                cost = current[j - 1] + 1
+            if cost > over:
+                cost = over
+            current[j] = cost
+            if cost < smallest:
+                smallest = cost
+        if smallest > limit:
+            return over
+        previous = current
+    return previous[-1]
+
+
+def trigrams(term):
+    """
+    Returns the trigrams of a term padded with two leading spaces and one trailing space,
+    so that short terms and word starts get trigrams of their own.
+    """
+
+    padded = f"  {term} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def deletions(term):
+    """
+    Returns the term and every string obtained by deleting one of its characters. Two terms
+    within one edit of each other always share one of these.
+    """
+
+    return {term} | {term[:i] + term[i + 1:] for i in range(len(term))}
+
+
+def max_distance(term):
+    """
+    Returns the number of typos tolerated in a term of this length.
+    """
+
+    return 0 if len(term) < 4 else 1 if len(term) < 8 else 2
+
+
+class BKTree:
+    """
+    Burkhard-Keller tree over a set of terms, answering "every term within distance d"
+    while only comparing against the subtrees the triangle inequality allows.
+    """
+
+    def __init__(self, terms):
+        self.root = None
+        for term in terms:
+            self.add(term)
+
+    def add(self, term):
+        if self.root is None:
+            self.root = (term, {})
+            return
+        node = self.root
+        while True:
+            distance = edit_distance(term, node[0], len(term) + len(node[0]))
+            if distance == 0:
+                return
+            child = node[1].get(distance)
+            if child is None:
+                node[1][distance] = (term, {})
+                return
+            node = child
+
+    def search(self, term, limit, max_nodes = None):
+        """
+        Returns [(distance, term)] for terms within limit edits, closest first. With
+        max_nodes, at most that many terms are compared, so some matches may be missed;
+        the subtrees whose edge is closest to the distance of their parent, which are the
+        likeliest to hold matches, are visited first.
+        """
+
+        results = []
+        stack = [self.root] if self.root else []
+        visited = 0
+        while stack and (max_nodes is None or visited < max_nodes):
+            node_term, children = stack.pop()
+            visited += 1
+            # The exact distance only matters up to the largest child edge plus limit
+            distance = edit_distance(term, node_term, limit + max(children, default = 0))
+            if distance <= limit:
+                results.append((distance, node_term))
+            near = [(abs(child_distance - distance), child) for child_distance, child in children.items() if abs(child_distance - distance) <= limit]
+            stack.extend(child for _, child in sorted(near, key = lambda item: item[0], reverse = True))
+        return sorted(results)
+
+
+## Keyword index
+class KeywordIndex:
+    """
+    In-memory index over the keyword names for exact, prefix, substring and typo-tolerant
+    lookups without querying the database.
+
+    Misspelled keywords are corrected word by word: words one typo away are found through
+    an index of the words with one character deleted, and words further away with a BK-tree
+    over the words of all keywords, which is small even when there are many keywords. Substring matches, and
+    corrections that do not split into known words, use candidates from a trigram inverted
+    index ranked by edit distance.
+    """
+
+    # Number of trigram candidates, most shared trigrams first, checked by edit distance
+    # when word-by-word correction fails
+    MAX_CANDIDATES = 100
+
+    # Number of words compared with a word two typos away in the BK-tree before giving up
+    MAX_WORD_NODES = 100
+
+    # Terms shorter than this are never corrected by suggest, which runs on every keystroke
+    MIN_FUZZY_LENGTH = 4
+
+    # Number of names kept for every 1 or 2 letter substring, which has no trigram posting list
+    MAX_SHORT_MATCHES = 50
+
+    def __init__(self, names):
+        self.by_lower = defaultdict(list)
+        for name in sorted(set(name for name in names if name)):
+            self.by_lower[name.lower()].append(name)
+        self.terms = sorted(self.by_lower)
+        self.postings = defaultdict(list)
+        self.word_counts = defaultdict(int)
+        for index, term in enumerate(self.terms):
+            for trigram in trigrams(term):
+                self.postings[trigram].append(index)
+            for word in term.split():
+                self.word_counts[word] += 1
+        self.words = BKTree(self.word_counts)
+        self.deletions = defaultdict(list)
+        for word in self.word_counts:
+            for variant in deletions(word):
+                self.deletions[variant].append(word)
+        # The first names alphabetically containing each 1 or 2 letter string after their start
+        self.short_matches = defaultdict(list)
+        for term in self.terms:
+            for short in {term[i:i + length] for length in (1, 2) for i in range(1, len(term) - length + 1)}:
+                matches = self.short_matches[short]
+                if len(matches) < self.MAX_SHORT_MATCHES and not term.startswith(short):
+                    matches.append(term)
+
+    def __len__(self):
+        return len(self.terms)
+
+    def lookup(self, term):
+        """
+        Returns the keyword names equal to the term, ignoring case.
+        """
+
+        return self.by_lower.get(term.lower(), [])
+
+    def _candidates(self, term, limit):
+        """
+        Returns the indexes of the terms sharing the most trigrams with the term among those
+        that can be within limit edits of it.
+
+        An edit changes at most 3 of a term's trigrams, so a term within limit edits shares
+        at least one of any 3 * limit + 1 of its trigrams; the rarest ones are used.
+        """
+
+        grams = sorted(trigrams(term), key = lambda trigram: len(self.postings.get(trigram, ())))
+        counts = defaultdict(int)
+        for trigram in grams[:3 * limit + 1]:
+            for index in self.postings.get(trigram, ()):
+                counts[index] += 1
+        return sorted(counts, key = counts.get, reverse = True)[:self.MAX_CANDIDATES]
+
+    def _correct_word(self, word, limit):
+        """
+        Returns (distance, word) for the closest known word within limit edits, preferring
+        words used by more keywords, or None.
+        """
+
+        if limit < 1:
+            return None
+        matches = {
+            (1, candidate) for variant in deletions(word) for candidate in self.deletions.get(variant, ())
+            if edit_distance(word, candidate, 1) == 1
+        }
+        if not matches and limit > 1:
+            matches = self.words.search(word, limit, self.MAX_WORD_NODES)
+        if not matches:
+            return None
+        return min(matches, key = lambda match: (match[0], -self.word_counts[match[1]], match[1]))
+
+    def correct(self, term):
+        """
+        Returns the closest keyword term (lowercase) within the tolerated number of typos, or
+        None.
+        """
+
+        term = " ".join(term.lower().split())
+        if term in self.by_lower:
+            return term
+        limit = max_distance(term)
+        if limit == 0:
+            return None
+
+        # Word by word
+        words, used = [], 0
+        for word in term.split():
+            if word in self.word_counts:
+                words.append(word)
+                continue
+            match = self._correct_word(word, min(max_distance(word), limit - used))
+            if match is None:
+                break
+            used += match[0]
+            words.append(match[1])
+        else:
+            if " ".join(words) in self.by_lower:
+                return " ".join(words)
+
+        # Whole term, e.g. for a missing or extra space
+        best = None
+        for index in self._candidates(term, limit):
+            candidate = self.terms[index]
+            distance = edit_distance(term, candidate, limit)
+            if distance <= limit and (best is None or (distance, candidate) < best):
+                best = (distance, candidate)
+        return best[1] if best else None
+
+    def suggest(self, term, limit = 10):
+        """
+        Returns up to limit keyword names starting with the term, followed by up to limit
+        names containing it elsewhere and, if there are none of either, the closest
+        typo-tolerant matches.
+        """
+
+        term = term.lower()
+        if not term:
+            return []
+        start = bisect.bisect_left(self.terms, term)
+        prefix_terms = []
+        for candidate in self.terms[start:start + limit]:
+            if not candidate.startswith(term):
+                break
+            prefix_terms.append(candidate)
+
+        # Posting lists are in alphabetical order, so walking the shortest one that every match
+        # must be in yields the first matches alphabetically. Terms shorter than a trigram use
+        # the names precomputed for them, or every name for more than MAX_SHORT_MATCHES
+        contains_terms = []
+        if len(term) >= 3:
+            candidates = (self.terms[index] for index in min((self.postings.get(term[i:i + 3], []) for i in range(len(term) - 2)), key = len))
+        elif limit <= self.MAX_SHORT_MATCHES:
+            candidates = self.short_matches.get(term, [])
+        else:
+            candidates = self.terms
+        for candidate in candidates:
+            if term in candidate and not candidate.startswith(term):
+                contains_terms.append(candidate)
+                if len(contains_terms) == limit:
+                    break
+
+        if not prefix_terms and not contains_terms:
+            if len(term) < self.MIN_FUZZY_LENGTH:
+                return []
+            corrected = self.correct(term)
+            fuzzy = [corrected] if corrected else []
+            return [name for candidate in fuzzy for name in self.by_lower[candidate]][:limit]
+        return [name for candidate in prefix_terms + contains_terms for name in self.by_lower[candidate]]
+
+    def resolve(self, keywords, autocorrect = None):
+        """
+        Returns the keyword names matching each keyword, ignoring case and, with autocorrect
+        (defaults to KEYWORD_AUTOCORRECT), replacing misspelled keywords by their closest match.
+        """
+
+        autocorrect = autocorrect_enabled if autocorrect is None else autocorrect
+        names = []
+        for keyword in keywords:
+            matches = self.lookup(keyword)
+            if not matches and autocorrect:
+                corrected = self.correct(keyword)
+                matches = self.by_lower[corrected] if corrected else []
+            names.extend(name for name in matches if name not in names)
+        return names
@@ -0,0 +1,334 @@
+import os
+import heapq
+import threading
+from collections import OrderedDict
+from dotenv import load_dotenv
+from . import mysql_utils, metrics_utils
+
+load_dotenv()
+
+
+## Leaderboard configuration
+# Largest number of faculty a leaderboard returns
+size = int(os.getenv("LEADERBOARD_SIZE", "100"))
+
+# Number of per-keyword leaderboards kept up to date; the least recently read ones are dropped
+# and built again on their next read
+max_fields = int(os.getenv("LEADERBOARD_FIELDS", "256"))
+
+# Seconds between polls of the outbox for edits that change citation totals
+poll_interval = float(os.getenv("LEADERBOARD_POLL_INTERVAL", "1"))
+
+REBUILDS = metrics_utils.counter(
+    "uri_leaderboard_rebuilds_total",
+    "Leaderboards rebuilt from every faculty's citation total, by leaderboard (global or keyword).",
+    ("leaderboard", )
+)
+
+
+class TopK:
+    """
+    The k highest of a changing set of scores.
+
+    Keeps a pool of at most 2 * k candidates and a bound such that every score outside the
+    pool is at most the bound and every score in the pool at least the bound, so the top k of
+    the pool is the top k overall. An update only touches the pool; the pool is rebuilt from
+    all scores only once removals leave fewer than k candidates.
+
+    Parameters
+    ----------
+    k : int
+        Number of scores to rank.
+    scores : dict
+        {key: score}, which the caller changes before calling update or remove.
+    """
+
+    def __init__(self, k, scores, name = "global"):
+        self.k = k
+        self.capacity = 2 * k
+        self.scores = scores
+        self.name = name
+        self.rebuild()
+
+    def rebuild(self):
+        top = heapq.nlargest(self.capacity + 1, self.scores.items(), key = lambda item: item[1])
+        self.pool = dict(top[:self.capacity])
+        self.bound = top[self.capacity][1] if len(top) > self.capacity else float("-inf")
+        self._ranking = None
+        REBUILDS.inc((self.name, ))
+
+    def update(self, key, score):
+        if key in self.pool:
+            if score < self.bound:
+                del self.pool[key]
+            else:
+                self.pool[key] = score
+        elif score > self.bound:
+            self.pool[key] = score
+            if len(self.pool) > self.capacity:
+                evicted = min(self.pool, key = self.pool.get)
+                self.bound = self.pool.pop(evicted)
+        else:
+            return
+        self._ranking = None
+        self._refill()
+
+    def remove(self, key):
+        if self.pool.pop(key, None) is not None:
+            self._ranking = None
+            self._refill()
+
+    def _refill(self):
+        if len(self.pool) < self.k and len(self.scores) > len(self.pool):
+            self.rebuild()
+
+    def top(self, k = None):
+        """
+        Returns [(key, score)] for the k highest scores, highest first and ties by key.
+        """
+
+        if self._ranking is None:
+            self._ranking = sorted(self.pool.items(), key = lambda item: (-item[1], item[0]))
+        return self._ranking[:min(k or self.k, self.k)]
+
+
+## Citation totals
+# Every faculty member's total citations, with their name and university when fetched by id
+TOTALS_QUERY = """SELECT f.id AS id, f.name AS name, u.name AS university, COALESCE(SUM(p.num_citations), 0) AS totalCitations
+                  FROM faculty f
+                  JOIN university u ON u.id = f.university_id
+                  LEFT JOIN faculty_publication fp ON fp.faculty_id = f.id
+                  LEFT JOIN publication p ON p.ID = fp.publication_id
+                  {where}
+                  GROUP BY f.id, f.name, u.name"""
+
+
+class Leaderboard:
+    """
+    Global and per-keyword top faculty by total citations, kept in memory and adjusted by
+    the publication edits recorded in the outbox.
+
+    Reading a leaderboard costs O(k) however many publications there are. The full
+    GROUP BY over faculty_publication runs once, when the leaderboard is built; afterwards
+    only the totals of the faculty named in new outbox entries are queried again, by id.
+    Queries run without holding the lock, which only guards the in-memory state.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        # Held while building, so concurrent first reads run the full GROUP BY once
+        self.build_lock = threading.Lock()
+        self.totals = {}
+        self.faculty = {}
+        self.fields = OrderedDict()
+        self.global_top = None
+        self.last_id = 0
+
+    def build(self):
+        mysql_conn = mysql_utils.get_connection()
+        mysql_cursor = mysql_conn.cursor()
+        try:
+            # Entries from here on are applied over the totals read below
+            last_id = mysql_utils.last_outbox_id(mysql_cursor)
+            mysql_utils.execute(mysql_cursor, TOTALS_QUERY.format(where = ""))
+            rows = mysql_cursor.fetchall()
+        finally:
+            mysql_cursor.close()
+            mysql_conn.close()
+
+        faculty = {faculty_id: (name, university) for faculty_id, name, university, _ in rows}
+        totals = {faculty_id: int(total) for faculty_id, _, _, total in rows}
+        global_top = TopK(size, totals)
+        with self.lock:
+            self.faculty, self.totals, self.global_top = faculty, totals, global_top
+            self.fields.clear()
+            self.last_id = last_id
+
+    def _ensure_built(self):
+        """
+        Builds the leaderboard on first use. Only first reads wait for the build; once built,
+        readers and the updater never wait for it.
+        """
+
+        if self.global_top is not None:
+            return
+        with self.build_lock:
+            if self.global_top is None:
+                self.build()
+
+    def _field(self, keyword):
+        """
+        Returns the TopK of the faculty with a keyword, building it on first use. Keywords
+        are matched case-insensitively, like the keyword names in MySQL, so every casing
+        shares one leaderboard. The members are queried without holding the lock, so other
+        readers and the updater do not wait for the query.
+        """
+
+        key = keyword.lower()
+        with self.lock:
+            if key in self.fields:
+                self.fields.move_to_end(key)
+                return self.fields[key]
+
+        mysql_conn = mysql_utils.get_connection()
+        mysql_cursor = mysql_conn.cursor()
+        try:
+            mysql_utils.execute(mysql_cursor, """SELECT fk.faculty_id FROM faculty_keyword fk
+                                             JOIN keyword k ON k.id = fk.keyword_id
+                                             WHERE k.name = %s""", (keyword, ))
+            members = [row[0] for row in mysql_cursor.fetchall()]
+        finally:
+            mysql_cursor.close()
+            mysql_conn.close()
+
+        with self.lock:
+            # Another reader may have built the leaderboard while the members were queried
+            if key not in self.fields:
+                self.fields[key] = TopK(size, {faculty_id: self.totals[faculty_id] for faculty_id in members if faculty_id in self.totals}, key)
+                if len(self.fields) > max_fields:
+                    self.fields.popitem(last = False)
+            self.fields.move_to_end(key)
+            return self.fields[key]
+
+    def top(self, keyword = None, k = 10):
+        """
+        Returns the k faculty with the most citations, overall or among the faculty with
+        a keyword, as [{"id", "name", "university", "totalCitations"}].
+        """
+
+        self._ensure_built()
+        field = self._field(keyword) if keyword else None
+        with self.lock:
+            ranking = (field if keyword else self.global_top).top(k)
+            return [
+                {"id": faculty_id, "name": self.faculty[faculty_id][0], "university": self.faculty[faculty_id][1], "totalCitations": total}
+                for faculty_id, total in ranking
+            ]
+
+    def set_totals(self, rows, faculty_ids):
+        """
+        Applies freshly queried totals for faculty_ids; faculty without a row were deleted.
+        """
+
+        found = set()
+        with self.lock:
+            for faculty_id, name, university, total in rows:
+                found.add(faculty_id)
+                total = int(total)
+                self.faculty[faculty_id] = (name, university)
+                self.totals[faculty_id] = total
+                self.global_top.update(faculty_id, total)
+                for field in self.fields.values():
+                    if faculty_id in field.scores:
+                        field.scores[faculty_id] = total
+                        field.update(faculty_id, total)
+            for faculty_id in set(faculty_ids) - found:
+                if self.totals.pop(faculty_id, None) is not None:
+                    self.faculty.pop(faculty_id, None)
+                    self.global_top.remove(faculty_id)
+                    for field in self.fields.values():
+                        if field.scores.pop(faculty_id, None) is not None:
+                            field.remove(faculty_id)
+
+    def poll(self):
+        """
+        Applies the outbox entries written since the last poll. Returns the number of
+        faculty whose totals were queried again.
+        """
+
+        self._ensure_built()
+        with self.lock:
+            last_id = self.last_id
+
+        mysql_conn = mysql_utils.get_connection()
+        mysql_cursor = mysql_conn.cursor()
+        try:
+            # Recomputing a faculty member's total is idempotent, so entries read twice are harmless
+            entries = mysql_utils.read_outbox(mysql_cursor, last_id)
+
+            faculty_ids, publication_ids = set(), set()
+            for _, event, payload in entries:
+                if event == "publication_added":
+                    faculty_ids.add(payload["faculty_id"])
+                elif event == "publication_updated" and "num_citations" in payload["fields"]:
+                    publication_ids.add(payload["id"])
+                elif event == "publication_deleted":
+                    faculty_ids.update(payload.get("faculty_ids", []))
+                elif event == "faculty_deleted":
+                    faculty_ids.update(payload["ids"])
+            if publication_ids:
+                placeholders = ", ".join(["%s"] * len(publication_ids))
+                mysql_utils.execute(mysql_cursor, f"SELECT faculty_id FROM faculty_publication WHERE publication_id IN ({placeholders})", list(publication_ids))
+                faculty_ids.update(row[0] for row in mysql_cursor.fetchall())
+
+            rows = []
+            if faculty_ids:
+                placeholders = ", ".join(["%s"] * len(faculty_ids))
+                mysql_utils.execute(mysql_cursor, TOTALS_QUERY.format(where = f"WHERE f.id IN ({placeholders})"), list(faculty_ids))
+                rows = mysql_cursor.fetchall()
+        finally:
+            mysql_cursor.close()
+            mysql_conn.close()
+
+        if faculty_ids:
+            self.set_totals(rows, faculty_ids)
+        with self.lock:
+            if entries:
+                self.last_id = max(self.last_id, entries[-1][0])
+        return len(faculty_ids)
+
+
+leaderboard = Leaderboard()
+
+
+# Function to get the top faculty by total citations
+@metrics_utils.timed_query("leaderboard")
+def get_top_faculty(keyword = None, k = 10):
+    """
+    Returns the top k faculty by total citations across all universities, or among the
+    faculty with a keyword.
+
+    Parameters
+    ----------
+    keyword : str, optional
+        Only rank faculty with this keyword.
+    k : int
+        Number of faculty to return, at most LEADERBOARD_SIZE.
+
+    Returns
+    -------
+    list of dict
+        {"id", "name", "university", "totalCitations"} per faculty member, most cited first.
+    """
+
+    return leaderboard.top(keyword, k)
+
+
+def run_updater(stop = None):
+    """
+    Applies outbox entries to the leaderboard every poll_interval seconds until stop is set.
+    """
+
+    stop = stop or threading.Event()
+    while not stop.is_set():
+        try:
+            leaderboard.poll()
+        except Exception as e:
+            print("Error updating the leaderboard:", e)
+        stop.wait(poll_interval)
+
+
+_updater = None
+
+
+# Function to start the leaderboard updater in the background
+def start_updater():
+    """
+    Starts the updater on a daemon thread, once per process.
+    """
+
+    global _updater
+    if _updater is None:
+        _updater = threading.Thread(target = run_updater, name = "leaderboard-updater", daemon = True)
+        _updater.start()
+    return _updater
@@ -0,0 +1,233 @@
+import os
+import time
+import threading
+import tracemalloc
+from flask import jsonify, request, abort
+
+
+## Memory profiling configuration
+# MEMORY_PROFILING=1 traces every Python allocation with tracemalloc, which slows the
+# dashboard down and uses more memory, so it is meant for diagnosing a worker, not for
+# everyday use
+enabled = os.getenv("MEMORY_PROFILING") == "1"
+
+# Number of stack frames kept per allocation; more frames tell which caller allocated,
+# at a higher cost
+trace_frames = int(os.getenv("MEMORY_PROFILING_FRAMES", "10"))
+
+MEMORY_BUCKETS = (2 ** 16, 2 ** 18, 2 ** 20, 2 ** 22, 2 ** 24, 2 ** 26, 2 ** 28)
+
+if enabled and not tracemalloc.is_tracing():
+    tracemalloc.start(trace_frames)
+
+# Allocations since this snapshot, taken once the app is set up or on request, are
+# reported as growth, to find what keeps memory
+_baseline = None
+
+
+## Peak and retained memory per callback and query function
+class Measurement:
+    """
+    The memory traced while a callback or query function runs: the peak above the traced
+    memory when it started, and the memory still traced when it returned (retained).
+
+    tracemalloc traces the whole process, so with concurrent requests a measurement also
+    includes what other threads allocated meanwhile; measure a single worker thread, or
+    compare many calls, for exact figures.
+    """
+
+    __slots__ = ("kind", "name", "start", "peak")
+
+    def __init__(self, kind, name):
+        self.kind = kind
+        self.name = name
+
+    def __enter__(self):
+        with _lock:
+            _observe_peak()
+            self.start = self.peak = tracemalloc.get_traced_memory()[0]
+            _active.add(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        with _lock:
+            _observe_peak()
+            _active.discard(self)
+            current = tracemalloc.get_traced_memory()[0]
+        _record(self.kind, self.name, self.peak - self.start, current - self.start)
+        return False
+
+
+class _NoMeasurement:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NO_MEASUREMENT = _NoMeasurement()
+_active = set()
+_lock = threading.Lock()
+_stats = {}
+_histograms = None
+
+
+def _observe_peak():
+    """
+    Raises the peak of every running measurement to the traced peak, then resets the traced
+    peak, so nested and concurrent measurements each see their own peak.
+    """
+
+    peak = tracemalloc.get_traced_memory()[1]
+    for measurement in _active:
+        measurement.peak = max(measurement.peak, peak)
+    tracemalloc.reset_peak()
+
+
+def _record(kind, name, peak, retained):
+    global _histograms
+    if _histograms is None:
+        from . import metrics_utils
+        _histograms = (
+            metrics_utils.histogram("uri_memory_peak_bytes", "Peak traced memory while a callback or query function ran, above the memory traced when it started (MEMORY_PROFILING=1).", ("kind", "name"), buckets = MEMORY_BUCKETS),
+            metrics_utils.histogram("uri_memory_retained_bytes", "Traced memory still allocated when a callback or query function returned (MEMORY_PROFILING=1).", ("kind", "name"), buckets = MEMORY_BUCKETS)
+        )
+    _histograms[0].observe((kind, name), peak)
+    _histograms[1].observe((kind, name), max(retained, 0))
+
+    with _lock:
+        stats = _stats.setdefault((kind, name), {"calls": 0, "peak_max": 0, "peak_total": 0, "retained_total": 0})
+        stats["calls"] += 1
+        stats["peak_max"] = max(stats["peak_max"], peak)
+        stats["peak_total"] += peak
+        stats["retained_total"] += retained
+
+
+# Function to measure the memory used by a callback or query function
+def measure(kind, name):
+    """
+    Returns a context manager measuring the peak and retained memory of the code it wraps,
+    or doing nothing unless MEMORY_PROFILING=1.
+
+    Parameters
+    ----------
+    kind : str
+        "callback" or "query".
+    name : str
+        The callback, or the query function as backend.function.
+    """
+
+    if not enabled:
+        return _NO_MEASUREMENT
+    return Measurement(kind, name)
+
+
+## Debug endpoint
+def _rss():
+    """
+    Returns the resident set size of the process in bytes, or None where /proc is missing.
+    """
+
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _sites(statistics, top):
+    return [
+        {
+            "site": [f"{frame.filename}:{frame.lineno}" for frame in stat.traceback],
+            "size": stat.size,
+            "count": stat.count,
+            **({"size_diff": stat.size_diff, "count_diff": stat.count_diff} if hasattr(stat, "size_diff") else {})
+        }
+        for stat in statistics[:top]
+    ]
+
+
+def _snapshot():
+    # Leaves out the profiler's own allocations and module imports
+    return tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>")
+    ))
+
+
+def report(top = 20, group = "lineno"):
+    """
+    Returns the memory profile: the peak and retained memory of every measured callback and
+    query function, the top allocation sites by size, and the sites that grew most since
+    the baseline.
+    """
+
+    snapshot = _snapshot()
+    current, peak = tracemalloc.get_traced_memory()
+    with _lock:
+        functions = [
+            {
+                "kind": kind,
+                "name": name,
+                "calls": stats["calls"],
+                "peak_max_bytes": stats["peak_max"],
+                "peak_mean_bytes": stats["peak_total"] // stats["calls"],
+                "retained_total_bytes": stats["retained_total"]
+            }
+            for (kind, name), stats in _stats.items()
+        ]
+    functions.sort(key = lambda row: row["peak_max_bytes"], reverse = True)
+
+    return {
+        "rss_bytes": _rss(),
+        "traced_bytes": current,
+        "traced_peak_bytes": peak,
+        "functions": functions,
+        "top_sites": _sites(snapshot.statistics(group), top),
+        "growth_since_baseline": _sites(snapshot.compare_to(_baseline, group), top) if _baseline else []
+    }
+
+
+def register_memory_endpoint(server, path = "/debug/memory"):
+    """
+    Exposes the memory profile as JSON on the Flask server, to local requests only, e.g.
+    /debug/memory?top=30&group=traceback. /debug/memory?reset=1 makes the current
+    allocations the baseline growth is measured from.
+
+    Parameters
+    ----------
+    server : flask.Flask
+        The Flask server behind the Dash app (app.server).
+    path : str
+        The URL path to serve the profile on.
+    """
+
+    from .metrics_utils import is_local_request
+
+    global _baseline
+    if enabled:
+        _baseline = _snapshot()
+
+    def memory():
+        if not is_local_request():
+            abort(403)
+        if not enabled:
+            return jsonify({"error": "Memory profiling is off; start the dashboard with MEMORY_PROFILING=1"}), 404
+
+        global _baseline
+        if request.args.get("reset") == "1":
+            _baseline = _snapshot()
+            with _lock:
+                _stats.clear()
+        group = request.args.get("group", "lineno")
+        if group not in ("lineno", "filename", "traceback"):
+            abort(400)
+        start = time.perf_counter()
+        profile = report(request.args.get("top", 20, type = int), group)
+        profile["report_seconds"] = round(time.perf_counter() - start, 3)
+        return jsonify(profile)
+
+    server.add_url_rule(path, "memory", memory)
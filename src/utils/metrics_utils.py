@@ -0,0 +1,332 @@
+import os
+import time
+import bisect
+import functools
+import threading
+from flask import Response, request, abort
+from . import tracing_utils, memory_utils
+
+
+## Metric registry
+# Default latency buckets (seconds), same as the Prometheus client defaults
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Buckets for the number of rows returned by a query
+ROW_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000)
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def _escape(value):
+    """
+    Escapes a label value for the Prometheus text format.
+    """
+
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(label_names, label_values, extra = None):
+    """
+    Formats label names and values as {name="value",...}.
+    """
+
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(label_names, label_values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{_escape(extra[1])}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """
+    Monotonically increasing counter keyed by a tuple of label values.
+    """
+
+    type_name = "counter"
+
+    def __init__(self, name, documentation, label_names):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels = (), amount = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.label_names, labels)} {value}" for labels, value in items]
+
+
+class Gauge(Counter):
+    """
+    Value that can go up and down, keyed by a tuple of label values.
+    """
+
+    type_name = "gauge"
+
+    def set(self, labels = (), value = 0):
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram:
+    """
+    Cumulative histogram keyed by a tuple of label values.
+    """
+
+    type_name = "histogram"
+
+    def __init__(self, name, documentation, label_names, buckets = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        # Index of the first bucket whose upper bound is >= value (len(buckets) is +Inf)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def render(self):
+        with self._lock:
+            items = sorted((labels, ([*state[0]], state[1], state[2])) for labels, state in self._values.items())
+        lines = []
+        for labels, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, labels, ('le', le))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, labels)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, labels)} {count}")
+        return lines
+
+
+def _register(metric_class, name, *args, **kwargs):
+    """
+    Returns the metric registered under name, creating it if needed.
+    """
+
+    with _registry_lock:
+        metric = _registry.get(name)
+        if metric is None:
+            metric = _registry[name] = metric_class(name, *args, **kwargs)
+        return metric
+
+
+def counter(name, documentation, label_names = ()):
+    return _register(Counter, name, documentation, label_names)
+
+
+def gauge(name, documentation, label_names = ()):
+    return _register(Gauge, name, documentation, label_names)
+
+
+def histogram(name, documentation, label_names = (), buckets = DEFAULT_BUCKETS):
+    return _register(Histogram, name, documentation, label_names, buckets = buckets)
+
+
+def render_metrics():
+    """
+    Renders every registered metric in the Prometheus text exposition format.
+
+    Returns
+    -------
+    str
+    """
+
+    with _registry_lock:
+        metrics = sorted(_registry.values(), key = lambda metric: metric.name)
+    lines = []
+    for metric in metrics:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.type_name}")
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+## Query and callback metrics
+QUERY_DURATION = histogram(
+    "uri_query_duration_seconds",
+    "Latency of data-access functions in the utils modules.",
+    ("backend", "function")
+)
+QUERY_ROWS = histogram(
+    "uri_query_rows",
+    "Number of rows returned by data-access functions in the utils modules.",
+    ("backend", "function"),
+    buckets = ROW_BUCKETS
+)
+QUERY_ERRORS = counter(
+    "uri_query_errors_total",
+    "Errors raised or handled by data-access functions in the utils modules.",
+    ("backend", "function")
+)
+CALLBACK_DURATION = histogram(
+    "uri_callback_duration_seconds",
+    "Latency of Dash callbacks.",
+    ("callback",)
+)
+CALLBACK_ERRORS = counter(
+    "uri_callback_errors_total",
+    "Exceptions raised by Dash callbacks.",
+    ("callback",)
+)
+
+
+def _count_rows(result):
+    """
+    Returns the number of rows in a query result, or None if it is not a collection.
+    """
+
+    if result is None:
+        return 0
+    if isinstance(result, (list, tuple, set)):
+        return len(result)
+    return None
+
+
+# Function to count an error that a query function handled itself instead of raising
+def count_query_error(backend, function):
+    """
+    Increments the error counter for a query function that caught its own exception.
+
+    Parameters
+    ----------
+    backend : str
+        The database the function queries, i.e. "mysql", "mongodb" or "neo4j".
+    function : str
+        The name of the query function.
+    """
+
+    QUERY_ERRORS.inc((backend, function))
+
+
+# Decorator for timing query functions in the utils modules
+def timed_query(backend):
+    """
+    Decorator that records latency, row count and errors for a query function, times it as
+    a "query" span of the current trace, and measures its memory when memory profiling is on.
+
+    Parameters
+    ----------
+    backend : str
+        The database the function queries, i.e. "mysql", "mongodb" or "neo4j".
+    """
+
+    def decorator(func):
+        labels = (backend, func.__name__)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                with tracing_utils.span("query", backend = backend, function = func.__name__), memory_utils.measure("query", f"{backend}.{func.__name__}"):
+                    result = func(*args, **kwargs)
+            except Exception:
+                QUERY_ERRORS.inc(labels)
+                raise
+            finally:
+                QUERY_DURATION.observe(labels, time.perf_counter() - start)
+            rows = _count_rows(result)
+            if rows is not None:
+                QUERY_ROWS.observe(labels, rows)
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+def timed_callback(func):
+    """
+    Wraps a Dash callback function to record its latency and errors, to time it as a
+    "callback" span of the current trace, and to measure its memory when memory profiling
+    is on.
+    """
+
+    labels = (func.__name__,)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            with tracing_utils.span("callback", callback = func.__name__), memory_utils.measure("callback", func.__name__):
+                return func(*args, **kwargs)
+        except Exception:
+            CALLBACK_ERRORS.inc(labels)
+            raise
+        finally:
+            CALLBACK_DURATION.observe(labels, time.perf_counter() - start)
+
+    return wrapper
+
+
+# Function to time every callback registered on the app
+def instrument_callbacks(app):
+    """
+    Replaces app.callback so that every callback registered afterwards is timed.
+    Must be called before any @app.callback decorators run.
+
+    Parameters
+    ----------
+    app : dash.Dash
+        The Dash app whose callbacks should be timed.
+    """
+
+    register_callback = app.callback
+
+    @functools.wraps(register_callback)
+    def callback(*args, **kwargs):
+        decorator = register_callback(*args, **kwargs)
+
+        def wrap(func):
+            return decorator(timed_callback(func))
+
+        return wrap
+
+    app.callback = callback
+
+
+## /metrics endpoint
+def is_local_request():
+    """
+    Returns True if the current Flask request comes from the loopback interface
+    or if remote access to debug endpoints has been enabled with METRICS_ALLOW_REMOTE=1.
+    """
+
+    if os.getenv("METRICS_ALLOW_REMOTE") == "1":
+        return True
+    return request.remote_addr in ("127.0.0.1", "::1")
+
+
+def register_metrics_endpoint(server, path = "/metrics"):
+    """
+    Exposes the metric registry in Prometheus text format on the Flask server.
+
+    Parameters
+    ----------
+    server : flask.Flask
+        The Flask server behind the Dash app (app.server).
+    path : str
+        The URL path to serve metrics on.
+    """
+
+    def metrics():
+        if not is_local_request():
+            abort(403)
+        return Response(render_metrics(), mimetype = "text/plain; version=0.0.4")
+
+    server.add_url_rule(path, "metrics", metrics)
@@ -1,6 +1,10 @@
 import os
+import sys
+import json
+import time
 from pymongo import MongoClient
 from dotenv import load_dotenv
+from . import metrics_utils, slow_query_utils
 
 load_dotenv()
 
@@ -9,16 +13,80 @@ load_dotenv()
 port = os.getenv("MONGO_PORT")
 
 mongo_client = MongoClient(f"mongodb://localhost:{port}/")
-mongo_db = mongo_client["academicworld"]
+mongo_db = mongo_client[os.getenv("DB_NAME", "academicworld")]
 print("Mongo connection successful")
 
 
+# Function to run an aggregation pipeline, recording it in the slow query log if it is slow
+def aggregate(collection, pipeline):
+    """
+    Runs an aggregation pipeline and returns all result documents. When slow query capture
+    is enabled and the pipeline takes longer than SLOW_QUERY_THRESHOLD_MS, it is recorded in
+    the slow query log together with a sampled explain("executionStats") plan.
+
+    Parameters
+    ----------
+    collection : pymongo.collection.Collection
+        The collection to aggregate.
+    pipeline : list of dict
+        The aggregation pipeline.
+
+    Returns
+    -------
+    list
+    """
+
+    start = time.perf_counter()
+    results = list(collection.aggregate(pipeline))
+    elapsed = time.perf_counter() - start
+    if slow_query_utils.is_slow(elapsed):
+        function = sys._getframe(1).f_code.co_name
+        command = {"aggregate": collection.name, "pipeline": pipeline, "cursor": {}}
+        slow_query_utils.record("mongodb", function, json.dumps(command, default = str), None, elapsed, lambda: explain(command))
+    return results
+
+# Function to get the distinct values of a field, recording it in the slow query log if it is slow
+def distinct(collection, key):
+    """
+    Returns the distinct values of a field, like collection.distinct(key), with slow query capture.
+
+    Parameters
+    ----------
+    collection : pymongo.collection.Collection
+        The collection to query.
+    key : str
+        The field to get the distinct values of.
+
+    Returns
+    -------
+    list
+    """
+
+    start = time.perf_counter()
+    results = collection.distinct(key)
+    elapsed = time.perf_counter() - start
+    if slow_query_utils.is_slow(elapsed):
+        function = sys._getframe(1).f_code.co_name
+        command = {"distinct": collection.name, "key": key}
+        slow_query_utils.record("mongodb", function, json.dumps(command), None, elapsed, lambda: explain(command))
+    return results
+
+# Function to get the plan of a command
+def explain(command):
+    """
+    Returns the explain("executionStats") output of an aggregate or distinct command.
+    """
+
+    return mongo_db.command("explain", command, verbosity = "executionStats")
+
+
 ## Top Right Widget (university publications over time)
 # Create index on publications collection
 top_right_index = mongo_db.publications.create_index([("id", 1)])
 print("Index on publications.id created")
 
 # Function to query university publications over time
+@metrics_utils.timed_query("mongodb")
 def top_right_query(universities = None, years = None):
     """
     Aggregates publication counts by university and year.
@@ -78,25 +146,100 @@ def top_right_query(universities = None, years = None):
         {"$sort": {"_id.university": 1, "_id.year": 1}}
     ])
 
-    results = mongo_db.faculty.aggregate(pipeline)
-
-    return list(results)
+    return aggregate(mongo_db.faculty, pipeline)
 
 # Function to get all universities to create dropdown options for the top right widget
+@metrics_utils.timed_query("mongodb")
 def get_all_universities():
     """
     Returns a list of all universities for dropdown options.
     """
 
-    universities = mongo_db.faculty.distinct("affiliation.name")
+    universities = distinct(mongo_db.faculty, "affiliation.name")
     return sorted(universities)
 
 # Function to min and max years for the year range slider
+@metrics_utils.timed_query("mongodb")
 def get_publication_year_range():
     """
     Returns the [min, max] range of publication years.
     """
 
-    years = mongo_db.publications.distinct("year")
+    years = distinct(mongo_db.publications, "year")
     valid_years = [year for year in years if isinstance(year, int) and year > 0]
     return [min(valid_years), max(valid_years)] if valid_years else [None, None]
+
+
+## Routed widget queries (the top left and middle right widgets are normally answered by
+## MySQL and Neo4j; see routing_utils.py)
+# Function for searching by university and getting the citation ranking
+@metrics_utils.timed_query("mongodb")
+def get_citation_ranking(name):
+    """
+    Returns the top 10 faculty of a university by total citations, like mysql_utils.get_citation_ranking.
+
+    Parameters
+    ----------
+    name : str
+        The name of the university.
+    """
+
+    pipeline = [
+        {"$match": {"affiliation.name": name}},
+        {"$project": {"name": 1, "publications": 1}},
+        {
+            "$lookup": {
+                "from": "publications",
+                "localField": "publications",
+                "foreignField": "id",
+                "as": "pub_data"
+            }
+        },
+        {"$unwind": "$pub_data"},
+        {"$group": {"_id": "$name", "totalCitations": {"$sum": "$pub_data.numCitations"}}},
+        {"$sort": {"totalCitations": -1}},
+        {"$limit": 10},
+        {"$project": {"_id": 0, "name": "$_id", "totalCitations": 1}}
+    ]
+    return aggregate(mongo_db.faculty, pipeline)
+
+# Function to compute KRC for top 10 universities with a given keyword
+@metrics_utils.timed_query("mongodb")
+def get_krc(keyword):
+    """
+    Returns the top 10 universities by keyword-relevant citations, like neo4j_utils.get_krc.
+
+    Parameters
+    ----------
+    keyword : str
+        The keyword name.
+    """
+
+    pipeline = [
+        {"$project": {"affiliation.name": 1, "publications": 1}},
+        {
+            "$lookup": {
+                "from": "publications",
+                "localField": "publications",
+                "foreignField": "id",
+                "pipeline": [
+                    {"$match": {"keywords.name": keyword}},
+                    {"$project": {"numCitations": 1, "keywords": 1}}
+                ],
+                "as": "pub_data"
+            }
+        },
+        {"$unwind": "$pub_data"},
+        {"$unwind": "$pub_data.keywords"},
+        {"$match": {"pub_data.keywords.name": keyword}},
+        {
+            "$group": {
+                "_id": "$affiliation.name",
+                "totalKRC": {"$sum": {"$multiply": ["$pub_data.keywords.score", "$pub_data.numCitations"]}}
+            }
+        },
+        {"$sort": {"totalKRC": -1}},
+        {"$limit": 10},
+        {"$project": {"_id": 0, "university": "$_id", "totalKRC": 1}}
+    ]
+    return aggregate(mongo_db.faculty, pipeline)
@@ -1,25 +1,38 @@
 import os
+import re
+import sys
+import json
+import time
+import threading
+import numpy as np
 import mysql.connector
 from dotenv import load_dotenv
+from . import metrics_utils, coalesce_utils, prewarm_utils, slow_query_utils, statement_utils, replica_utils, keyword_index_utils, similarity_utils, trend_utils
 
 load_dotenv()
 
 
 ## MySQL connection setup
-host = "localhost"
-port = os.getenv("MYSQL_DB_PORT")
+# The primary, which every edit goes to
+host = os.getenv("MYSQL_DB_HOST", "localhost")
+port = int(os.getenv("MYSQL_DB_PORT", "3306"))
 user = os.getenv("MYSQL_DB_USER")
 password = os.getenv("MYSQL_DB_PASSWORD")
-database = "academicworld"
+database = os.getenv("DB_NAME", "academicworld")
 
-def get_connection():
+# Comma-separated host[:port] replicas that read-only queries can go to (see replica_utils.py)
+replica_endpoints = replica_utils.parse_endpoints(os.getenv("MYSQL_REPLICAS", ""), port)
+
+def get_connection(endpoint = None):
     """
-    Establishes a connection to the MySQL database.
+    Establishes a connection to the MySQL database, on the primary unless a (host, port)
+    endpoint is given.
     """
 
+    connection_host, connection_port = endpoint or (host, port)
     return mysql.connector.connect(
-        host = host,
-        port = port,
+        host = connection_host,
+        port = connection_port,
         user = user,
         password = password,
         database = database
@@ -32,7 +45,12 @@ index_queries = [
     "CREATE INDEX idx_faculty_keyword_faculty_id ON faculty_keyword(faculty_id)",
     "CREATE INDEX idx_faculty_keyword_keyword_id ON faculty_keyword(keyword_id)",
     "CREATE INDEX idx_faculty_university_id ON faculty(university_id)",
-    "CREATE INDEX idx_keyword_name ON keyword(name)"
+    "CREATE INDEX idx_keyword_name ON keyword(name)",
+    # Lets the trigger below check whether a publication still has authors
+    "CREATE INDEX idx_faculty_publication_publication_id ON faculty_publication(publication_id)",
+    # Keyset pagination of the faculty and publication pickers (see search_faculty and search_publications)
+    "CREATE INDEX idx_faculty_university_id_name ON faculty(university_id, name)",
+    "CREATE INDEX idx_faculty_publication_faculty_id_publication_id ON faculty_publication(faculty_id, publication_id)"
 ]
 
 for query in index_queries:
@@ -52,7 +70,12 @@ CREATE TRIGGER IF NOT EXISTS delete_faculty_publication_after_publication_delete
 AFTER DELETE ON faculty_publication
 FOR EACH ROW
 BEGIN
-    DELETE FROM publication WHERE id = OLD.publication_id;
+    -- Only delete publications that no longer have any author, since a publication can be
+    -- shared by faculty from several universities
+    IF NOT EXISTS (SELECT 1 FROM faculty_publication WHERE publication_id = OLD.publication_id) THEN
+        DELETE FROM publication_keyword WHERE publication_id = OLD.publication_id;
+        DELETE FROM publication WHERE id = OLD.publication_id;
+    END IF;
 END
 """
 
@@ -69,10 +92,455 @@ except mysql.connector.Error as e:
     print("Error creating trigger:", e)
 # --- End trigger block ---
 
+# Create the view of university keyword scores read by middle_left_query
+view_query = """
+CREATE OR REPLACE VIEW university_keyword_score AS
+SELECT u.id AS university_id,
+       u.name AS university_name,
+       k.id AS keyword_id,
+       k.name AS keyword_name,
+       SUM(fk.score) AS total_keyword_score
+FROM faculty f
+JOIN faculty_keyword fk ON f.id = fk.faculty_id
+JOIN keyword k ON fk.keyword_id = k.id
+JOIN university u ON f.university_id = u.id
+GROUP BY u.id, u.name, k.id, k.name
+"""
+
+try:
+    mysql_conn = get_connection()
+    mysql_cursor = mysql_conn.cursor()
+    mysql_cursor.execute(view_query)
+    mysql_conn.commit()
+    mysql_cursor.close()
+    mysql_conn.close()
+except mysql.connector.Error as e:
+    print("Error creating view:", e)
+
+## Outbox of edits to propagate to MongoDB and Neo4j (applied by outbox_utils.py),
+## progress of university deletions (see delete_university), and the freshness of the
+## precomputed aggregates (see aggregate_utils.py)
+table_queries = ["""
+CREATE TABLE IF NOT EXISTS outbox (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    event VARCHAR(64) NOT NULL,
+    payload JSON NOT NULL,
+    created_at TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6),
+    applied_at TIMESTAMP(6) NULL,
+    INDEX idx_outbox_applied_at (applied_at, id)
+)
+""", """
+CREATE TABLE IF NOT EXISTS deletion_job (
+    university_id INT PRIMARY KEY,
+    university_name VARCHAR(255) NOT NULL,
+    status VARCHAR(16) NOT NULL DEFAULT 'running',
+    faculty_deleted INT NOT NULL DEFAULT 0,
+    rows_deleted BIGINT NOT NULL DEFAULT 0,
+    started_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+)
+""", """
+CREATE TABLE IF NOT EXISTS aggregate_freshness (
+    name VARCHAR(64) PRIMARY KEY,
+    built_at TIMESTAMP(6) NOT NULL,
+    watermark BIGINT NOT NULL,
+    mode VARCHAR(16) NOT NULL,
+    partitions INT NOT NULL,
+    row_count BIGINT NOT NULL,
+    seconds DOUBLE NOT NULL
+)
+"""]
+
+for query in table_queries:
+    try:
+        mysql_conn = get_connection()
+        mysql_cursor = mysql_conn.cursor()
+        mysql_cursor.execute(query)
+        mysql_conn.commit()
+        mysql_cursor.close()
+        mysql_conn.close()
+    except mysql.connector.Error as e:
+        print("Error creating table:", e)
+
+# Function to execute a statement, recording it in the slow query log if it is slow
+def execute(mysql_cursor, query, params = None, caller = None):
+    """
+    Executes a statement on the given cursor. When slow query capture is enabled and
+    the statement takes longer than SLOW_QUERY_THRESHOLD_MS, it is recorded in the slow
+    query log together with a sampled EXPLAIN FORMAT=JSON plan.
+
+    Parameters
+    ----------
+    mysql_cursor : mysql.connector cursor
+        The cursor to execute the statement on.
+    query : str
+        The SQL statement.
+    params : tuple or list, optional
+        The statement parameters.
+    caller : str, optional
+        The function name recorded in the slow query log, by default the calling function.
+    """
+
+    start = time.perf_counter()
+    mysql_cursor.execute(query, params)
+    elapsed = time.perf_counter() - start
+    if slow_query_utils.is_slow(elapsed):
+        function = caller or sys._getframe(1).f_code.co_name
+        slow_query_utils.record("mysql", function, query, params, elapsed, lambda: explain(query, params))
+
+# Function to get the plan of a statement
+def explain(query, params = None):
+    """
+    Returns the EXPLAIN FORMAT=JSON plan of a statement, or None for statements that cannot be explained.
+    The plan is fetched on a separate connection so it never interferes with open cursors.
+
+    Parameters
+    ----------
+    query : str
+        The SQL statement.
+    params : tuple or list, optional
+        The statement parameters.
+
+    Returns
+    -------
+    dict or None
+    """
+
+    if not re.match(r"\s*(SELECT|INSERT|UPDATE|DELETE|REPLACE)\b", query, re.IGNORECASE):
+        return None
+
+    mysql_conn = get_connection()
+    mysql_cursor = mysql_conn.cursor()
+    try:
+        mysql_cursor.execute("EXPLAIN FORMAT=JSON " + query, params)
+        return json.loads(mysql_cursor.fetchone()[0])
+    finally:
+        mysql_cursor.close()
+        mysql_conn.close()
+
+## Prepared statements for read-only queries (see statement_utils.py)
+# MYSQL_PREPARED_STATEMENTS=0 sends every read as text on a new connection instead, e.g. to
+# benchmark the difference
+prepared_statements = os.getenv("MYSQL_PREPARED_STATEMENTS", "1") != "0"
+
+def _open_pool(endpoint = None):
+    return statement_utils.ConnectionPool(
+        lambda: get_connection(endpoint),
+        int(os.getenv("MYSQL_POOL_SIZE", "8")),
+        int(os.getenv("MYSQL_STATEMENT_CACHE_SIZE", "64"))
+    )
+
+pool = _open_pool()
+replicas = replica_utils.ReplicaSet(replica_endpoints, _open_pool)
+
+READS = metrics_utils.counter(
+    "uri_mysql_reads_total",
+    "Read-only MySQL queries, by the endpoint that answered them (primary or a replica).",
+    ("endpoint", )
+)
+
+# Function to open a connection for a long read-only query
+def get_read_connection():
+    """
+    Establishes a connection to a replica that is up to date with the edits of this process
+    and of the current browser session (see replica_utils.ReplicaSet.choose), or to the primary.
+    """
+
+    replica = replicas.choose()
+    return get_connection(replica.endpoint if replica else None)
+
+def _read(read_pool, endpoint, query, params, dictionary, caller):
+    if not prepared_statements:
+        mysql_conn = get_connection(endpoint)
+        mysql_cursor = mysql_conn.cursor(dictionary = dictionary)
+        try:
+            execute(mysql_cursor, query, params, caller)
+            return mysql_cursor.fetchall()
+        finally:
+            mysql_cursor.close()
+            mysql_conn.close()
+
+    with read_pool.statements() as statements:
+        mysql_cursor, statement = statements.get(query)
+        execute(mysql_cursor, statement, params, caller)
+        rows = mysql_cursor.fetchall()
+        if dictionary:
+            columns = [desc[0] for desc in mysql_cursor.description]
+            rows = [dict(zip(columns, row)) for row in rows]
+        return rows
+
+# Function to run a read-only query
+def read(query, params = None, dictionary = False):
+    """
+    Runs a read-only query as a server-side prepared statement on a pooled connection,
+    preparing it only the first time that connection sees it, and returns all its rows.
+
+    The query goes to a replica when one is configured, healthy and up to date with the
+    edits made by this process and by the current browser session, and to the primary otherwise. A read that fails because
+    its connection was lost is retried once, on the primary.
+
+    Parameters
+    ----------
+    query : str
+        The SQL statement, with %s placeholders. IN lists should come from
+        statement_utils.in_list so that they are prepared once per bucketed length.
+    params : tuple or list, optional
+        The statement parameters.
+    dictionary : bool
+        Return every row as a dict keyed by column name instead of a tuple.
+
+    Returns
+    -------
+    list
+    """
+
+    caller = sys._getframe(1).f_code.co_name
+    replica = replicas.choose()
+    for attempt in range(2):
+        try:
+            rows = _read(replica.pool if replica else pool, replica.endpoint if replica else None, query, params, dictionary, caller)
+            READS.inc((replica.name if replica else "primary", ))
+            return rows
+        except statement_utils.CONNECTION_ERRORS:
+            if attempt:
+                raise
+            if replica:
+                replicas.mark_down(replica)
+                replica = None
+
+# Function to record an edit in the outbox
+def enqueue(mysql_cursor, event, payload):
+    """
+    Records an edit in the outbox table. Call it on the cursor of the transaction that makes
+    the edit, so that the edit and its outbox entry are committed or rolled back together.
+
+    Parameters
+    ----------
+    event : str
+        The kind of edit, e.g. "publication_added" (see outbox_utils.py).
+    payload : dict
+        The values the other databases need to apply the edit.
+    """
+
+    execute(mysql_cursor, "INSERT INTO outbox (event, payload) VALUES (%s, %s)", (event, json.dumps(payload)))
+
+# Function to commit an edit
+def commit(mysql_conn):
+    """
+    Commits the transaction of an edit. Reads made by this process and by the browser session
+    that made the edit go to the primary until a replica has applied it.
+    """
+
+    mysql_conn.commit()
+    replicas.mark_write()
+    # This process's edit makes the aggregates out of date until the next precompute run
+    _aggregates["checked"] = 0.0
+
+# Function to read the outbox entries written after a given entry
+def read_outbox(mysql_cursor, after_id, overlap_seconds = 10):
+    """
+    Returns [(id, event, payload)] for the outbox entries with an id above after_id, for
+    in-memory structures that follow edits made by every dashboard process. Entries written
+    in the last overlap_seconds are returned again, since an entry with a lower id can commit
+    after a higher one, so readers must be able to apply an entry twice.
+    """
+
+    execute(mysql_cursor, """SELECT id, event, payload FROM outbox
+                         WHERE id > %s OR created_at > NOW(6) - INTERVAL %s SECOND
+                         ORDER BY id""", (after_id, overlap_seconds))
+    return [(entry_id, event, json.loads(payload)) for entry_id, event, payload in mysql_cursor.fetchall()]
+
+
+def last_outbox_id(mysql_cursor):
+    """
+    Returns the id of the latest outbox entry, or 0.
+    """
+
+    execute(mysql_cursor, "SELECT COALESCE(MAX(id), 0) FROM outbox")
+    return mysql_cursor.fetchone()[0]
+
+## Precomputed aggregates (built by precompute.py; see aggregate_utils.py)
+# AGGREGATES=0 always computes the widgets from the base tables
+use_aggregates = os.getenv("AGGREGATES", "1") != "0"
+
+# Seconds between checks of which aggregates are up to date with the outbox; edits made by
+# other dashboard processes are read from the aggregates for at most this long
+aggregate_check_interval = float(os.getenv("AGGREGATE_CHECK_INTERVAL", "10"))
+
+_aggregates = {"checked": 0.0, "current": frozenset()}
+
+# Aggregates that every publication edit updates in its own transaction (see refresh_impact),
+# so they stay current once built. IMPACT_REFRESH=0 leaves them to precompute.py instead,
+# like the other aggregates, which keeps the refresh out of the edits' transactions; set it
+# the same way for every dashboard process
+IMPACT_AGGREGATES = ("agg_faculty_impact", "agg_university_impact")
+impact_refresh = os.getenv("IMPACT_REFRESH", "1") != "0"
+
+IMPACT_REFRESH_DURATION = metrics_utils.histogram(
+    "uri_impact_refresh_seconds",
+    "Time publication edits spend recomputing the h-index and i10-index aggregates in their transaction, by aggregate.",
+    ("aggregate", )
+)
+
+# Function to get the freshness of the precomputed aggregates
+def get_aggregate_freshness():
+    """
+    Returns the freshness of every precomputed aggregate, as dicts of name, built_at (UNIX
+    time), watermark (the last outbox entry it includes), mode (full or incremental),
+    partitions, row_count, seconds, and current (whether it includes every edit), or an
+    empty list if none was built. An aggregate whose first build is running is in mode
+    "building" and never current.
+    """
+
+    try:
+        rows = read("""SELECT name, UNIX_TIMESTAMP(built_at) AS built_at, watermark, mode, partitions, row_count, seconds
+                       FROM aggregate_freshness
+                       ORDER BY name""", dictionary = True)
+        latest = read("SELECT COALESCE(MAX(id), 0) FROM outbox")[0][0]
+    except mysql.connector.Error as e:
+        print("Error reading aggregate freshness:", e)
+        return []
+    for row in rows:
+        row["built_at"] = float(row["built_at"])
+        maintained = impact_refresh and row["name"] in IMPACT_AGGREGATES
+        row["current"] = row["mode"] != "building" and (row["watermark"] >= latest or maintained)
+    return rows
+
+def current_aggregates():
+    """
+    Returns the names of the aggregates that include every edit, which the widget queries
+    read instead of the base tables. Checked at most every AGGREGATE_CHECK_INTERVAL seconds,
+    and again after every edit made by this process.
+    """
+
+    if not use_aggregates:
+        return frozenset()
+    now = time.monotonic()
+    if now - _aggregates["checked"] >= aggregate_check_interval:
+        _aggregates["checked"] = now
+        _aggregates["current"] = frozenset(row["name"] for row in get_aggregate_freshness() if row["current"])
+    return _aggregates["current"]
+
+# Function to keep the h-index and i10-index aggregates current after a publication edit
+def refresh_impact(mysql_cursor, faculty_ids = None, university_ids = None):
+    """
+    Recomputes the h-index and i10-index of the faculty and universities affected by an
+    edit, on the cursor of the edit's transaction so the edit and its effect on the
+    rankings are committed together. Does nothing until precompute.py has started building
+    them, or with IMPACT_REFRESH=0.
+
+    Faculty are recomputed from their own publications only, but a university's h-index
+    ranks all of its publications, so the time an edit spends here grows with the size of
+    its authors' universities; it is recorded in uri_impact_refresh_seconds.
+
+    Parameters
+    ----------
+    faculty_ids : list of int, optional
+        The faculty whose publications changed; they and their universities are recomputed.
+    university_ids : list of int, optional
+        More universities to recompute, e.g. one being deleted.
+    """
+
+    if not impact_refresh:
+        return
+
+    # Imported here since aggregate_utils imports this module
+    from . import aggregate_utils
+
+    faculty_ids = sorted(set(faculty_ids or []))
+    universities = set(university_ids or [])
+    if faculty_ids:
+        execute(mysql_cursor, f"SELECT DISTINCT university_id FROM faculty WHERE id IN ({', '.join(['%s'] * len(faculty_ids))})", faculty_ids)
+        universities.update(row[0] for row in mysql_cursor.fetchall() if row[0] is not None)
+    if not universities:
+        return
+
+    # A locking read sees a build that precompute.py started after this transaction's
+    # snapshot; the build's partitions wait for this edit's rows, so they include it either way
+    execute(mysql_cursor, "SELECT name FROM aggregate_freshness WHERE name IN (%s, %s) FOR SHARE", IMPACT_AGGREGATES)
+    for name in [row[0] for row in mysql_cursor.fetchall()]:
+        start = time.perf_counter()
+        if name == "agg_faculty_impact" and not university_ids:
+            placeholders = ", ".join(["%s"] * len(faculty_ids))
+            execute(mysql_cursor, f"DELETE FROM agg_faculty_impact WHERE faculty_id IN ({placeholders})", faculty_ids)
+            select = aggregate_utils.AGGREGATES[name].select.format(partition = f"f.id IN ({placeholders})")
+            execute(mysql_cursor, f"INSERT INTO agg_faculty_impact {select}", faculty_ids)
+        else:
+            aggregate_utils.refresh_partition(mysql_cursor, name, name, True, ("in", sorted(universities)))
+        IMPACT_REFRESH_DURATION.observe((name, ), time.perf_counter() - start)
+
+## In-memory indexes built from MySQL
+class CachedIndex:
+    """
+    An index built from MySQL by build() on first use and built again once it is older than
+    ttl seconds. A failed rebuild keeps serving the previous index until the next ttl.
+    """
+
+    def __init__(self, name, build, ttl):
+        self.name = name
+        self.build = build
+        self.ttl = ttl
+        self.index = None
+        self.built = 0.0
+        self.lock = threading.Lock()
+
+    def get(self):
+        if self.index is not None and time.monotonic() - self.built < self.ttl:
+            return self.index
+        with self.lock:
+            if self.index is None or time.monotonic() - self.built >= self.ttl:
+                try:
+                    self.index = self.build()
+                except mysql.connector.Error:
+                    if self.index is None:
+                        raise
+                    print(f"Error rebuilding the {self.name}, keeping the previous one")
+                self.built = time.monotonic()
+        return self.index
+
+    def warm(self):
+        """
+        Builds the index on a daemon thread, so the first request does not wait for it.
+        """
+
+        def build():
+            try:
+                self.get()
+            except Exception as e:
+                print(f"Error building the {self.name}:", e)
+
+        threading.Thread(target = build, name = self.name.replace(" ", "-"), daemon = True).start()
+
+
+## Keyword index used to validate and suggest keywords (see keyword_index_utils.py)
+def _build_keyword_index():
+    mysql_conn = get_read_connection()
+    mysql_cursor = mysql_conn.cursor()
+    try:
+        execute(mysql_cursor, "SELECT name FROM keyword")
+        return keyword_index_utils.KeywordIndex([row[0] for row in mysql_cursor.fetchall()])
+    finally:
+        mysql_cursor.close()
+        mysql_conn.close()
+
+# Rebuilt every KEYWORD_INDEX_TTL seconds to pick up new keywords
+keyword_index = CachedIndex("keyword index", _build_keyword_index, float(os.getenv("KEYWORD_INDEX_TTL", "300")))
+
+
+def get_keyword_index():
+    """
+    Returns the in-memory KeywordIndex over the keyword table.
+    """
+
+    return keyword_index.get()
+
+
 # Function to validate keywords that exist in the keyword table
+@metrics_utils.timed_query("mysql")
 def validate_keywords(keywords):
     """
-    Return a list of valid keywords that exist in the keyword table.
+    Return a list of valid keywords that exist in the keyword table, ignoring case and
+    replacing misspelled keywords by their closest match unless KEYWORD_AUTOCORRECT=0.
 
     Parameters
     ----------
@@ -88,22 +556,16 @@ def validate_keywords(keywords):
         return []
     
     try:
-        mysql_conn = get_connection()
-        mysql_cursor = mysql_conn.cursor()
-        lowercase_keywords = [keyword.lower() for keyword in keywords]
-        placeholders = ", ".join(["%s"] * len(lowercase_keywords))
-        query = f"SELECT name FROM keyword WHERE LOWER(name) IN ({placeholders})"
-        mysql_cursor.execute(query, lowercase_keywords)
-        results = [row[0] for row in mysql_cursor.fetchall()]   
-        mysql_cursor.close()
-        mysql_conn.close()
-        return results
+        return get_keyword_index().resolve(keywords)
 
     except mysql.connector.Error as e:
         print(f"Error validating keywords: {e}")
+        metrics_utils.count_query_error("mysql", "validate_keywords")
         return []
 
 # Function to query top 10 universities by keyword score
+@prewarm_utils.recorded
+@metrics_utils.timed_query("mysql")
 def middle_left_query(keywords = None):
     """
     Query to get the top 10 universities by keyword score for filtered keywords.
@@ -125,66 +587,63 @@ def middle_left_query(keywords = None):
         if keywords and not valid_keywords:
             return [("No matching keywords found", 0)]
 
-        # Create a view for university keyword scores
-        mysql_conn = get_connection()
-        mysql_cursor = mysql_conn.cursor()
-        create_view_query = "CREATE OR REPLACE VIEW university_keyword_score AS \
-                            SELECT u.id as university_id, \
-                                u.name as university_name, \
-                                k.id as keyword_id, \
-                                k.name as keyword_name, \
-                                SUM(fk.score) AS total_keyword_score \
-                            FROM faculty f \
-                            JOIN faculty_keyword fk on f.id = fk.faculty_id \
-                            JOIN keyword k ON fk.keyword_id = k.id \
-                            JOIN university u on f.university_id = u.id \
-                            GROUP BY u.id, u.name, k.id, k.name" 
-        mysql_cursor.execute(create_view_query)
-
-        # Query by keywords provided
-        if keywords:
-            placeholders = ", ".join(["%s"] * len(valid_keywords))
-            query = f"SELECT university_name, total_keyword_score \
-                    FROM university_keyword_score \
-                    WHERE LOWER(keyword_name) IN ({placeholders}) \
-                    ORDER BY total_keyword_score DESC \
-                    LIMIT 10"
-            mysql_cursor.execute(query, valid_keywords)
+        # Read the precomputed aggregate when it is up to date, or the university_keyword_score
+        # view, by keywords provided
+        if "agg_university_keyword_score" in current_aggregates():
+            if keywords:
+                placeholders, params = statement_utils.in_list(valid_keywords)
+                results = read(f"""SELECT u.name, a.score
+                                   FROM agg_university_keyword_score a
+                                   JOIN keyword k ON k.id = a.keyword_id
+                                   JOIN university u ON u.id = a.university_id
+                                   WHERE k.name IN ({placeholders})
+                                   ORDER BY a.score DESC
+                                   LIMIT 10""", params)
+            else:
+                results = read("""SELECT u.name, a.score
+                                  FROM agg_university_keyword_score a
+                                  JOIN university u ON u.id = a.university_id
+                                  ORDER BY a.score DESC
+                                  LIMIT 10""")
+        elif keywords:
+            placeholders, params = statement_utils.in_list(valid_keywords)
+            results = read(f"""SELECT university_name, total_keyword_score
+                               FROM university_keyword_score
+                               WHERE keyword_name IN ({placeholders})
+                               ORDER BY total_keyword_score DESC
+                               LIMIT 10""", params)
         else:
-            mysql_cursor.execute("SELECT university_name, total_keyword_score \
-                                FROM university_keyword_score \
-                                ORDER BY total_keyword_score DESC \
-                                LIMIT 10")
-        
-        results = mysql_cursor.fetchall()
-        mysql_cursor.close()
-        mysql_conn.close()
+            results = read("""SELECT university_name, total_keyword_score
+                              FROM university_keyword_score
+                              ORDER BY total_keyword_score DESC
+                              LIMIT 10""")
 
         return results
 
     except mysql.connector.Error as e:
         print(f"Error querying top universities by keyword score: {e}")
+        metrics_utils.count_query_error("mysql", "middle_left_query")
         return [("Query failed", 0)]
     
 # Function to get all keywords to create dropdown options for the middle left widget
+@coalesce_utils.coalesced
+@metrics_utils.timed_query("mysql")
 def get_all_keywords():
     """
     Returns a list of all keywords for dropdown options.
     """
 
-    mysql_conn = get_connection()
-    mysql_cursor = mysql_conn.cursor()
-    mysql_cursor.execute("SELECT DISTINCT LOWER(k.name) FROM keyword k JOIN faculty_keyword fk ON k.id = fk.keyword_id JOIN faculty f ON fk.faculty_id = f.id JOIN university u ON f.university_id = u.id ORDER BY LOWER(k.name)")
-    results = [row[0] for row in mysql_cursor.fetchall()]
-    mysql_cursor.close()
-    mysql_conn.close()
-    return results
+    rows = read("SELECT DISTINCT LOWER(k.name) FROM keyword k JOIN faculty_keyword fk ON k.id = fk.keyword_id JOIN faculty f ON fk.faculty_id = f.id JOIN university u ON f.university_id = u.id ORDER BY LOWER(k.name)")
+    return [row[0] for row in rows]
 
 # Function for keyword suggestions with search term appearing at the start followed by other matches
+@metrics_utils.timed_query("mysql")
 def search_keywords_by_prefix(search_term):
     """
     Returns a list of keyword suggestions that start with the given search term
-    followed by other matches.
+    followed by other matches or, if there are none, the closest typo-tolerant match.
+    The suggestions come from the in-memory keyword index rather than a LIKE scan.
+
     Parameters
     ----------
     search_term : str
@@ -200,37 +659,143 @@ def search_keywords_by_prefix(search_term):
         return []
     
     try:
-        mysql_conn = get_connection()
-        mysql_cursor = mysql_conn.cursor()
-        # Keywords that start with the search term
-        mysql_cursor.execute("""
-            SELECT name FROM keyword
-            WHERE LOWER(name) LIKE %s
-            ORDER BY name
-            LIMIT 10
-        """, (search_term.lower() + "%",))
-        prefix_matches = [row[0] for row in mysql_cursor.fetchall()]
-
-        # Keywords that contain the term elsewhere
-        mysql_cursor.execute("""
-            SELECT name FROM keyword
-            WHERE LOWER(name) LIKE %s AND LOWER(name) NOT LIKE %s
-            ORDER BY name
-            LIMIT 10
-        """, ("%" + search_term.lower() + "%", search_term.lower() + "%"))
-        contains_matches = [row[0] for row in mysql_cursor.fetchall()]
+        return get_keyword_index().suggest(search_term)
+    except mysql.connector.Error as err:
+        print(f"Error fetching keyword suggestions: {err}")
+        metrics_utils.count_query_error("mysql", "search_keywords_by_prefix")
+        return []
+
 
+## Best Fit Widget (universities with similar keyword profiles; see similarity_utils.py)
+def _build_similarity_index():
+    mysql_conn = get_read_connection()
+    mysql_cursor = mysql_conn.cursor()
+    try:
+        execute(mysql_cursor, """SELECT u.name, k.name, SUM(fk.score)
+                             FROM faculty f
+                             JOIN faculty_keyword fk ON f.id = fk.faculty_id
+                             JOIN keyword k ON fk.keyword_id = k.id
+                             JOIN university u ON f.university_id = u.id
+                             GROUP BY u.id, u.name, k.id, k.name""")
+        rows = mysql_cursor.fetchall()
+    finally:
         mysql_cursor.close()
         mysql_conn.close()
+    return similarity_utils.SimilarityIndex([row[0] for row in rows], [row[1] for row in rows], [float(row[2] or 0) for row in rows])
 
-        return prefix_matches + contains_matches
-    except mysql.connector.Error as err:
-        print(f"Error fetching keyword suggestions: {err}")
-        return []
+# Rebuilt every SIMILARITY_INDEX_TTL seconds to pick up added and deleted universities
+similarity_index = CachedIndex("similarity index", _build_similarity_index, float(os.getenv("SIMILARITY_INDEX_TTL", "3600")))
+
+
+# Function to find the universities that best fit a university or a set of interests
+@metrics_utils.timed_query("mysql")
+def get_similar_universities(university = None, keywords = None, k = 10):
+    """
+    Returns the universities whose faculty keyword profile is most similar (by cosine
+    similarity) to a university's, or to a set of interest keywords.
+
+    Parameters
+    ----------
+    university : str, optional
+        The university to find similar universities to.
+    keywords : list of str, optional
+        Interest keywords, used when no university is given. Misspelled keywords are
+        corrected like in validate_keywords.
+    k : int
+        Maximum number of universities to return.
+
+    Returns
+    -------
+    list of dict
+        {"university", "similarity"} per university, most similar first.
+    """
+
+    if university:
+        return similarity_index.get().similar_to_university(university, k)
+    if keywords:
+        return similarity_index.get().similar_to_keywords(validate_keywords(keywords), k)
+    return []
+
+
+## Keyword Trends Widget (rising and declining keywords; see trend_utils.py)
+def _stream(mysql_cursor, query, columns, batch_size = 100000):
+    """
+    Streams the rows of a query into a float array of the given number of columns,
+    batch_size rows at a time, without building the whole result as Python tuples.
+    """
+
+    execute(mysql_cursor, query)
+    batches = []
+    while True:
+        rows = mysql_cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        batches.append(np.array(rows, dtype = np.float64))
+    return np.concatenate(batches) if batches else np.zeros((0, columns))
+
+def _build_trend_index():
+    mysql_conn = get_read_connection()
+    mysql_cursor = mysql_conn.cursor()
+    try:
+        execute(mysql_cursor, "SELECT id, name FROM university ORDER BY id")
+        universities = mysql_cursor.fetchall()
+        execute(mysql_cursor, "SELECT id, name FROM keyword ORDER BY id")
+        keywords = mysql_cursor.fetchall()
+        labels = _stream(mysql_cursor, """SELECT pk.publication_id, pk.keyword_id, p.year, COALESCE(p.num_citations, 0) * COALESCE(pk.score, 0)
+                                       FROM publication_keyword pk
+                                       JOIN publication p ON p.id = pk.publication_id
+                                       WHERE p.year IS NOT NULL""", 4)
+        affiliations = _stream(mysql_cursor, """SELECT DISTINCT fp.publication_id, f.university_id
+                                             FROM faculty_publication fp
+                                             JOIN faculty f ON f.id = fp.faculty_id
+                                             WHERE f.university_id IS NOT NULL""", 2)
+    finally:
+        mysql_cursor.close()
+        mysql_conn.close()
+
+    university_ids = np.array([row[0] for row in universities])
+    keyword_ids = np.array([row[0] for row in keywords])
+    return trend_utils.TrendIndex.from_labels(
+        [row[1] for row in universities],
+        [row[1] for row in keywords],
+        labels[:, 0], np.searchsorted(keyword_ids, labels[:, 1]), labels[:, 2], labels[:, 3],
+        affiliations[:, 0], np.searchsorted(university_ids, affiliations[:, 1])
+    )
+
+# Rebuilt every TREND_INDEX_TTL seconds to pick up publication edits
+trend_index = CachedIndex("trend index", _build_trend_index, float(os.getenv("TREND_INDEX_TTL", "3600")))
+
+
+# Function to rank the rising and declining keywords
+@metrics_utils.timed_query("mysql")
+def get_keyword_trends(university = None, metric = "publications", k = 10):
+    """
+    Returns the keywords whose publications grew or shrank the fastest over the last
+    trend_utils.WINDOW years compared with the WINDOW years before.
+
+    Parameters
+    ----------
+    university : str, optional
+        Only count the publications of this university's faculty.
+    metric : str
+        "publications" to compare publication counts, "citations" to compare the
+        citation-weighted keyword scores of the publications.
+    k : int
+        Maximum number of rising and of declining keywords to return.
+
+    Returns
+    -------
+    dict
+        {"years": [first, last], "rising": [...], "declining": [...]}, each keyword as
+        {"keyword", "growth", "recent", "previous"} with growth as an annual rate.
+    """
+
+    return trend_index.get().trends(university, metric, k)
 
 
 ## Bottom Left Widget 1 (inserting into university table)
 # set name to not null and unique
+@metrics_utils.timed_query("mysql")
 def alter_university_table():
     """
     Alters the university table to set name to not null and unique.
@@ -239,18 +804,20 @@ def alter_university_table():
     try:
         mysql_conn = get_connection()
         mysql_cursor = mysql_conn.cursor()
-        mysql_cursor.execute("ALTER TABLE university MODIFY name VARCHAR(255) NOT NULL UNIQUE")
+        execute(mysql_cursor, "ALTER TABLE university MODIFY name VARCHAR(255) NOT NULL UNIQUE")
         mysql_conn.commit()
         mysql_cursor.close()
         mysql_conn.close()
         print("University name column set to NOT NULL UNIQUE")
     except mysql.connector.Error as e:
         print("ALTER TABLE failed or already set name to not null and unique:", e)
+        metrics_utils.count_query_error("mysql", "alter_university_table")
     finally:
         mysql_cursor.close()
         mysql_conn.close()
 
 # Function for inserting a new university
+@metrics_utils.timed_query("mysql")
 def insert_university(name, photo_url = None):
     """
     Inserts a new university into the university table.
@@ -271,12 +838,13 @@ def insert_university(name, photo_url = None):
         mysql_conn.start_transaction()
 
         # Get next available id
-        mysql_cursor.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM university")
+        execute(mysql_cursor, "SELECT COALESCE(MAX(id), 0) + 1 FROM university")
         next_id = mysql_cursor.fetchone()[0]
         
         # Insert new university
-        mysql_cursor.execute("""INSERT INTO university (id, name, photo_url) VALUES (%s, %s, %s)""", (next_id, name, photo_url))
-        mysql_conn.commit()
+        execute(mysql_cursor, """INSERT INTO university (id, name, photo_url) VALUES (%s, %s, %s)""", (next_id, name, photo_url))
+        enqueue(mysql_cursor, "university_inserted", {"id": next_id, "name": name, "photo_url": photo_url})
+        commit(mysql_conn)
     except mysql.connector.Error as e:
         mysql_conn.rollback()
         print("Error inserting university:", e)
@@ -288,26 +856,107 @@ def insert_university(name, photo_url = None):
 
 ## Bottom Left Widget 2 (deleting from university table)
 # Function for deleting an existing university
-def delete_university(name):
+@metrics_utils.timed_query("mysql")
+def delete_university(name, batch_size = 1000, progress = None):
     """
-    Deletes an existing university from the university table.
-    
+    Deletes an existing university together with its faculty, their faculty_keyword and
+    faculty_publication rows and the publications left without any author.
+
+    The rows are deleted in transactions of at most batch_size rows, so no lock is held for
+    long and the dashboard keeps answering reads. Progress is recorded in the deletion_job
+    table and every batch is committed, so an interrupted deletion resumes where it stopped
+    when delete_university is called again for the same university (see resume_deletions).
+
     Parameters
     ----------
     name: str
         The name of the university to delete.
+    batch_size : int
+        Maximum number of rows deleted per transaction.
+    progress : callable, optional
+        Called after every batch with a dict of faculty_deleted, faculty_remaining and rows_deleted.
     """
 
     try:
         mysql_conn = get_connection()
         mysql_cursor = mysql_conn.cursor()
 
-        # Start transaction
+        execute(mysql_cursor, "SELECT id FROM university WHERE name = %s", (name, ))
+        row = mysql_cursor.fetchone()
+        if row is None:
+            return
+        university_id = row[0]
+
+        # Start or resume the job
+        execute(mysql_cursor, """INSERT INTO deletion_job (university_id, university_name) VALUES (%s, %s)
+                             ON DUPLICATE KEY UPDATE status = 'running'""", (university_id, name))
+        commit(mysql_conn)
+        execute(mysql_cursor, "SELECT faculty_deleted, rows_deleted FROM deletion_job WHERE university_id = %s", (university_id, ))
+        faculty_deleted, rows_deleted = mysql_cursor.fetchone()
+
+        while True:
+            execute(mysql_cursor, "SELECT id FROM faculty WHERE university_id = %s ORDER BY id LIMIT %s", (university_id, batch_size))
+            faculty_ids = [row[0] for row in mysql_cursor.fetchall()]
+            commit(mysql_conn)
+            if not faculty_ids:
+                break
+            placeholders = ", ".join(["%s"] * len(faculty_ids))
+
+            # Keyword scores of the faculty
+            while True:
+                mysql_conn.start_transaction()
+                execute(mysql_cursor, f"DELETE FROM faculty_keyword WHERE faculty_id IN ({placeholders}) LIMIT %s", (*faculty_ids, batch_size))
+                deleted = mysql_cursor.rowcount
+                commit(mysql_conn)
+                rows_deleted += deleted
+                if deleted < batch_size:
+                    break
+
+            # Publication links of the faculty; the trigger deletes publications left without an author
+            while True:
+                mysql_conn.start_transaction()
+                execute(mysql_cursor, f"SELECT faculty_id, publication_id FROM faculty_publication WHERE faculty_id IN ({placeholders}) LIMIT %s FOR UPDATE",
+                        (*faculty_ids, batch_size))
+                links = mysql_cursor.fetchall()
+                if not links:
+                    commit(mysql_conn)
+                    break
+                execute(mysql_cursor, f"DELETE FROM faculty_publication WHERE (faculty_id, publication_id) IN ({', '.join(['(%s, %s)'] * len(links))})",
+                        [value for link in links for value in link])
+                rows_deleted += mysql_cursor.rowcount
+                publication_ids = sorted({publication_id for _, publication_id in links})
+                execute(mysql_cursor, f"SELECT id FROM publication WHERE id IN ({', '.join(['%s'] * len(publication_ids))})", publication_ids)
+                remaining = {row[0] for row in mysql_cursor.fetchall()}
+                for publication_id in publication_ids:
+                    if publication_id not in remaining:
+                        enqueue(mysql_cursor, "publication_deleted", {"id": publication_id})
+                        rows_deleted += 1
+                commit(mysql_conn)
+
+            # The faculty themselves
+            mysql_conn.start_transaction()
+            execute(mysql_cursor, f"DELETE FROM faculty WHERE id IN ({placeholders})", faculty_ids)
+            faculty_deleted += mysql_cursor.rowcount
+            rows_deleted += mysql_cursor.rowcount
+            enqueue(mysql_cursor, "faculty_deleted", {"ids": faculty_ids})
+            execute(mysql_cursor, "UPDATE deletion_job SET faculty_deleted = %s, rows_deleted = %s WHERE university_id = %s",
+                    (faculty_deleted, rows_deleted, university_id))
+            commit(mysql_conn)
+
+            if progress is not None:
+                execute(mysql_cursor, "SELECT COUNT(*) FROM faculty WHERE university_id = %s", (university_id, ))
+                progress({"faculty_deleted": faculty_deleted, "faculty_remaining": mysql_cursor.fetchone()[0], "rows_deleted": rows_deleted})
+                commit(mysql_conn)
+
+        # Finally the university
         mysql_conn.start_transaction()
-
-        # Delete university by name
-        mysql_cursor.execute("""DELETE FROM university WHERE name = %s""", (name, ))
-        mysql_conn.commit()
+        execute(mysql_cursor, "DELETE FROM university WHERE id = %s", (university_id, ))
+        rows_deleted += mysql_cursor.rowcount
+        enqueue(mysql_cursor, "university_deleted", {"name": name})
+        refresh_impact(mysql_cursor, university_ids = [university_id])
+        execute(mysql_cursor, "UPDATE deletion_job SET status = 'done', rows_deleted = %s WHERE university_id = %s",
+                (rows_deleted, university_id))
+        commit(mysql_conn)
     except mysql.connector.Error as e:
         mysql_conn.rollback()
         print("Error deleting university:", e)
@@ -316,27 +965,48 @@ def delete_university(name):
         mysql_cursor.close()
         mysql_conn.close()
 
+# Function to resume interrupted university deletions
+def resume_deletions(batch_size = 1000, progress = None):
+    """
+    Finishes every university deletion that was interrupted.
+
+    Returns
+    -------
+    list of str
+        The names of the universities whose deletion was resumed.
+    """
+
+    mysql_conn = get_connection()
+    mysql_cursor = mysql_conn.cursor()
+    try:
+        execute(mysql_cursor, "SELECT university_name FROM deletion_job WHERE status = 'running'")
+        names = [row[0] for row in mysql_cursor.fetchall()]
+    finally:
+        mysql_cursor.close()
+        mysql_conn.close()
+
+    for name in names:
+        delete_university(name, batch_size, progress)
+    return names
+
 # Function to get all universities to create dropdown options for the top left widget and bottom left widget 2
+@metrics_utils.timed_query("mysql")
 def get_all_universities():
     """
     Returns a list of all universities for dropdown options.
     """
 
     try:
-        mysql_conn = get_connection()
-        mysql_cursor = mysql_conn.cursor()
-        mysql_cursor.execute("SELECT DISTINCT name FROM university ORDER BY name")
-        results = [row[0] for row in mysql_cursor.fetchall()]
-        mysql_cursor.close()
-        mysql_conn.close()
-        return results
+        return [row[0] for row in read("SELECT DISTINCT name FROM university ORDER BY name")]
     except mysql.connector.Error as e:
         print("Error fetching universities:", e)
+        metrics_utils.count_query_error("mysql", "get_all_universities")
         return []
 
 
 ## Top Left Widget (citation rankings)
 # Function for Searching by university and get citation ranking
+@metrics_utils.timed_query("mysql")
 def get_citation_ranking(name: str):
     """
     Searches by university and gets the top 10 citation rankings amongst faculty
@@ -348,34 +1018,104 @@ def get_citation_ranking(name: str):
     """
 
     try:
-        mysql_conn = get_connection()
-        mysql_cursor = mysql_conn.cursor()
-
-        # Start transaction
-        mysql_conn.start_transaction()
-
         # Query to get top 10 faculty by citation count for the given university
-        mysql_cursor.execute("""SELECT f.name, SUM(p.num_citations) AS totalCitations
-                             FROM faculty f 
-                             JOIN university u ON u.id = f.university_id
-                             JOIN faculty_publication fp ON fp.faculty_id = f.id
-                             JOIN  publication p ON p.ID = fp.publication_id
-                             WHERE u.name = %s 
-                             GROUP BY f.name
-                             ORDER BY totalCitations DESC
-                             LIMIT 10""", (name, ))
-        results = mysql_cursor.fetchall()
-        columns = [desc[0] for desc in mysql_cursor.description]
-        rows = [dict(zip(columns, row)) for row in results]
-        return rows
+        if "agg_faculty_citations" in current_aggregates():
+            return read("""SELECT a.faculty_name AS name, a.total_citations AS totalCitations
+                           FROM agg_faculty_citations a
+                           JOIN university u ON u.id = a.university_id
+                           WHERE u.name = %s
+                           ORDER BY a.total_citations DESC
+                           LIMIT 10""", (name, ), dictionary = True)
+        return read("""SELECT f.name, SUM(p.num_citations) AS totalCitations
+                       FROM faculty f
+                       JOIN university u ON u.id = f.university_id
+                       JOIN faculty_publication fp ON fp.faculty_id = f.id
+                       JOIN publication p ON p.ID = fp.publication_id
+                       WHERE u.name = %s
+                       GROUP BY f.name
+                       ORDER BY totalCitations DESC
+                       LIMIT 10""", (name, ), dictionary = True)
     except mysql.connector.Error as e:
-        mysql_conn.rollback()
         print("Error fetching citation rankings: ", e)
         raise
-    finally:
-        mysql_cursor.close()
-        mysql_conn.close()
 
+# Function to rank the faculty of a university by h-index or i10-index
+@prewarm_utils.recorded
+@metrics_utils.timed_query("mysql")
+def get_impact_ranking(name, metric = "h_index"):
+    """
+    Returns the top 10 faculty of a university by h-index or i10-index, ties broken by total
+    citations, read from the agg_faculty_impact table (an index range scan, like the summed
+    ranking) or computed from the base tables until precompute.py has built it.
+
+    Parameters
+    ----------
+    name : str
+        The name of the university.
+    metric : str
+        "h_index" or "i10_index".
+
+    Returns
+    -------
+    list
+        Dicts of name, h_index, i10_index and totalCitations.
+    """
+
+    if metric not in ("h_index", "i10_index"):
+        raise ValueError("The metric must be h_index or i10_index.")
+
+    try:
+        if "agg_faculty_impact" in current_aggregates():
+            return read(f"""SELECT a.faculty_name AS name, a.h_index, a.i10_index, a.total_citations AS totalCitations
+                            FROM agg_faculty_impact a
+                            JOIN university u ON u.id = a.university_id
+                            WHERE u.name = %s
+                            ORDER BY a.{metric} DESC, a.total_citations DESC
+                            LIMIT 10""", (name, ), dictionary = True)
+
+        from . import aggregate_utils
+        return read(f"""SELECT name, h_index, i10_index, total_citations AS totalCitations
+                        FROM ({aggregate_utils.AGGREGATES['agg_faculty_impact'].select.format(partition = 'u.name = %s')})
+                             AS impact (faculty_id, university_id, name, h_index, i10_index, total_citations)
+                        ORDER BY {metric} DESC, total_citations DESC
+                        LIMIT 10""", (name, ), dictionary = True)
+    except mysql.connector.Error as e:
+        print("Error fetching h-index and i10-index rankings:", e)
+        metrics_utils.count_query_error("mysql", "get_impact_ranking")
+        raise
+
+# Function to get the h-index and i10-index of a university
+@prewarm_utils.recorded
+@metrics_utils.timed_query("mysql")
+def get_university_impact(name):
+    """
+    Returns {"h_index", "i10_index", "publications"} of a university over the distinct
+    publications of its faculty, or None if it has none.
+
+    Parameters
+    ----------
+    name : str
+        The name of the university.
+    """
+
+    try:
+        if "agg_university_impact" in current_aggregates():
+            rows = read("""SELECT a.h_index, a.i10_index, a.publications
+                           FROM agg_university_impact a
+                           JOIN university u ON u.id = a.university_id
+                           WHERE u.name = %s""", (name, ), dictionary = True)
+        else:
+            from . import aggregate_utils
+            rows = read(f"""SELECT h_index, i10_index, publications
+                            FROM ({aggregate_utils.AGGREGATES['agg_university_impact'].select.format(partition = 'u.name = %s')})
+                                 AS impact (university_id, h_index, i10_index, publications)""", (name, ), dictionary = True)
+        return rows[0] if rows else None
+    except mysql.connector.Error as e:
+        print("Error fetching the university's h-index and i10-index:", e)
+        metrics_utils.count_query_error("mysql", "get_university_impact")
+        raise
+
+@metrics_utils.timed_query("mysql")
 def get_faculty_by_university(university_name: str):
     """
     Searches by university and gets a list of faculty
@@ -387,30 +1127,16 @@ def get_faculty_by_university(university_name: str):
     """
 
     try:
-        mysql_conn = get_connection()
-        mysql_cursor = mysql_conn.cursor()
-
-        # Start transaction
-        mysql_conn.start_transaction()
-
-        # Query to get top 10 faculty by citation count for the given university
-        mysql_cursor.execute("""SELECT f.name, f.id
-                             FROM faculty f 
-                             JOIN university u ON u.id = f.university_id
-                             WHERE u.name = %s """, 
-                             (university_name, ))
-        results = mysql_cursor.fetchall()
-        columns = [desc[0] for desc in mysql_cursor.description]
-        rows = [dict(zip(columns, row)) for row in results]
-        return rows
+        # Query to get the faculty of the given university
+        return read("""SELECT f.name, f.id
+                       FROM faculty f
+                       JOIN university u ON u.id = f.university_id
+                       WHERE u.name = %s""", (university_name, ), dictionary = True)
     except mysql.connector.Error as e:
-        mysql_conn.rollback()
         print("Error fetching faculty: ", e)
         raise
-    finally:
-        mysql_cursor.close()
-        mysql_conn.close()
 
+@metrics_utils.timed_query("mysql")
 def get_publications_by_faculty(faculty_id: int):
     """
     Searches by faculty and gets the publications
@@ -422,31 +1148,106 @@ def get_publications_by_faculty(faculty_id: int):
     """
 
     try:
-        mysql_conn = get_connection()
-        mysql_cursor = mysql_conn.cursor()
-
-        # Start transaction
-        mysql_conn.start_transaction()
-
-        # Query to get top 10 faculty by citation count for the given university
-        mysql_cursor.execute("""SELECT p.title, p.id
-                             FROM faculty f 
-                             JOIN faculty_publication fp ON fp.faculty_id = f.id
-                             JOIN  publication p ON p.ID = fp.publication_id
-                             WHERE f.id = %s 
-                             """, (faculty_id, ))
-        results = mysql_cursor.fetchall()
-        columns = [desc[0] for desc in mysql_cursor.description]
-        rows = [dict(zip(columns, row)) for row in results]
-        return rows
+        # Query to get the publications of the given faculty member
+        return read("""SELECT p.title, p.id
+                       FROM faculty f
+                       JOIN faculty_publication fp ON fp.faculty_id = f.id
+                       JOIN publication p ON p.ID = fp.publication_id
+                       WHERE f.id = %s""", (faculty_id, ), dictionary = True)
     except mysql.connector.Error as e:
-        mysql_conn.rollback()
         print("Error fetching citation rankings: ", e)
         raise
-    finally:
-        mysql_cursor.close()
-        mysql_conn.close()
 
+# Function to search the faculty of a university one page at a time
+@metrics_utils.timed_query("mysql")
+def search_faculty(university_name, search = None, after = None, limit = 50):
+    """
+    Returns one page of the faculty of a university ordered by name, optionally only those
+    with a word in their name starting with the search term. Pages are read with keyset
+    pagination on the (university_id, name) index, so every page costs the same however
+    deep into the list it is.
+
+    Parameters
+    ----------
+    university_name : str
+        The name of the university.
+    search : str, optional
+        Only return faculty with a word in their name starting with this term.
+    after : list, optional
+        The cursor returned with the previous page, i.e. [name, id] of its last faculty.
+    limit : int
+        The page size.
+
+    Returns
+    -------
+    tuple
+        (rows, cursor): a list of dicts with name and id, and the cursor of the next page or
+        None if this is the last page.
+    """
+
+    conditions = ["f.university_id = (SELECT id FROM university WHERE name = %s)"]
+    params = [university_name]
+    if search:
+        conditions.append("(f.name LIKE %s OR f.name LIKE %s)")
+        params.extend([search + "%", "% " + search + "%"])
+    if after:
+        conditions.append("(f.name > %s OR (f.name = %s AND f.id > %s))")
+        params.extend([after[0], after[0], after[1]])
+    params.append(limit)
+
+    # At most four statement shapes, one per combination of search and after
+    rows = read(f"""SELECT f.name, f.id
+                    FROM faculty f
+                    WHERE {' AND '.join(conditions)}
+                    ORDER BY f.name, f.id
+                    LIMIT %s""", params, dictionary = True)
+    return rows, ([rows[-1]["name"], rows[-1]["id"]] if len(rows) == limit else None)
+
+# Function to search the publications of a faculty member one page at a time
+@metrics_utils.timed_query("mysql")
+def search_publications(faculty_id, search = None, after = None, limit = 50):
+    """
+    Returns one page of the publications of a faculty member ordered by id, optionally only
+    those whose title contains the search term. Pages are read with keyset pagination on
+    the (faculty_id, publication_id) index.
+
+    Parameters
+    ----------
+    faculty_id : int
+        The id number for a faculty member.
+    search : str, optional
+        Only return publications whose title contains this term.
+    after : int, optional
+        The cursor returned with the previous page, i.e. the id of its last publication.
+    limit : int
+        The page size.
+
+    Returns
+    -------
+    tuple
+        (rows, cursor): a list of dicts with title and id, and the cursor of the next page or
+        None if this is the last page.
+    """
+
+    conditions = ["fp.faculty_id = %s"]
+    params = [faculty_id]
+    if search:
+        conditions.append("p.title LIKE %s")
+        params.append("%" + search + "%")
+    if after is not None:
+        conditions.append("fp.publication_id > %s")
+        params.append(after)
+    params.append(limit)
+
+    rows = read(f"""SELECT p.title, p.id
+                    FROM faculty_publication fp
+                    JOIN publication p ON p.ID = fp.publication_id
+                    WHERE {' AND '.join(conditions)}
+                    ORDER BY fp.publication_id
+                    LIMIT %s""", params, dictionary = True)
+    return rows, (rows[-1]["id"] if len(rows) == limit else None)
+
+@metrics_utils.timed_query("mysql")
 def add_publication(faculty_id, data):
     """
     Adds a new publication and links it to a faculty member.
@@ -464,11 +1265,12 @@ def add_publication(faculty_id, data):
         mysql_conn.start_transaction()
 
         # Get next available id for publication
-        mysql_cursor.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM publication")
+        execute(mysql_cursor, "SELECT COALESCE(MAX(id), 0) + 1 FROM publication")
         next_id = mysql_cursor.fetchone()[0]
 
         # Insert publication with all fields and explicit id
-        mysql_cursor.execute(
+        execute(
+            mysql_cursor,
             "INSERT INTO publication (id, title, venue, year) VALUES (%s, %s, %s, %s)",
             (
                 next_id,
@@ -479,12 +1281,21 @@ def add_publication(faculty_id, data):
         )
 
         # Link to faculty
-        mysql_cursor.execute(
+        execute(
+            mysql_cursor,
             "INSERT INTO faculty_publication (faculty_id, publication_id) VALUES (%s, %s)",
             (faculty_id, next_id)
         )
-
-        mysql_conn.commit()
+        enqueue(mysql_cursor, "publication_added", {
+            "id": next_id,
+            "faculty_id": faculty_id,
+            "title": data.get("title"),
+            "venue": data.get("venue"),
+            "year": data.get("year")
+        })
+        refresh_impact(mysql_cursor, [faculty_id])
+
+        commit(mysql_conn)
         return next_id
     except mysql.connector.Error as e:
         mysql_conn.rollback()
@@ -494,6 +1305,7 @@ def add_publication(faculty_id, data):
         mysql_cursor.close()
         mysql_conn.close()
 
+@metrics_utils.timed_query("mysql")
 def update_publication(pub_id, updated_data):
     """
     Updates a publication's information.
@@ -525,9 +1337,16 @@ def update_publication(pub_id, updated_data):
 
         sql = f"UPDATE publication SET {', '.join(fields)} WHERE id = %s"
         values.append(pub_id)
-        mysql_cursor.execute(sql, tuple(values))
-
-        mysql_conn.commit()
+        execute(mysql_cursor, sql, tuple(values))
+        enqueue(mysql_cursor, "publication_updated", {
+            "id": pub_id,
+            "fields": {field: updated_data[field] for field in ["title", "venue", "year", "num_citations"] if updated_data.get(field) is not None}
+        })
+        if updated_data.get("num_citations") is not None:
+            execute(mysql_cursor, "SELECT faculty_id FROM faculty_publication WHERE publication_id = %s", (pub_id,))
+            refresh_impact(mysql_cursor, [row[0] for row in mysql_cursor.fetchall()])
+
+        commit(mysql_conn)
     except mysql.connector.Error as e:
         mysql_conn.rollback()
         print("Error updating publication:", e)
@@ -536,6 +1355,7 @@ def update_publication(pub_id, updated_data):
         mysql_cursor.close()
         mysql_conn.close()
 
+@metrics_utils.timed_query("mysql")
 def delete_publication(pub_id):
     """
     Deletes a publication and its faculty link.
@@ -550,13 +1370,20 @@ def delete_publication(pub_id):
         mysql_cursor = mysql_conn.cursor()
         mysql_conn.start_transaction()
 
+        # Authors of the publication, whose citation totals change
+        execute(mysql_cursor, "SELECT faculty_id FROM faculty_publication WHERE publication_id = %s FOR UPDATE", (pub_id,))
+        faculty_ids = [row[0] for row in mysql_cursor.fetchall()]
+
         # Remove publication
-        mysql_cursor.execute(
+        execute(
+            mysql_cursor,
             "DELETE FROM faculty_publication WHERE publication_id = %s",
             (pub_id,)
         )
+        enqueue(mysql_cursor, "publication_deleted", {"id": pub_id, "faculty_ids": faculty_ids})
+        refresh_impact(mysql_cursor, faculty_ids)
 
-        mysql_conn.commit()
+        commit(mysql_conn)
     except mysql.connector.Error as e:
         mysql_conn.rollback()
         print("Error deleting publication:", e)
@@ -565,6 +1392,7 @@ def delete_publication(pub_id):
         mysql_cursor.close()
         mysql_conn.close()
 
+@metrics_utils.timed_query("mysql")
 def get_publication(pub_id):
     """
     Searches by publication ID and gets the publication details
@@ -576,17 +1404,102 @@ def get_publication(pub_id):
     """
 
     try:
-        conn = get_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute(
-            "SELECT title, venue, year, num_citations FROM publication WHERE id = %s", (pub_id,)
-        )
-        result = cursor.fetchone()
-        return result
+        rows = read("SELECT title, venue, year, num_citations FROM publication WHERE id = %s", (pub_id, ), dictionary = True)
+        return rows[0] if rows else None
     except Exception as e:
         print("Error fetching publication:", e)
+        metrics_utils.count_query_error("mysql", "get_publication")
         return None
-    finally:
-        cursor.close()
-        conn.close()
 
+
+
+## Routed widget queries (the top right and middle right widgets are normally answered by
+## MongoDB and Neo4j; see routing_utils.py)
+# Function to query university publications over time
+@metrics_utils.timed_query("mysql")
+def top_right_query(universities = None, years = None):
+    """
+    Aggregates publication counts by university and year, like mongodb_utils.top_right_query.
+
+    Parameters
+    ----------
+    universities : list, optional
+        List of university names to filter by.
+    years : list of length 2, optional
+        List of publication years to filter by, i.e. [start_year, end_year].
+
+    Returns
+    -------
+    list
+        A list of aggregated publication counts by university and year.
+    """
+
+    if universities and not all(isinstance(u, str) for u in universities):
+        raise ValueError("All university names must be strings.")
+    if years and not all(isinstance(y, int) for y in years):
+        raise ValueError("All years must be integers.")
+
+    precomputed = "agg_university_year" in current_aggregates()
+    conditions, params = [], []
+    if universities:
+        placeholders, padded = statement_utils.in_list(universities)
+        conditions.append(f"u.name IN ({placeholders})")
+        params.extend(padded)
+    if years and len(years) == 2:
+        conditions.append(f"{'a' if precomputed else 'p'}.year BETWEEN %s AND %s")
+        params.extend(years)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    if precomputed:
+        rows = read(f"""SELECT u.name, a.year, a.publications
+                        FROM agg_university_year a
+                        JOIN university u ON u.id = a.university_id
+                        {where}
+                        ORDER BY u.name, a.year""", params)
+    else:
+        rows = read(f"""SELECT u.name, p.year, COUNT(*)
+                        FROM faculty f
+                        JOIN university u ON u.id = f.university_id
+                        JOIN faculty_publication fp ON fp.faculty_id = f.id
+                        JOIN publication p ON p.ID = fp.publication_id
+                        {where}
+                        GROUP BY u.name, p.year
+                        ORDER BY u.name, p.year""", params)
+    return [
+        {"_id": {"university": university, "year": year}, "university_publications": count}
+        for university, year, count in rows
+    ]
+
+# Function to compute KRC for top 10 universities with a given keyword
+@metrics_utils.timed_query("mysql")
+def get_krc(keyword):
+    """
+    Returns the top 10 universities by keyword-relevant citations (the sum over their faculty's
+    publications of keyword score x citations), like neo4j_utils.get_krc.
+
+    Parameters
+    ----------
+    keyword : str
+        The keyword name.
+    """
+
+    if "agg_university_keyword_krc" in current_aggregates():
+        return read("""SELECT u.name AS university, SUM(a.krc) AS totalKRC
+                       FROM keyword k
+                       JOIN agg_university_keyword_krc a ON a.keyword_id = k.id
+                       JOIN university u ON u.id = a.university_id
+                       WHERE k.name = %s
+                       GROUP BY u.name
+                       ORDER BY totalKRC DESC
+                       LIMIT 10""", (keyword, ), dictionary = True)
+    return read("""SELECT u.name AS university, SUM(pk.score * p.num_citations) AS totalKRC
+                   FROM keyword k
+                   JOIN publication_keyword pk ON pk.keyword_id = k.id
+                   JOIN publication p ON p.ID = pk.publication_id
+                   JOIN faculty_publication fp ON fp.publication_id = p.ID
+                   JOIN faculty f ON f.id = fp.faculty_id
+                   JOIN university u ON u.id = f.university_id
+                   WHERE k.name = %s
+                   GROUP BY u.name
+                   ORDER BY totalKRC DESC
+                   LIMIT 10""", (keyword, ), dictionary = True)
@@ -1,22 +1,75 @@
 from neo4j import GraphDatabase
 from dotenv import load_dotenv
+from . import metrics_utils, slow_query_utils
 import os
+import re
+import sys
+import time
 
 load_dotenv()
 
 port = os.getenv("NEO4J_DB_PORT")
 user = os.getenv("NEO4J_DB_USER")
 password = os.getenv("NEO4J_DB_PASSWORD")
-db_name = os.getenv("DB_NAME")
+db_name = os.getenv("NEO4J_DB_NAME", os.getenv("DB_NAME"))
 
 print(f"bolt://localhost:{port}/{db_name}")
 
 neo4j_driver = GraphDatabase.driver(f"bolt://localhost:{port}/{db_name}", auth=(user, password))
 
 
+## Middle Right Widget (KRC)
+# Create index on KEYWORD(name) so that get_krc starts from an index seek
+neo4j_driver.execute_query("CREATE INDEX keyword_name IF NOT EXISTS FOR (k:KEYWORD) ON (k.name)", database_=db_name)
+print("Index on KEYWORD(name) created")
+
+
+# Function to run a Cypher query, recording it in the slow query log if it is slow
+def run_query(query, params = None):
+    """
+    Runs a Cypher query and returns its records. When slow query capture is enabled and the
+    query takes longer than SLOW_QUERY_THRESHOLD_MS, it is recorded in the slow query log
+    together with a sampled PROFILE plan (EXPLAIN for queries that write).
+
+    Parameters
+    ----------
+    query : str
+        The Cypher query.
+    params : dict, optional
+        The query parameters.
+
+    Returns
+    -------
+    list of neo4j.Record
+    """
+
+    start = time.perf_counter()
+    records, summary, keys = neo4j_driver.execute_query(query, params or {}, database_=db_name)
+    elapsed = time.perf_counter() - start
+    if slow_query_utils.is_slow(elapsed):
+        function = sys._getframe(1).f_code.co_name
+        slow_query_utils.record("neo4j", function, query, params, elapsed, lambda: explain(query, params))
+    return records
+
+# Function to get the plan of a query
+def explain(query, params = None):
+    """
+    Returns the PROFILE plan of a read query, or the EXPLAIN plan of a query that writes,
+    so that capturing a plan never applies a write twice.
+    """
+
+    writes = re.search(r"\b(CREATE|MERGE|DELETE|SET|REMOVE)\b", query, re.IGNORECASE)
+    records, summary, keys = neo4j_driver.execute_query(
+        ("EXPLAIN " if writes else "PROFILE ") + query,
+        params or {},
+        database_=db_name,
+    )
+    return summary.profile if summary.profile is not None else summary.plan
+
 # Function to comput KRC for top 10 universities with a given keyword
+@metrics_utils.timed_query("neo4j")
 def get_krc(keyword):
-    records, summary, keys = neo4j_driver.execute_query("""
+    records = run_query("""
         MATCH (faculty:FACULTY)-[:PUBLISH]->(p:PUBLICATION)-[l:LABEL_BY]->(k:KEYWORD {name: $keyword})
         MATCH (faculty)-[:AFFILIATION_WITH]->(univ:INSTITUTE)                                                
         WITH faculty, univ, SUM(toFloat(l.score) * toInteger(p.numCitations)) AS accumulated_citation
@@ -27,7 +80,52 @@ def get_krc(keyword):
 
         """,
         {"keyword": keyword},
-        database_=db_name,
     )
     return [record.data() for record in records]
 
+
+
+## Routed widget queries (the top left and top right widgets are normally answered by
+## MySQL and MongoDB; see routing_utils.py)
+# Function for searching by university and getting the citation ranking
+@metrics_utils.timed_query("neo4j")
+def get_citation_ranking(name):
+    records = run_query("""
+        MATCH (faculty:FACULTY)-[:AFFILIATION_WITH]->(:INSTITUTE {name: $name})
+        MATCH (faculty)-[:PUBLISH]->(p:PUBLICATION)
+        RETURN faculty.name AS name, SUM(toInteger(p.numCitations)) AS totalCitations
+        ORDER BY totalCitations DESC
+        LIMIT 10
+        """,
+        {"name": name},
+    )
+    return [record.data() for record in records]
+
+# Function to query university publications over time
+@metrics_utils.timed_query("neo4j")
+def top_right_query(universities = None, years = None):
+    if universities and not all(isinstance(u, str) for u in universities):
+        raise ValueError("All university names must be strings.")
+    if years and not all(isinstance(y, int) for y in years):
+        raise ValueError("All years must be integers.")
+
+    start, end = years if years and len(years) == 2 else (None, None)
+    conditions = []
+    if universities:
+        conditions.append("univ.name IN $universities")
+    if start is not None:
+        conditions.append("p.year >= $start AND p.year <= $end")
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    records = run_query(f"""
+        MATCH (faculty:FACULTY)-[:AFFILIATION_WITH]->(univ:INSTITUTE)
+        MATCH (faculty)-[:PUBLISH]->(p:PUBLICATION)
+        {where}
+        RETURN univ.name AS university, p.year AS year, COUNT(*) AS university_publications
+        ORDER BY university, year
+        """,
+        {"universities": universities or [], "start": start, "end": end},
+    )
+    return [
+        {"_id": {"university": record["university"], "year": record["year"]}, "university_publications": record["university_publications"]}
+        for record in records
+    ]
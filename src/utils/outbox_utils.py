@@ -0,0 +1,289 @@
+import os
+import json
+import time
+import threading
+from itertools import groupby
+from pymongo import UpdateOne, UpdateMany, DeleteOne, DeleteMany
+from dotenv import load_dotenv
+from . import mysql_utils, mongodb_utils, neo4j_utils, metrics_utils
+
+load_dotenv()
+
+
+## Applier configuration
+# Maximum number of outbox entries applied in one batch, and seconds between polls of an
+# empty outbox
+batch_size = int(os.getenv("OUTBOX_BATCH_SIZE", "500"))
+poll_interval = float(os.getenv("OUTBOX_POLL_INTERVAL", "1"))
+
+# Applied entries are kept for this many hours so they can be replayed, then pruned
+retention_hours = float(os.getenv("OUTBOX_RETENTION_HOURS", "24"))
+
+# OUTBOX_APPLIER=0 stops the dashboard from applying the outbox itself, e.g. when
+# apply_outbox.py runs as a separate process
+in_process = os.getenv("OUTBOX_APPLIER", "1") != "0"
+
+# Only one applier at a time holds this MySQL lock, so entries are applied in order even
+# when several dashboard processes are running
+LOCK_NAME = "outbox_applier"
+
+PENDING = metrics_utils.gauge(
+    "uri_outbox_pending",
+    "Outbox entries not yet applied to MongoDB and Neo4j."
+)
+LAG = metrics_utils.gauge(
+    "uri_outbox_lag_seconds",
+    "Age of the oldest outbox entry not yet applied to MongoDB and Neo4j."
+)
+APPLIED = metrics_utils.counter(
+    "uri_outbox_applied_total",
+    "Outbox entries applied to MongoDB and Neo4j, by event.",
+    ("event", )
+)
+ERRORS = metrics_utils.counter(
+    "uri_outbox_errors_total",
+    "Outbox batches that failed to apply, by target database.",
+    ("target", )
+)
+
+# MySQL publication columns -> MongoDB fields and Neo4j properties
+FIELDS = {"title": "title", "venue": "venue", "year": "year", "num_citations": "numCitations"}
+
+
+## MongoDB
+# Every operation is an upsert, $set, $addToSet, $pull or delete, so a batch can be applied twice
+def mongodb_operations(entries):
+    """
+    Returns the bulk_write operations for the publications and faculty collections.
+    University edits need none: MongoDB only has universities as faculty affiliations.
+    """
+
+    publications, faculty = [], []
+    for _, event, payload in entries:
+        if event == "publication_added":
+            document = {FIELDS[field]: payload[field] for field in ["title", "venue", "year"]}
+            publications.append(UpdateOne(
+                {"id": payload["id"]},
+                {"$set": document, "$setOnInsert": {"numCitations": None, "keywords": []}},
+                upsert = True
+            ))
+            faculty.append(UpdateOne({"id": payload["faculty_id"]}, {"$addToSet": {"publications": payload["id"]}}))
+        elif event == "publication_updated" and payload["fields"]:
+            publications.append(UpdateOne({"id": payload["id"]}, {"$set": {FIELDS[field]: value for field, value in payload["fields"].items()}}))
+        elif event == "publication_deleted":
+            publications.append(DeleteOne({"id": payload["id"]}))
+            faculty.append(UpdateMany({"publications": payload["id"]}, {"$pull": {"publications": payload["id"]}}))
+        elif event == "faculty_deleted":
+            faculty.append(DeleteMany({"id": {"$in": payload["ids"]}}))
+    return publications, faculty
+
+
+def apply_mongodb(entries):
+    publications, faculty = mongodb_operations(entries)
+    if publications:
+        mongodb_utils.mongo_db.publications.bulk_write(publications, ordered = True)
+    if faculty:
+        mongodb_utils.mongo_db.faculty.bulk_write(faculty, ordered = True)
+
+
+## Neo4j
+# One UNWIND statement per run of consecutive entries with the same event, using MERGE
+# and DETACH DELETE so a batch can be applied twice
+NEO4J_QUERIES = {
+    "university_inserted": """
+        UNWIND $rows AS row
+        MERGE (u:INSTITUTE {id: row.id})
+        SET u.name = row.name, u.photoUrl = row.photo_url
+        """,
+    "university_deleted": """
+        UNWIND $rows AS row
+        MATCH (u:INSTITUTE {name: row.name})
+        DETACH DELETE u
+        """,
+    "publication_added": """
+        UNWIND $rows AS row
+        MERGE (p:PUBLICATION {id: row.id})
+        SET p.title = row.title, p.venue = row.venue, p.year = row.year
+        WITH p, row
+        MATCH (f:FACULTY {id: row.faculty_id})
+        MERGE (f)-[:PUBLISH]->(p)
+        """,
+    "publication_updated": """
+        UNWIND $rows AS row
+        MATCH (p:PUBLICATION {id: row.id})
+        SET p += row.fields
+        """,
+    "publication_deleted": """
+        UNWIND $rows AS row
+        MATCH (p:PUBLICATION {id: row.id})
+        DETACH DELETE p
+        """,
+    "faculty_deleted": """
+        UNWIND $rows AS row
+        UNWIND row.ids AS id
+        MATCH (f:FACULTY {id: id})
+        DETACH DELETE f
+        """
+}
+
+
+def neo4j_rows(event, payloads):
+    if event == "publication_updated":
+        return [{"id": payload["id"], "fields": {FIELDS[field]: value for field, value in payload["fields"].items()}} for payload in payloads]
+    return payloads
+
+
+def apply_neo4j(entries):
+    for event, run in groupby(entries, key = lambda entry: entry[1]):
+        payloads = [payload for _, _, payload in run]
+        neo4j_utils.run_query(NEO4J_QUERIES[event], {"rows": neo4j_rows(event, payloads)})
+
+
+# Function to create the indexes the applier looks entries up by
+def create_indexes():
+    mongodb_utils.mongo_db.faculty.create_index([("id", 1)])
+    mongodb_utils.mongo_db.faculty.create_index([("publications", 1)])
+    for label in ["INSTITUTE", "FACULTY", "PUBLICATION"]:
+        neo4j_utils.neo4j_driver.execute_query(
+            f"CREATE INDEX {label.lower()}_id IF NOT EXISTS FOR (n:{label}) ON (n.id)",
+            database_ = neo4j_utils.db_name
+        )
+
+
+## Applier
+# Function to apply one batch of outbox entries
+def apply_batch(limit = None):
+    """
+    Applies the oldest pending outbox entries to MongoDB and Neo4j in bulk, then marks them
+    applied. If applying fails, the entries stay pending and are applied again by the next
+    call, which is safe because every operation is idempotent.
+
+    Parameters
+    ----------
+    limit : int, optional
+        Maximum number of entries to apply. Defaults to OUTBOX_BATCH_SIZE.
+
+    Returns
+    -------
+    int
+        The number of entries applied.
+    """
+
+    mysql_conn = mysql_utils.get_connection()
+    mysql_cursor = mysql_conn.cursor()
+    try:
+        mysql_utils.execute(mysql_cursor, "SELECT id, event, payload FROM outbox WHERE applied_at IS NULL ORDER BY id LIMIT %s", (limit or batch_size, ))
+        entries = [(entry_id, event, json.loads(payload)) for entry_id, event, payload in mysql_cursor.fetchall()]
+        if entries:
+            for target, apply in [("mongodb", apply_mongodb), ("neo4j", apply_neo4j)]:
+                try:
+                    apply(entries)
+                except Exception:
+                    ERRORS.inc((target, ))
+                    raise
+            # Mark exactly the entries read, since an entry with a lower id can commit after a higher one
+            ids = [entry_id for entry_id, _, _ in entries]
+            mysql_utils.execute(mysql_cursor, f"UPDATE outbox SET applied_at = CURRENT_TIMESTAMP(6) WHERE id IN ({', '.join(['%s'] * len(ids))})", ids)
+            mysql_conn.commit()
+            for _, event, _ in entries:
+                APPLIED.inc((event, ))
+
+        mysql_utils.execute(mysql_cursor, "SELECT COUNT(*), TIMESTAMPDIFF(MICROSECOND, MIN(created_at), CURRENT_TIMESTAMP(6)) FROM outbox WHERE applied_at IS NULL")
+        pending, lag = mysql_cursor.fetchone()
+        PENDING.set((), pending)
+        LAG.set((), (lag or 0) / 1e6)
+        return len(entries)
+    finally:
+        mysql_cursor.close()
+        mysql_conn.close()
+
+
+def prune():
+    """
+    Deletes applied entries older than OUTBOX_RETENTION_HOURS.
+    """
+
+    mysql_conn = mysql_utils.get_connection()
+    mysql_cursor = mysql_conn.cursor()
+    try:
+        mysql_utils.execute(mysql_cursor, "DELETE FROM outbox WHERE applied_at < NOW(6) - INTERVAL %s SECOND", (int(retention_hours * 3600), ))
+        mysql_conn.commit()
+    finally:
+        mysql_cursor.close()
+        mysql_conn.close()
+
+
+# Function to replay applied entries
+def replay(from_id):
+    """
+    Marks every retained entry with an id of at least from_id as pending again, e.g. after
+    restoring MongoDB or Neo4j from a backup taken before they were applied.
+
+    Returns
+    -------
+    int
+        The number of entries that will be applied again.
+    """
+
+    mysql_conn = mysql_utils.get_connection()
+    mysql_cursor = mysql_conn.cursor()
+    try:
+        mysql_utils.execute(mysql_cursor, "UPDATE outbox SET applied_at = NULL WHERE id >= %s AND applied_at IS NOT NULL", (from_id, ))
+        mysql_conn.commit()
+        return mysql_cursor.rowcount
+    finally:
+        mysql_cursor.close()
+        mysql_conn.close()
+
+
+def run_applier(stop = None):
+    """
+    Applies outbox entries until stop is set, while holding the applier lock. Batches are
+    applied back to back while the outbox is backed up, and every poll_interval seconds
+    otherwise.
+    """
+
+    stop = stop or threading.Event()
+    lock_conn = None
+    last_prune = 0.0
+    while not stop.is_set():
+        try:
+            if lock_conn is None or not lock_conn.is_connected():
+                lock_conn = mysql_utils.get_connection()
+                lock_cursor = lock_conn.cursor()
+                lock_cursor.execute("SELECT GET_LOCK(%s, 0)", (LOCK_NAME, ))
+                if not lock_cursor.fetchone()[0]:
+                    # Another process is applying the outbox
+                    lock_cursor.close()
+                    lock_conn.close()
+                    lock_conn = None
+                    stop.wait(poll_interval * 10)
+                    continue
+                lock_cursor.close()
+                create_indexes()
+
+            applied = apply_batch()
+            if time.monotonic() - last_prune > 3600:
+                prune()
+                last_prune = time.monotonic()
+            if applied < batch_size:
+                stop.wait(poll_interval)
+        except Exception as e:
+            print("Error applying outbox:", e)
+            stop.wait(poll_interval * 5)
+
+
+_applier = None
+
+
+# Function to start the applier in the background
+def start_applier():
+    """
+    Starts the applier on a daemon thread, once per process, unless OUTBOX_APPLIER=0.
+    """
+
+    global _applier
+    if _applier is None and in_process:
+        _applier = threading.Thread(target = run_applier, name = "outbox-applier", daemon = True)
+        _applier.start()
+    return _applier
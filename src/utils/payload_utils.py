@@ -0,0 +1,242 @@
+import os
+import gzip
+import decimal
+import functools
+import threading
+from collections import OrderedDict
+import numpy as np
+import plotly.io as pio
+import plotly.graph_objects as go
+from flask import request, g, has_request_context
+from . import metrics_utils, tracing_utils
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+## Response compression configuration
+# COMPRESS=0 sends every response uncompressed
+compress_enabled = os.getenv("COMPRESS", "1") != "0"
+
+# Responses smaller than this many bytes are not worth compressing
+min_size = int(os.getenv("COMPRESS_MIN_SIZE", "500"))
+
+# Compression levels: brotli 0-11 and gzip 1-9, trading CPU time for size
+brotli_quality = int(os.getenv("COMPRESS_BROTLI_QUALITY", "5"))
+gzip_level = int(os.getenv("COMPRESS_GZIP_LEVEL", "6"))
+
+COMPRESSIBLE = ("application/json", "text/html", "text/css", "text/plain", "application/javascript", "text/javascript")
+
+# Compressed bodies of responses with an ETag (the Dash JavaScript bundles), which do not
+# change and are compressed once per encoding
+_compressed = OrderedDict()
+_compressed_size = 64
+_compressed_lock = threading.Lock()
+
+BYTE_BUCKETS = (1000, 3000, 10000, 30000, 100000, 300000, 1000000, 3000000)
+
+PAYLOAD_BYTES = metrics_utils.histogram(
+    "uri_callback_payload_bytes",
+    "Size of Dash callback responses before compression.",
+    ("callback", ),
+    buckets = BYTE_BUCKETS
+)
+RESPONSE_BYTES = metrics_utils.histogram(
+    "uri_callback_response_bytes",
+    "Size of Dash callback responses as sent, by encoding.",
+    ("callback", "encoding"),
+    buckets = BYTE_BUCKETS
+)
+
+
+## Compact figures
+# The trace types and layout of the default plotly template that the dashboard's bar, line
+# and pie charts use. The full template adds about 7 KB of defaults for other chart types
+# to every figure
+TEMPLATE_TRACES = ("bar", "scatter", "pie")
+TEMPLATE_LAYOUT = (
+    "autotypenumbers", "colorway", "font", "hovermode", "hoverlabel", "paper_bgcolor", "plot_bgcolor",
+    "xaxis", "yaxis", "shapedefaults", "annotationdefaults", "title"
+)
+
+# Trace attributes holding one number per point
+ARRAY_ATTRIBUTES = ("x", "y", "values")
+
+
+def configure():
+    """
+    Makes every figure created afterwards use the compact "uri" template, and serializes
+    figures with orjson when it is installed.
+    """
+
+    full = pio.templates["plotly"].to_plotly_json()
+    pio.templates["uri"] = go.layout.Template(
+        data = {trace: full["data"][trace] for trace in TEMPLATE_TRACES if trace in full["data"]},
+        layout = {key: full["layout"][key] for key in TEMPLATE_LAYOUT if key in full["layout"]}
+    )
+    pio.templates.default = "uri"
+    if orjson is not None:
+        pio.json.config.default_engine = "orjson"
+
+
+def typed_array(values):
+    """
+    Returns values as a numpy array if they are all numbers, which plotly sends as a
+    base64-encoded typed array rather than a JSON list, or None otherwise. Values can be a
+    list, a tuple or an object array (e.g. a pandas column of Decimals). Whole floats become
+    integers, which plotly sends in the smallest integer type that holds them.
+    """
+
+    if isinstance(values, np.ndarray) and values.dtype == object:
+        values = values.tolist()
+    if not isinstance(values, (list, tuple)) or not values:
+        return None
+    if not all(isinstance(value, (int, float, decimal.Decimal, np.number)) and not isinstance(value, bool) for value in values):
+        return None
+    array = np.asarray([float(value) if isinstance(value, decimal.Decimal) else value for value in values])
+    if array.dtype.kind == "f" and np.isfinite(array).all() and (array == np.round(array)).all() and np.abs(array).max() < 2 ** 31:
+        array = array.astype(np.int64)
+    return array
+
+
+def compact(fig):
+    """
+    Returns the figure with the numeric per-point arrays that plotly holds as lists (e.g.
+    from columns of Decimals or mixed types) replaced by typed arrays.
+
+    Plotly ignores assigning a trace attribute a value equal to its current one, so traces
+    with such arrays are rebuilt, in a new figure with the same layout.
+    """
+
+    traces, changed = [], False
+    for trace in fig.data:
+        properties = trace.to_plotly_json()
+        for attribute in ARRAY_ATTRIBUTES:
+            array = typed_array(properties.get(attribute))
+            if array is not None:
+                properties[attribute] = array
+                changed = True
+        traces.append(properties)
+    if not changed:
+        return fig
+    return go.Figure(data = [type(trace)(properties) for trace, properties in zip(fig.data, traces)], layout = fig.layout)
+
+
+def _compact_output(output):
+    if isinstance(output, go.Figure):
+        return compact(output)
+    if isinstance(output, (list, tuple)) and any(isinstance(item, go.Figure) for item in output):
+        return type(output)(_compact_output(item) for item in output)
+    return output
+
+
+# Function to compact the figures returned by every callback registered on the app
+def compact_callbacks(app):
+    """
+    Replaces app.callback so that figures returned by every callback registered afterwards
+    are compacted, and the callback's name is recorded for the payload size metrics. Must
+    be called before any @app.callback decorators run.
+
+    Parameters
+    ----------
+    app : dash.Dash
+        The Dash app whose callbacks should be compacted.
+    """
+
+    register_callback = app.callback
+
+    @functools.wraps(register_callback)
+    def callback(*args, **kwargs):
+        decorator = register_callback(*args, **kwargs)
+
+        def wrap(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                # Callbacks called directly (e.g. by benchmark.py) have no request to record it on
+                if has_request_context():
+                    g.callback_name = func.__name__
+                output = func(*args, **kwargs)
+                with tracing_utils.span("compact"):
+                    return _compact_output(output)
+
+            return decorator(wrapper)
+
+        return wrap
+
+    app.callback = callback
+
+
+## Compressed responses
+def choose_encoding():
+    """
+    Returns the encoding to compress the current response with, "br" or "gzip", or None.
+    """
+
+    accepted = request.accept_encodings
+    if brotli is not None and accepted.quality("br") > 0:
+        return "br"
+    if accepted.quality("gzip") > 0:
+        return "gzip"
+    return None
+
+
+def _compress(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality = brotli_quality)
+    return gzip.compress(body, compresslevel = gzip_level)
+
+
+def register_compression(server):
+    """
+    Compresses the Flask server's text and JSON responses with brotli or gzip, whichever
+    the client accepts (brotli needs the brotli package), and records the size of every
+    Dash callback response before and after compression.
+
+    Parameters
+    ----------
+    server : flask.Flask
+        The Flask server behind the Dash app (app.server).
+    """
+
+    @server.after_request
+    def compress_response(response):
+        callback = g.get("callback_name") if request.path.endswith("_dash-update-component") else None
+        if response.direct_passthrough or response.is_streamed:
+            return response
+
+        body = response.get_data()
+        if callback:
+            PAYLOAD_BYTES.observe((callback, ), len(body))
+
+        encoding = None
+        if (compress_enabled and response.status_code == 200 and len(body) >= min_size
+                and response.mimetype in COMPRESSIBLE and "Content-Encoding" not in response.headers):
+            encoding = choose_encoding()
+        if encoding is not None:
+            etag = response.headers.get("ETag")
+            if etag:
+                with _compressed_lock:
+                    compressed = _compressed.get((etag, encoding))
+                if compressed is None:
+                    compressed = _compress(body, encoding)
+                    with _compressed_lock:
+                        _compressed[(etag, encoding)] = compressed
+                        while len(_compressed) > _compressed_size:
+                            _compressed.popitem(last = False)
+            else:
+                with tracing_utils.span("compress", encoding = encoding, bytes = len(body)):
+                    compressed = _compress(body, encoding)
+            response.set_data(compressed)
+            response.headers["Content-Encoding"] = encoding
+            response.vary.add("Accept-Encoding")
+
+        if callback:
+            RESPONSE_BYTES.observe((callback, encoding or "identity"), response.content_length or len(response.get_data()))
+        return response
@@ -0,0 +1,322 @@
+import os
+import json
+import time
+import inspect
+import functools
+import threading
+from dotenv import load_dotenv
+from . import metrics_utils
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+load_dotenv()
+
+
+## Access log configuration
+# File the access log is saved to, and the number of distinct inputs kept in it
+log_path = os.getenv("PREWARM_LOG", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "access_log.json"))
+log_size = int(os.getenv("PREWARM_LOG_SIZE", "2000"))
+
+# Hours after which a request counts half as much towards the popularity of its input
+half_life = float(os.getenv("PREWARM_HALF_LIFE_HOURS", "24")) * 3600
+
+# Seconds between saves of the access log. Every dashboard process adds the requests it
+# served since its last save to the saved log, under a file lock, and reads back the
+# requests of the others
+save_interval = float(os.getenv("PREWARM_SAVE_INTERVAL", "60"))
+
+
+## Prewarming configuration
+# Number of most popular inputs replayed per query
+top_n = int(os.getenv("PREWARM_TOP", "20"))
+
+# Database load budget of one prewarm: at most PREWARM_BUDGET seconds spent in queries,
+# one query at a time, busy at most PREWARM_DUTY_CYCLE of the time so user requests are
+# not starved
+budget = float(os.getenv("PREWARM_BUDGET", "30"))
+duty_cycle = float(os.getenv("PREWARM_DUTY_CYCLE", "0.25"))
+
+# Seconds to wait after startup or an invalidation before prewarming, so that a burst of
+# invalidations causes one prewarm
+delay = float(os.getenv("PREWARM_DELAY", "5"))
+
+# Only the dashboard process holding this MySQL lock prewarms, so the budget and duty cycle
+# apply to all processes together. Invalidations reach it through a file next to the log
+LOCK_NAME = "prewarmer"
+invalidated_path = log_path + ".invalidated"
+
+PREWARMED = metrics_utils.counter(
+    "uri_prewarmed_queries_total",
+    "Popular widget inputs replayed after startup or an invalidation, by query and result.",
+    ("query", "result")
+)
+
+
+class AccessLog:
+    """
+    How often every widget input was requested, with older requests counting exponentially
+    less (half as much after every half_life seconds). Scores are decayed lazily: each entry
+    keeps its score at the time it was last updated. The requests recorded since the last
+    save are also kept apart, so that saving adds them to the log saved by other processes.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.entries = {}
+        self.pending = {}
+        self.lock = threading.Lock()
+
+    def _score(self, entry, now):
+        score, updated = entry
+        return score * 0.5 ** ((now - updated) / half_life)
+
+    def _add(self, entry, other):
+        # Sum of two entries, decayed to the later update
+        if entry is None:
+            return other
+        now = max(entry[1], other[1])
+        return (self._score(entry, now) + self._score(other, now), now)
+
+    def record(self, query, args):
+        key = json.dumps([query, args], default = str, separators = (",", ":"))
+        now = time.time()
+        with self.lock:
+            self.entries[key] = self._add(self.entries.get(key), (1.0, now))
+            self.pending[key] = self._add(self.pending.get(key), (1.0, now))
+            if len(self.entries) > self.capacity * 1.25:
+                self.entries = self._compact(self.entries, now)
+
+    def _compact(self, entries, now):
+        # Keeps the capacity most popular inputs, in batches so compaction is rare
+        ranked = sorted(entries.items(), key = lambda item: self._score(item[1], now), reverse = True)
+        return dict(ranked[:self.capacity])
+
+    def top(self, n):
+        """
+        Returns {query: [(args, score)]} with the n most popular inputs of every query, most
+        popular first.
+        """
+
+        now = time.time()
+        with self.lock:
+            ranked = sorted(((self._score(entry, now), key) for key, entry in self.entries.items()), reverse = True)
+        top = {}
+        for score, key in ranked:
+            query, args = json.loads(key)
+            if len(top.setdefault(query, [])) < n:
+                top[query].append((args, score))
+        return top
+
+    def _read(self, path):
+        try:
+            with open(path) as f:
+                return {key: tuple(entry) for key, entry in json.load(f).items()}
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            print("Error reading the access log:", e)
+            return {}
+
+    def load(self, path):
+        entries = self._read(path)
+        with self.lock:
+            for key, entry in entries.items():
+                self.entries.setdefault(key, entry)
+            self.entries = self._compact(self.entries, time.time())
+
+    def save(self, path):
+        """
+        Adds the requests recorded since the last save to the log saved at path, which holds
+        those of every process, and continues from the merged log.
+        """
+
+        with self.lock:
+            pending, self.pending = self.pending, {}
+        try:
+            with open(path + ".lock", "a") as lock_file:
+                # Without file locks, concurrent saves may lose each other's requests
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                entries = self._read(path)
+                for key, entry in pending.items():
+                    entries[key] = self._add(entries.get(key), entry)
+                entries = self._compact(entries, time.time())
+                temp_path = f"{path}.{os.getpid()}.tmp"
+                with open(temp_path, "w") as f:
+                    json.dump(entries, f, separators = (",", ":"))
+                os.replace(temp_path, path)
+        except OSError as e:
+            print("Error saving the access log:", e)
+            with self.lock:
+                for key, entry in pending.items():
+                    self.pending[key] = self._add(self.pending.get(key), entry)
+            return
+
+        with self.lock:
+            # Requests recorded while saving are not in the saved log yet
+            for key, entry in self.pending.items():
+                entries[key] = self._add(entries.get(key), entry)
+            self.entries = entries
+
+
+access_log = AccessLog(log_size)
+
+# Query name -> the function replayed for it, which does not record its own inputs
+_queries = {}
+
+
+# Decorator for recording the inputs of a widget query
+def recorded(func):
+    """
+    Decorator that records every call's arguments in the access log, so the most popular
+    ones can be replayed after startup or an invalidation. Arguments are recorded by
+    position, including defaults, and must be JSON serializable.
+    """
+
+    _queries[func.__name__] = func
+    signature = inspect.signature(func)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        access_log.record(func.__name__, list(bound.arguments.values()))
+        return func(*args, **kwargs)
+
+    return wrapper
+
+
+# Function to replay the most popular widget inputs
+def prewarm():
+    """
+    Replays the PREWARM_TOP most popular inputs of every recorded query, most popular
+    first across queries, until the PREWARM_BUDGET seconds of query time are spent.
+
+    Returns
+    -------
+    int
+        The number of queries replayed.
+    """
+
+    inputs = sorted(
+        ((score, query, args) for query, top in access_log.top(top_n).items() if query in _queries for args, score in top),
+        key = lambda item: item[0],
+        reverse = True
+    )
+    spent, replayed = 0.0, 0
+    for _, query, args in inputs:
+        if spent >= budget:
+            break
+        start = time.perf_counter()
+        try:
+            _queries[query](*args)
+            PREWARMED.inc((query, "ok"))
+        except Exception as e:
+            print(f"Error prewarming {query}:", e)
+            PREWARMED.inc((query, "error"))
+        elapsed = time.perf_counter() - start
+        spent += elapsed
+        replayed += 1
+        # Idle long enough to keep the database busy with prewarming at most duty_cycle of the time
+        time.sleep(elapsed * (1 / duty_cycle - 1))
+    return replayed
+
+
+_invalidated = threading.Event()
+_prewarmer = None
+
+
+# Function to request a prewarm, e.g. after data has been reloaded
+def invalidate():
+    """
+    Requests a prewarm from this process and, through invalidated_path, from the process
+    holding the prewarmer lock.
+    """
+
+    _invalidated.set()
+    try:
+        with open(invalidated_path, "w") as f:
+            f.write(str(time.time()))
+    except OSError as e:
+        print("Error requesting a prewarm:", e)
+
+
+def _invalidated_at():
+    try:
+        return os.path.getmtime(invalidated_path)
+    except OSError:
+        return 0.0
+
+
+def _hold_lock(lock_conn):
+    """
+    Returns the MySQL connection holding the prewarmer lock, taking the lock if it is free,
+    or None if another process holds it.
+    """
+
+    if lock_conn is not None and lock_conn.is_connected():
+        return lock_conn
+    # Imported here, since mysql_utils records its widget queries with this module
+    from . import mysql_utils
+
+    try:
+        lock_conn = mysql_utils.get_connection()
+        lock_cursor = lock_conn.cursor()
+        lock_cursor.execute("SELECT GET_LOCK(%s, 0)", (LOCK_NAME, ))
+        held = lock_cursor.fetchone()[0]
+        lock_cursor.close()
+    except Exception as e:
+        print("Error taking the prewarmer lock:", e)
+        return None
+    if not held:
+        lock_conn.close()
+        return None
+    return lock_conn
+
+
+def run_prewarmer(stop = None):
+    """
+    Prewarms after startup and after every invalidation while holding the prewarmer lock,
+    and saves the access log every save_interval seconds, until stop is set.
+    """
+
+    stop = stop or threading.Event()
+    access_log.load(log_path)
+    _invalidated.set()
+    lock_conn = None
+    prewarmed_at = time.time()
+    last_save = time.monotonic()
+    while not stop.is_set():
+        if _invalidated.wait(delay) or _invalidated_at() > prewarmed_at:
+            lock_conn = _hold_lock(lock_conn)
+            if lock_conn is not None:
+                stop.wait(delay)
+                prewarmed_at = time.time()
+                start = time.perf_counter()
+                replayed = prewarm()
+                if replayed:
+                    print(f"Prewarmed {replayed} popular widget queries in {time.perf_counter() - start:.1f} s")
+            else:
+                # The process holding the lock prewarms, and sees the request in invalidated_path
+                prewarmed_at = time.time()
+            _invalidated.clear()
+        if time.monotonic() - last_save >= save_interval:
+            access_log.save(log_path)
+            last_save = time.monotonic()
+
+
+# Function to start the prewarmer in the background
+def start_prewarmer():
+    """
+    Starts the prewarmer on a daemon thread, once per process. Every process records and
+    saves the access log; only the one holding the prewarmer lock replays it.
+    """
+
+    global _prewarmer
+    if _prewarmer is None:
+        _prewarmer = threading.Thread(target = run_prewarmer, name = "prewarmer", daemon = True)
+        _prewarmer.start()
+    return _prewarmer
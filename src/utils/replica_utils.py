@@ -0,0 +1,198 @@
+import os
+import time
+import random
+import threading
+import mysql.connector
+from dotenv import load_dotenv
+from flask import request, g, has_request_context
+from . import metrics_utils
+
+load_dotenv()
+
+
+## Replica configuration
+# Replicas further behind the primary than this many seconds get no reads
+max_lag = float(os.getenv("MYSQL_MAX_REPLICA_LAG", "5"))
+
+# Seconds between checks of every replica's lag
+check_interval = float(os.getenv("MYSQL_REPLICA_CHECK_INTERVAL", "1"))
+
+# Cookie carrying the time of a browser session's last edit, so that every dashboard process
+# (e.g. every worker of a WSGI server) sends that session's reads to the primary until a
+# replica has applied the edit. Processes on different hosts need synchronized clocks
+WRITE_COOKIE = "uri_last_write"
+
+REPLICA_LAG = metrics_utils.gauge(
+    "uri_mysql_replica_lag_seconds",
+    "Replication lag of every MySQL replica at its last check, or -1 while it is unreachable or not replicating.",
+    ("replica", )
+)
+
+
+def parse_endpoints(value, default_port):
+    """
+    Returns [(host, port)] from a comma-separated list of host[:port] endpoints.
+    """
+
+    endpoints = []
+    for item in value.split(","):
+        item = item.strip()
+        if item:
+            host, _, port = item.partition(":")
+            endpoints.append((host, int(port) if port else default_port))
+    return endpoints
+
+
+# Function to read the time of the last edit of the current request's browser session
+def session_write():
+    """
+    Returns the time of the last edit made by the browser session of the current request,
+    from the write cookie or an edit made earlier in the same request, or 0 outside a request.
+    """
+
+    if not has_request_context():
+        return 0.0
+    if "last_write" in g:
+        return g.last_write
+    try:
+        return float(request.cookies.get(WRITE_COOKIE, 0))
+    except ValueError:
+        return 0.0
+
+
+# Function to send the time of a session's last edit back to its browser
+def register_write_cookie(server):
+    """
+    Sets the write cookie on every response to a request that made an edit, so that the
+    session's next requests read their own writes on whichever process handles them.
+
+    Parameters
+    ----------
+    server : flask.Flask
+        The Flask server of the Dash app.
+    """
+
+    @server.after_request
+    def set_write_cookie(response):
+        if "last_write" in g:
+            # Once it is older than the lag allowed, any replica that gets reads has applied it
+            response.set_cookie(WRITE_COOKIE, repr(g.last_write), max_age = int(max_lag + check_interval) + 60, httponly = True, samesite = "Lax")
+        return response
+
+
+class Replica:
+    """
+    One replica endpoint, its connection pool and its lag at the last check.
+    """
+
+    def __init__(self, endpoint, pool):
+        self.endpoint = endpoint
+        self.name = f"{endpoint[0]}:{endpoint[1]}"
+        self.pool = pool
+        # None while unreachable, not replicating or not checked yet
+        self.lag = None
+        self.checked_at = 0.0
+
+
+class ReplicaSet:
+    """
+    The MySQL replicas that read-only queries can be sent to instead of the primary.
+
+    A background thread measures every replica's lag with SHOW REPLICA STATUS. A read goes
+    to a replica whose lag is at most MYSQL_MAX_REPLICA_LAG and that has provably applied
+    the last edit made by this process and by the browser session of the request: the
+    replica was checked after the edit by more than its lag. Otherwise, e.g. right after an
+    edit, the read goes to the primary, so a user always reads their own writes, whichever
+    process handled the edit (see register_write_cookie).
+
+    Parameters
+    ----------
+    endpoints : list of (host, port)
+        The replicas.
+    open_pool : callable
+        Returns a statement_utils.ConnectionPool for an endpoint.
+    """
+
+    def __init__(self, endpoints, open_pool):
+        self.replicas = [Replica(endpoint, open_pool(endpoint)) for endpoint in endpoints]
+        self.last_write = 0.0
+        self.lock = threading.Lock()
+        self._checker = None
+
+    def __len__(self):
+        return len(self.replicas)
+
+    def mark_write(self):
+        """
+        Records an edit, so reads of this process and, through the write cookie, of the
+        browser session that made it go to the primary until a replica has applied it.
+        """
+
+        self.last_write = time.time()
+        if has_request_context():
+            g.last_write = self.last_write
+
+    def mark_down(self, replica):
+        replica.lag = None
+        REPLICA_LAG.set((replica.name, ), -1)
+
+    def check(self, replica):
+        """
+        Measures a replica's lag.
+        """
+
+        try:
+            with replica.pool.statements() as statements:
+                mysql_cursor = statements.connection.cursor(dictionary = True)
+                try:
+                    mysql_cursor.execute("SHOW REPLICA STATUS")
+                    status = mysql_cursor.fetchall()
+                finally:
+                    mysql_cursor.close()
+        except mysql.connector.Error as e:
+            print(f"Error checking replica {replica.name}:", e)
+            self.mark_down(replica)
+            return
+
+        # Seconds_Behind_Source is NULL while replication is stopped
+        lag = status[0].get("Seconds_Behind_Source") if status else None
+        if lag is None:
+            self.mark_down(replica)
+            return
+        replica.lag, replica.checked_at = float(lag), time.time()
+        REPLICA_LAG.set((replica.name, ), replica.lag)
+
+    def run_checker(self, stop = None):
+        stop = stop or threading.Event()
+        while not stop.is_set():
+            for replica in self.replicas:
+                self.check(replica)
+            stop.wait(check_interval)
+
+    def _start_checker(self):
+        with self.lock:
+            if self._checker is None:
+                # Reads go to the primary until the first check of a replica
+                self._checker = threading.Thread(target = self.run_checker, name = "replica-checker", daemon = True)
+                self._checker.start()
+
+    def choose(self):
+        """
+        Returns the replica to send a read to, or None to send it to the primary.
+        """
+
+        if not self.replicas:
+            return None
+        if self._checker is None:
+            self._start_checker()
+
+        # Lag is reported in whole seconds, hence the extra second
+        last_write = max(self.last_write, session_write())
+        eligible = [
+            replica for replica in self.replicas
+            if replica.lag is not None and replica.lag <= max_lag and replica.checked_at - replica.lag - 1 > last_write
+        ]
+        if not eligible:
+            return None
+        least = min(replica.lag for replica in eligible)
+        return random.choice([replica for replica in eligible if replica.lag <= least + 1])
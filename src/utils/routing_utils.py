@@ -0,0 +1,258 @@
+import os
+import math
+import time
+import random
+import threading
+from dotenv import load_dotenv
+from . import mysql_utils, mongodb_utils, neo4j_utils, metrics_utils, breaker_utils, coalesce_utils, prewarm_utils
+
+load_dotenv()
+
+
+## Backends and the widget queries every one of them can answer
+BACKENDS = {
+    "mysql": mysql_utils,
+    "mongodb": mongodb_utils,
+    "neo4j": neo4j_utils
+}
+
+# Query -> the backend the widget used before routing, which is tried first until the
+# others have been measured
+QUERIES = {
+    "get_citation_ranking": "mysql",
+    "top_right_query": "mongodb",
+    "get_krc": "neo4j"
+}
+
+
+## Routing configuration
+# ROUTING=0 pins every query to its home backend
+enabled = os.getenv("ROUTING", "1") != "0"
+
+# Fraction of requests sent to a backend other than the fastest one, so that estimates of
+# the other backends stay current
+explore_rate = float(os.getenv("ROUTING_EXPLORE_RATE", "0.05"))
+
+# Seconds a backend is skipped after a failure, doubling with every consecutive failure
+cooldown = float(os.getenv("ROUTING_COOLDOWN", "30"))
+
+# Weight of the newest latency in the moving average
+smoothing = 0.2
+
+ROUTED = metrics_utils.counter(
+    "uri_routed_queries_total",
+    "Widget queries answered, by query and the backend that answered them.",
+    ("query", "backend")
+)
+FAILOVERS = metrics_utils.counter(
+    "uri_routing_failovers_total",
+    "Widget queries that failed on a backend and were retried on another one.",
+    ("query", "backend")
+)
+
+
+class BackendStats:
+    """
+    Recently observed latency and health of one backend for one query.
+    """
+
+    def __init__(self):
+        self.latency = None
+        self.samples = 0
+        self.failures = 0
+        self.down_until = 0.0
+
+    def observe(self, elapsed):
+        self.latency = elapsed if self.latency is None else (1 - smoothing) * self.latency + smoothing * elapsed
+        self.samples += 1
+        self.failures = 0
+        self.down_until = 0.0
+
+    def fail(self):
+        self.failures += 1
+        self.down_until = time.monotonic() + cooldown * 2 ** min(self.failures - 1, 5)
+
+
+_stats = {(query, backend): BackendStats() for query in QUERIES for backend in BACKENDS}
+_flights = {query: coalesce_utils.SingleFlight(query) for query in QUERIES}
+_lock = threading.Lock()
+
+
+def _estimate(query, backend):
+    """
+    Returns the expected latency of a backend, treating an unmeasured home backend as the
+    fastest and unmeasured other backends as the slowest.
+    """
+
+    stats = _stats[(query, backend)]
+    if stats.samples:
+        return stats.latency
+    return 0.0 if backend == QUERIES[query] else math.inf
+
+
+def plan(query):
+    """
+    Returns the backends to try for a query, in order: healthy backends from the lowest to
+    the highest expected latency (occasionally exploring another one first), followed by
+    backends that are cooling down after a failure as a last resort.
+    """
+
+    if not enabled:
+        return [QUERIES[query]]
+
+    now = time.monotonic()
+    with _lock:
+        healthy = sorted((b for b in BACKENDS if _stats[(query, b)].down_until <= now), key = lambda b: _estimate(query, b))
+        down = sorted((b for b in BACKENDS if _stats[(query, b)].down_until > now), key = lambda b: _stats[(query, b)].down_until)
+    if len(healthy) > 1 and random.random() < explore_rate:
+        healthy.insert(0, healthy.pop(random.randrange(1, len(healthy))))
+    return healthy + down
+
+
+def _answer(query, key, *args, **kwargs):
+    """
+    Runs a widget query on the first backend in plan(query) that answers in time, skipping
+    backends whose circuit breaker is open, and raises the last error if none does. When a
+    last good result is available to fall back on, all backends together get at most
+    BREAKER_TIMEOUT seconds rather than that long each.
+    """
+
+    deadline = time.monotonic() + breaker_utils.call_timeout if breaker_utils.results.get(key) else None
+    error = None
+    for backend in plan(query):
+        timeout = None
+        if deadline is not None:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+        start = time.perf_counter()
+        try:
+            result = breaker_utils.call(backend, key, getattr(BACKENDS[backend], query), *args, timeout = timeout, **kwargs)
+        except ValueError:
+            raise  # invalid input, which every backend would reject
+        except (breaker_utils.BreakerOpen, breaker_utils.BulkheadFull) as e:
+            error = error or e
+            continue
+        except Exception as e:
+            print(f"Error running {query} on {backend}, trying the next backend:", e)
+            with _lock:
+                _stats[(query, backend)].fail()
+            FAILOVERS.inc((query, backend))
+            error = e
+            continue
+        with _lock:
+            _stats[(query, backend)].observe(time.perf_counter() - start)
+        ROUTED.inc((query, backend))
+        return result
+    raise error or breaker_utils.BackendUnavailable(f"no backend answered {query} in time")
+
+
+# Function to run a widget query on the best backend
+def route(query, *args, **kwargs):
+    """
+    Runs a widget query on the backend with the best recently observed latency, failing over
+    to the next backend if it raises or does not answer within BREAKER_TIMEOUT seconds. When
+    no backend answers, the last good result of the same query is served, marked stale,
+    while a fresh one is fetched in the background. Identical concurrent requests share one
+    run of the query.
+
+    Parameters
+    ----------
+    query : str
+        One of the QUERIES, i.e. the name of the function in every backend's utils module.
+
+    Returns
+    -------
+    The result of the query, in the same format whichever backend answered it, or a
+    breaker_utils.StaleResult with the same rows.
+    """
+
+    key = (query, coalesce_utils.normalize(*args, **kwargs))
+    return _flights[query].do(key[1], lambda: _route(query, key, *args, **kwargs))
+
+
+def _route(query, key, *args, **kwargs):
+    try:
+        return _answer(query, key, *args, **kwargs)
+    except ValueError:
+        raise
+    except Exception as e:
+        result = breaker_utils.stale(query, key, lambda: _answer(query, key, *args, **kwargs))
+        if result is None:
+            raise
+        print(f"Serving the last good result of {query} from {result.age:.0f} s ago:", e)
+        return result
+
+
+# Function to describe the routing state
+def status():
+    """
+    Returns the latency estimate, health and circuit breaker state of every backend for
+    every query.
+    """
+
+    now = time.monotonic()
+    with _lock:
+        return [
+            {
+                "query": query,
+                "backend": backend,
+                "latency_ms": round(stats.latency * 1000, 3) if stats.latency is not None else None,
+                "samples": stats.samples,
+                "failures": stats.failures,
+                "cooling_down_s": round(max(0.0, stats.down_until - now), 1),
+                "breaker": breaker_utils.breaker(backend).state
+            }
+            for (query, backend), stats in _stats.items()
+        ]
+
+
+## Routed widget queries, with the same signatures as the backend functions
+@prewarm_utils.recorded
+def get_citation_ranking(name):
+    return route("get_citation_ranking", name)
+
+@prewarm_utils.recorded
+def top_right_query(universities = None, years = None):
+    # The order of the selected universities does not change the result
+    universities = sorted(set(universities)) if universities else universities
+    return route("top_right_query", universities, years)
+
+@prewarm_utils.recorded
+def get_krc(keyword):
+    return route("get_krc", keyword)
+
+
+## Parity between backends
+def _ranking(query, rows):
+    """
+    Returns (key, value) pairs of a query result as comparable Python values.
+    """
+
+    if query == "get_citation_ranking":
+        return [(row["name"], float(row["totalCitations"] or 0)) for row in rows]
+    if query == "get_krc":
+        return [(row["university"], float(row["totalKRC"] or 0)) for row in rows]
+    return [((row["_id"]["university"], row["_id"]["year"]), float(row["university_publications"])) for row in rows]
+
+
+def equivalent(query, a, b, rel_tol = 1e-5):
+    """
+    Returns True if two results of the same query are equivalent: the same values in the
+    same order and the same keys for every value, except that rows tied at the cutoff
+    of a top 10 query may differ.
+    """
+
+    a, b = _ranking(query, a), _ranking(query, b)
+    if len(a) != len(b):
+        return False
+    if query == "top_right_query":
+        b = dict(b)
+        return all(key in b and math.isclose(value, b[key], rel_tol = rel_tol) for key, value in a)
+
+    if not all(math.isclose(x, y, rel_tol = rel_tol) for (_, x), (_, y) in zip(a, b)):
+        return False
+    cutoff = a[-1][1] if len(a) == 10 else -math.inf
+    a = {key: value for key, value in a if not math.isclose(value, cutoff, rel_tol = rel_tol)}
+    b = {key: value for key, value in b if not math.isclose(value, cutoff, rel_tol = rel_tol)}
+    return a.keys() == b.keys() and all(math.isclose(a[key], b[key], rel_tol = rel_tol) for key in a)
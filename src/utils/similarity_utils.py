@@ -0,0 +1,110 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+
+## Similarity configuration
+# Number of most similar universities precomputed for every university
+NEIGHBORS = 50
+
+# Largest number of similarity scores held in memory at once while precomputing, i.e.
+# rows per block x universities
+BLOCK_CELLS = 4_000_000
+
+
+## University keyword profiles
+class SimilarityIndex:
+    """
+    Universities as sparse vectors of their faculty's keyword scores, with the most similar
+    universities of every university precomputed by cosine similarity.
+
+    The all-pairs similarities are computed a block of rows at a time as one sparse matrix
+    product per block, so memory stays bounded by BLOCK_CELLS however many universities
+    there are. Matching a set of keywords only reads the matrix columns of those keywords.
+
+    Parameters
+    ----------
+    universities, keywords, scores : sequences of equal length
+        One (university name, keyword name, total keyword score) triple per nonzero score.
+    """
+
+    def __init__(self, universities, keywords, scores):
+        university_codes, self.universities = pd.factorize(pd.Series(universities, dtype = object))
+        keyword_codes, keyword_names = pd.factorize(pd.Series(keywords, dtype = object).str.lower())
+        self.position = {name: i for i, name in enumerate(self.universities)}
+        self.keyword_position = {name: i for i, name in enumerate(keyword_names)}
+
+        matrix = sparse.csr_matrix(
+            (np.asarray(scores, dtype = np.float32), (university_codes, keyword_codes)),
+            shape = (len(self.universities), len(keyword_names))
+        )
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis = 1)).ravel())
+        norms[norms == 0] = 1
+        self.matrix = sparse.diags(1 / norms).dot(matrix).tocsr().astype(np.float32)
+        self.columns = self.matrix.tocsc()
+        self.neighbors, self.similarities = self._all_neighbors()
+
+    def __len__(self):
+        return len(self.universities)
+
+    @staticmethod
+    def _top(scores, k):
+        """
+        Returns the indexes and values of the k highest scores of every row, highest first.
+        """
+
+        k = min(k, scores.shape[1])
+        if k < scores.shape[1]:
+            top = np.argpartition(-scores, k - 1, axis = 1)[:, :k]
+        else:
+            top = np.tile(np.arange(scores.shape[1]), (scores.shape[0], 1))
+        values = np.take_along_axis(scores, top, axis = 1)
+        order = np.argsort(-values, axis = 1, kind = "stable")
+        return np.take_along_axis(top, order, axis = 1), np.take_along_axis(values, order, axis = 1)
+
+    def _all_neighbors(self):
+        n = len(self.universities)
+        k = min(NEIGHBORS, max(n - 1, 0))
+        neighbors = np.zeros((n, k), dtype = np.int32)
+        similarities = np.zeros((n, k), dtype = np.float32)
+        if k == 0:
+            return neighbors, similarities
+
+        transposed = self.matrix.T.tocsc()
+        block = max(1, BLOCK_CELLS // n)
+        for start in range(0, n, block):
+            stop = min(start + block, n)
+            scores = (self.matrix[start:stop] @ transposed).toarray()
+            scores[np.arange(stop - start), np.arange(start, stop)] = -np.inf
+            neighbors[start:stop], similarities[start:stop] = self._top(scores, k)
+        return neighbors, similarities
+
+    def _results(self, indexes, similarities):
+        return [
+            {"university": self.universities[i], "similarity": round(float(similarity), 4)}
+            for i, similarity in zip(indexes, similarities) if similarity > 0
+        ]
+
+    def similar_to_university(self, university, k = 10):
+        """
+        Returns up to k universities most similar to a university, as
+        [{"university", "similarity"}], most similar first.
+        """
+
+        i = self.position.get(university)
+        if i is None:
+            return []
+        return self._results(self.neighbors[i, :k], self.similarities[i, :k])
+
+    def similar_to_keywords(self, keywords, k = 10):
+        """
+        Returns up to k universities whose keyword profile is closest to a set of equally
+        weighted keywords, as [{"university", "similarity"}], most similar first.
+        """
+
+        columns = sorted({self.keyword_position[keyword.lower()] for keyword in keywords if keyword.lower() in self.keyword_position})
+        if not columns or not len(self.universities):
+            return []
+        scores = np.asarray(self.columns[:, columns].sum(axis = 1)).ravel() / np.sqrt(len(columns))
+        top, values = self._top(scores[np.newaxis, :], k)
+        return self._results(top[0], values[0])
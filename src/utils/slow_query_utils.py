@@ -0,0 +1,249 @@
+import os
+import re
+import json
+import time
+import queue
+import random
+import hashlib
+import threading
+from collections import deque
+from contextlib import contextmanager
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+## Slow query capture configuration
+# Capture is opt-in: nothing is recorded unless SLOW_QUERY_THRESHOLD_MS is set
+threshold_ms = os.getenv("SLOW_QUERY_THRESHOLD_MS")
+threshold = float(threshold_ms) / 1000 if threshold_ms else None
+
+# Fraction of slow queries whose plan is captured, and the minimum number of seconds
+# between two plan captures for the same query
+plan_sample_rate = float(os.getenv("SLOW_QUERY_PLAN_SAMPLE_RATE", "0.1"))
+plan_interval = float(os.getenv("SLOW_QUERY_PLAN_INTERVAL", "60"))
+
+# Bounded log of slow queries
+log_path = os.getenv("SLOW_QUERY_LOG", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "slow_queries.jsonl"))
+log_size = int(os.getenv("SLOW_QUERY_LOG_SIZE", "1000"))
+
+_recent = deque(maxlen = log_size)
+_last_plan = {}
+_pending = queue.Queue(maxsize = 100)
+_worker = None
+_worker_lock = threading.Lock()
+_log_lock = threading.Lock()
+_log_lines = None
+_capture = threading.local()
+
+
+def is_slow(elapsed):
+    """
+    Returns True if slow query capture is enabled and elapsed (seconds) is over the threshold,
+    or if the current thread is inside capture_plans().
+    """
+
+    return (threshold is not None and elapsed >= threshold) or getattr(_capture, "entries", None) is not None
+
+
+# Context manager to collect the plans of every query run in a block
+@contextmanager
+def capture_plans():
+    """
+    Captures the plan of every query run by the current thread inside the block,
+    synchronously and regardless of the threshold and sampling settings. The entries
+    are collected in the yielded list instead of being written to the log.
+
+    Yields
+    ------
+    list of dict
+        Entries in the same format as the slow query log, with the plan filled in.
+    """
+
+    previous = getattr(_capture, "entries", None)
+    _capture.entries = []
+    try:
+        yield _capture.entries
+    finally:
+        _capture.entries = previous
+
+
+def fingerprint(backend, query):
+    """
+    Returns a short stable id for a query, ignoring whitespace differences.
+    """
+
+    normalized = re.sub(r"\s+", " ", query).strip()
+    return hashlib.sha1(f"{backend}:{normalized}".encode()).hexdigest()[:12]
+
+
+def _should_capture_plan(query_id):
+    """
+    Samples plan captures and limits them to one per query per plan_interval seconds.
+    """
+
+    if random.random() >= plan_sample_rate:
+        return False
+    now = time.monotonic()
+    if now - _last_plan.get(query_id, float("-inf")) < plan_interval:
+        return False
+    _last_plan[query_id] = now
+    return True
+
+
+# Function to record a slow query
+def record(backend, function, query, params, elapsed, explain = None):
+    """
+    Queues a slow query to be written to the slow query log. The plan is captured by
+    calling explain on a background thread, so the caller never waits for it.
+
+    Parameters
+    ----------
+    backend : str
+        The database the query ran on, i.e. "mysql", "mongodb" or "neo4j".
+    function : str
+        The utils function that ran the query.
+    query : str
+        The query text (SQL, JSON-encoded pipeline or Cypher).
+    params : any
+        The query parameters.
+    elapsed : float
+        The query duration in seconds.
+    explain : callable, optional
+        Zero-argument function returning the backend's plan for the query.
+    """
+
+    query_id = fingerprint(backend, query)
+    entry = {
+        "time": time.time(),
+        "backend": backend,
+        "function": function,
+        "fingerprint": query_id,
+        "query": query,
+        "params": params,
+        "duration_ms": round(elapsed * 1000, 3),
+        "plan": None
+    }
+    captured = getattr(_capture, "entries", None)
+    if captured is not None:
+        entry["plan"] = explain() if explain is not None else None
+        captured.append(entry)
+        return
+
+    capture_plan = explain is not None and _should_capture_plan(query_id)
+    _ensure_worker()
+    try:
+        _pending.put_nowait((entry, explain if capture_plan else None))
+    except queue.Full:
+        pass  # drop rather than slow down the request
+
+
+def _ensure_worker():
+    global _worker
+    if _worker is None:
+        with _worker_lock:
+            if _worker is None:
+                _worker = threading.Thread(target = _process, name = "slow-query-log", daemon = True)
+                _worker.start()
+
+
+def _process():
+    """
+    Background worker that captures plans and appends entries to the log.
+    """
+
+    while True:
+        entry, explain = _pending.get()
+        if explain is not None:
+            try:
+                entry["plan"] = explain()
+            except Exception as e:
+                entry["plan"] = {"error": str(e)}
+        write(entry)
+
+
+def write(entry):
+    """
+    Appends an entry to the log file, compacting it to the newest log_size entries when it
+    grows past twice that.
+    """
+
+    global _log_lines
+    line = json.dumps(entry, default = str)
+    with _log_lock:
+        _recent.append(entry)
+        try:
+            if _log_lines is None:
+                _log_lines = sum(1 for _ in open(log_path)) if os.path.exists(log_path) else 0
+            with open(log_path, "a") as f:
+                f.write(line + "\n")
+            _log_lines += 1
+            if _log_lines > 2 * log_size:
+                with open(log_path) as f:
+                    keep = deque(f, maxlen = log_size)
+                with open(log_path, "w") as f:
+                    f.writelines(keep)
+                _log_lines = len(keep)
+        except OSError as e:
+            print("Error writing slow query log:", e)
+
+
+# Function to read the slow query log
+def read_log(path = None):
+    """
+    Returns the entries in the slow query log, oldest first.
+    """
+
+    path = path or log_path
+    if not os.path.exists(path):
+        return []
+    entries = []
+    with open(path) as f:
+        for line in f:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                continue  # partially written line
+    return entries
+
+
+def worst_offenders(entries, sort = "max", limit = 20):
+    """
+    Groups log entries by query fingerprint and ranks them.
+
+    Parameters
+    ----------
+    entries : list of dict
+        Entries returned by read_log.
+    sort : str
+        "max", "total" or "count".
+    limit : int
+        Number of queries to return.
+
+    Returns
+    -------
+    list of dict
+        One summary per query with count, max_ms, total_ms, the slowest entry and its latest plan.
+    """
+
+    groups = {}
+    for entry in entries:
+        group = groups.setdefault(entry["fingerprint"], {
+            "fingerprint": entry["fingerprint"],
+            "backend": entry["backend"],
+            "function": entry["function"],
+            "count": 0,
+            "total_ms": 0.0,
+            "max_ms": 0.0,
+            "slowest": entry,
+            "plan": None
+        })
+        group["count"] += 1
+        group["total_ms"] += entry["duration_ms"]
+        if entry["duration_ms"] >= group["max_ms"]:
+            group["max_ms"] = entry["duration_ms"]
+            group["slowest"] = entry
+        if entry.get("plan") is not None:
+            group["plan"] = entry["plan"]
+    key = {"max": "max_ms", "total": "total_ms", "count": "count"}[sort]
+    return sorted(groups.values(), key = lambda group: group[key], reverse = True)[:limit]
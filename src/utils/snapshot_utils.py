@@ -0,0 +1,626 @@
+import os
+import json
+import time
+import threading
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from . import metrics_utils, keyword_index_utils, similarity_utils, trend_utils
+
+
+## Snapshot files
+# Each table is an uncompressed Arrow IPC file, so it can be memory-mapped and read
+# without copying. Tables are sorted by their lookup key at export time, and each key
+# maps to a contiguous slice of rows.
+TABLES = {
+    "university_year_counts": ("university", [("university", "ascending"), ("year", "ascending")]),
+    "university_keyword_scores": ("keyword_name", [("keyword_name", "ascending"), ("total_keyword_score", "descending")]),
+    "faculty_citations": ("university", [("university", "ascending"), ("totalCitations", "descending")]),
+    "krc_scores": ("keyword", [("keyword", "ascending"), ("totalKRC", "descending")]),
+    "faculty_impact": ("university", [("university", "ascending"), ("h_index", "descending"), ("totalCitations", "descending")]),
+    "university_impact": ("university", [("university", "ascending")]),
+    "faculty": ("university", [("university", "ascending"), ("name", "ascending"), ("id", "ascending")]),
+    "top_faculty": (None, [("totalCitations", "descending"), ("id", "ascending")]),
+    "keyword_top_faculty": ("keyword", [("keyword", "ascending"), ("totalCitations", "descending"), ("id", "ascending")]),
+    "keyword_trends": (None, [("university", "ascending"), ("keyword", "ascending"), ("year", "ascending")]),
+    "universities": (None, [("name", "ascending")]),
+    "keywords": (None, [("name", "ascending")]),
+    "keyword_options": (None, [("name", "ascending")]),
+}
+
+MANIFEST = "manifest.json"
+
+
+class ReadOnlySnapshotError(PermissionError):
+    """
+    Raised by write operations while the dashboard serves a snapshot.
+    """
+
+
+def impact(keys, citations):
+    """
+    Computes the h-index and i10-index of every group of publications in one vectorized pass
+    over their citations, sorted by group and then by citations, highest first. The
+    publications whose citations are at least their rank within the group are exactly the
+    first h.
+
+    Parameters
+    ----------
+    keys : numpy.ndarray
+        The group (e.g. faculty id) of every publication.
+    citations : numpy.ndarray
+        The citations of every publication.
+
+    Returns
+    -------
+    tuple of numpy.ndarray
+        The index of the first publication of every group, and the h-index, i10-index and
+        total citations of every group.
+    """
+
+    if len(keys) == 0:
+        empty = np.zeros(0, np.int64)
+        return empty, empty, empty, empty
+    starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+    ranks = np.arange(len(keys)) - np.repeat(starts, np.diff(np.append(starts, len(keys)))) + 1
+    h_index = np.add.reduceat((citations >= ranks).astype(np.int64), starts)
+    i10_index = np.add.reduceat((citations >= 10).astype(np.int64), starts)
+    return starts, h_index, i10_index, np.add.reduceat(citations, starts)
+
+
+def _write_table(directory, name, columns):
+    """
+    Sorts a table by its key and writes it as an uncompressed Arrow IPC file.
+    """
+
+    _, sort_keys = TABLES[name]
+    table = pa.table(columns)
+    if table.num_rows:
+        table = table.sort_by(sort_keys)
+    path = os.path.join(directory, f"{name}.arrow")
+    with pa.OSFile(path + ".tmp", "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(path + ".tmp", path)
+    return table.num_rows
+
+
+# Function to export every widget's aggregates
+def export_snapshot(directory):
+    """
+    Exports the aggregates behind every read-only widget from MySQL, MongoDB and Neo4j
+    into memory-mappable Arrow files.
+
+    Parameters
+    ----------
+    directory : str
+        The directory to write the snapshot to. It is created if it does not exist.
+
+    Returns
+    -------
+    dict
+        The snapshot manifest.
+    """
+
+    from . import mysql_utils, mongodb_utils, neo4j_utils, leaderboard_utils
+
+    os.makedirs(directory, exist_ok = True)
+    started = time.time()
+    counts = {}
+
+    # University x year publication counts (top right widget)
+    rows = mongodb_utils.top_right_query()
+    counts["university_year_counts"] = _write_table(directory, "university_year_counts", {
+        "university": pa.array([row["_id"]["university"] for row in rows], pa.string()),
+        "year": pa.array([row["_id"]["year"] for row in rows], pa.int32()),
+        "university_publications": pa.array([row["university_publications"] for row in rows], pa.int64())
+    })
+
+    mysql_conn = mysql_utils.get_connection()
+    mysql_cursor = mysql_conn.cursor()
+    try:
+        # University x keyword scores (middle left widget)
+        mysql_utils.execute(mysql_cursor, """SELECT u.name, k.name, SUM(fk.score)
+                             FROM faculty f
+                             JOIN faculty_keyword fk ON f.id = fk.faculty_id
+                             JOIN keyword k ON fk.keyword_id = k.id
+                             JOIN university u ON f.university_id = u.id
+                             GROUP BY u.id, u.name, k.id, k.name""")
+        rows = mysql_cursor.fetchall()
+        counts["university_keyword_scores"] = _write_table(directory, "university_keyword_scores", {
+            "university_name": pa.array([row[0] for row in rows], pa.string()),
+            "keyword_name": pa.array([row[1] for row in rows], pa.string()),
+            "total_keyword_score": pa.array([float(row[2]) for row in rows], pa.float64())
+        })
+
+        # Faculty citation totals per university (top left widget)
+        mysql_utils.execute(mysql_cursor, """SELECT u.name, f.name, SUM(p.num_citations) AS totalCitations
+                             FROM faculty f
+                             JOIN university u ON u.id = f.university_id
+                             JOIN faculty_publication fp ON fp.faculty_id = f.id
+                             JOIN publication p ON p.ID = fp.publication_id
+                             GROUP BY u.name, f.name""")
+        rows = mysql_cursor.fetchall()
+        counts["faculty_citations"] = _write_table(directory, "faculty_citations", {
+            "university": pa.array([row[0] for row in rows], pa.string()),
+            "name": pa.array([row[1] for row in rows], pa.string()),
+            "totalCitations": pa.array([int(row[2] or 0) for row in rows], pa.int64())
+        })
+
+        # h-index and i10-index of every faculty member and university (top left widget)
+        mysql_utils.execute(mysql_cursor, """SELECT u.name, f.id, f.name, COALESCE(p.num_citations, 0)
+                             FROM faculty f
+                             JOIN university u ON u.id = f.university_id
+                             JOIN faculty_publication fp ON fp.faculty_id = f.id
+                             JOIN publication p ON p.ID = fp.publication_id
+                             ORDER BY f.id, COALESCE(p.num_citations, 0) DESC""")
+        rows = mysql_cursor.fetchall()
+        starts, h_index, i10_index, totals = impact(np.array([row[1] for row in rows], np.int64), np.array([row[3] for row in rows], np.int64))
+        counts["faculty_impact"] = _write_table(directory, "faculty_impact", {
+            "university": pa.array([rows[start][0] for start in starts], pa.string()),
+            "name": pa.array([rows[start][2] for start in starts], pa.string()),
+            "h_index": pa.array(h_index, pa.int64()),
+            "i10_index": pa.array(i10_index, pa.int64()),
+            "totalCitations": pa.array(totals, pa.int64())
+        })
+
+        mysql_utils.execute(mysql_cursor, """SELECT DISTINCT u.id, u.name, p.ID, COALESCE(p.num_citations, 0) AS citations
+                             FROM faculty f
+                             JOIN university u ON u.id = f.university_id
+                             JOIN faculty_publication fp ON fp.faculty_id = f.id
+                             JOIN publication p ON p.ID = fp.publication_id
+                             ORDER BY u.id, citations DESC""")
+        rows = mysql_cursor.fetchall()
+        starts, h_index, i10_index, _ = impact(np.array([row[0] for row in rows], np.int64), np.array([row[3] for row in rows], np.int64))
+        counts["university_impact"] = _write_table(directory, "university_impact", {
+            "university": pa.array([rows[start][1] for start in starts], pa.string()),
+            "h_index": pa.array(h_index, pa.int64()),
+            "i10_index": pa.array(i10_index, pa.int64()),
+            "publications": pa.array(np.diff(np.append(starts, len(rows))), pa.int64())
+        })
+
+        # Faculty reference list (bottom right widget)
+        mysql_utils.execute(mysql_cursor, "SELECT u.name, f.name, f.id FROM faculty f JOIN university u ON u.id = f.university_id")
+        rows = mysql_cursor.fetchall()
+        counts["faculty"] = _write_table(directory, "faculty", {
+            "university": pa.array([row[0] for row in rows], pa.string()),
+            "name": pa.array([row[1] for row in rows], pa.string()),
+            "id": pa.array([row[2] for row in rows], pa.int64())
+        })
+
+        # Top faculty by total citations, overall and per keyword (leaderboard widget)
+        mysql_utils.execute(mysql_cursor, f"""SELECT id, name, university, totalCitations
+                             FROM ({leaderboard_utils.TOTALS_QUERY.format(where = "")}) AS totals
+                             ORDER BY totalCitations DESC, id
+                             LIMIT %s""", (leaderboard_utils.size, ))
+        rows = mysql_cursor.fetchall()
+        counts["top_faculty"] = _write_table(directory, "top_faculty", {
+            "id": pa.array([row[0] for row in rows], pa.int64()),
+            "name": pa.array([row[1] for row in rows], pa.string()),
+            "university": pa.array([row[2] for row in rows], pa.string()),
+            "totalCitations": pa.array([int(row[3]) for row in rows], pa.int64())
+        })
+        mysql_utils.execute(mysql_cursor, f"""SELECT keyword, id, name, university, totalCitations
+                             FROM (SELECT k.name AS keyword, totals.*,
+                                          ROW_NUMBER() OVER (PARTITION BY k.id ORDER BY totals.totalCitations DESC, totals.id) AS position
+                                   FROM ({leaderboard_utils.TOTALS_QUERY.format(where = "")}) AS totals
+                                   JOIN faculty_keyword fk ON fk.faculty_id = totals.id
+                                   JOIN keyword k ON k.id = fk.keyword_id) AS ranked
+                             WHERE position <= %s""", (leaderboard_utils.size, ))
+        rows = mysql_cursor.fetchall()
+        counts["keyword_top_faculty"] = _write_table(directory, "keyword_top_faculty", {
+            "keyword": pa.array([row[0] for row in rows], pa.string()),
+            "id": pa.array([row[1] for row in rows], pa.int64()),
+            "name": pa.array([row[2] for row in rows], pa.string()),
+            "university": pa.array([row[3] for row in rows], pa.string()),
+            "totalCitations": pa.array([int(row[4]) for row in rows], pa.int64())
+        })
+
+        # Keyword reference lists
+        mysql_utils.execute(mysql_cursor, "SELECT name FROM keyword")
+        counts["keywords"] = _write_table(directory, "keywords", {"name": pa.array([row[0] for row in mysql_cursor.fetchall()], pa.string())})
+    finally:
+        mysql_cursor.close()
+        mysql_conn.close()
+
+    # Keyword x year publication counts and scores, overall (null university) and per
+    # university (keyword trends widget)
+    trends = mysql_utils.trend_index.get()
+    university, keyword, year, publications, scores = trends.cells()
+    counts["keyword_trends"] = _write_table(directory, "keyword_trends", {
+        "university": pa.array(np.array(trends.universities + [None], dtype = object)[university], pa.string()),
+        "keyword": pa.array(np.array(trends.keywords, dtype = object)[keyword], pa.string()),
+        "year": pa.array(year, pa.int32()),
+        "publications": pa.array(publications, pa.int64()),
+        "score": pa.array(scores, pa.float64())
+    })
+
+    counts["keyword_options"] = _write_table(directory, "keyword_options", {"name": pa.array(mysql_utils.get_all_keywords(), pa.string())})
+    counts["universities"] = _write_table(directory, "universities", {"name": pa.array(mongodb_utils.get_all_universities(), pa.string())})
+
+    # KRC per keyword and university (middle right widget), streamed from Neo4j
+    keywords, universities, scores = [], [], []
+    with neo4j_utils.neo4j_driver.session(database = neo4j_utils.db_name) as session:
+        result = session.run("""
+            MATCH (faculty:FACULTY)-[:PUBLISH]->(p:PUBLICATION)-[l:LABEL_BY]->(k:KEYWORD)
+            MATCH (faculty)-[:AFFILIATION_WITH]->(univ:INSTITUTE)
+            RETURN k.name AS keyword, univ.name AS university, SUM(toFloat(l.score) * toInteger(p.numCitations)) AS totalKRC
+            """)
+        for record in result:
+            keywords.append(record["keyword"])
+            universities.append(record["university"])
+            scores.append(record["totalKRC"])
+    counts["krc_scores"] = _write_table(directory, "krc_scores", {
+        "keyword": pa.array(keywords, pa.string()),
+        "university": pa.array(universities, pa.string()),
+        "totalKRC": pa.array(scores, pa.float64())
+    })
+
+    manifest = {
+        "exported_at": started,
+        "export_seconds": round(time.time() - started, 1),
+        "database": mysql_utils.database,
+        "publication_year_range": mongodb_utils.get_publication_year_range(),
+        "rows": counts
+    }
+    with open(os.path.join(directory, MANIFEST), "w") as f:
+        json.dump(manifest, f, indent = 2)
+    return manifest
+
+
+## Serving from a snapshot
+_tables = {}
+_slices = {}
+_manifest = {}
+_keyword_index = keyword_index_utils.KeywordIndex([])
+_similarity_index = None
+_similarity_lock = threading.Lock()
+_trend_index = None
+_trend_lock = threading.Lock()
+_keyword_options = []
+_top_keyword_scores = []
+
+
+def _index(table, key):
+    """
+    Returns {key value: (offset, length)} for a table sorted by key, computed from the
+    run boundaries of the key column without materializing every value.
+    """
+
+    column = table.column(key).combine_chunks()
+    if len(column) == 0:
+        return {}
+    if len(column) == 1:
+        return {column[0].as_py(): (0, 1)}
+    changes = pc.not_equal(column.slice(1), column.slice(0, len(column) - 1))
+    starts = [0] + [i + 1 for i in pc.indices_nonzero(changes).to_pylist()]
+    ends = starts[1:] + [len(column)]
+    values = column.take(pa.array(starts)).to_pylist()
+    return {value: (start, end - start) for value, start, end in zip(values, starts, ends)}
+
+
+# Function to open a snapshot for serving
+def open_snapshot(directory):
+    """
+    Memory-maps every table in a snapshot directory and builds the key indexes.
+
+    Parameters
+    ----------
+    directory : str
+        A directory written by export_snapshot.
+    """
+
+    global _manifest, _keyword_index, _similarity_index, _trend_index, _keyword_options, _top_keyword_scores
+
+    with open(os.path.join(directory, MANIFEST)) as f:
+        _manifest = json.load(f)
+    for name, (key, _) in TABLES.items():
+        source = pa.memory_map(os.path.join(directory, f"{name}.arrow"), "r")
+        _tables[name] = pa.ipc.open_file(source).read_all()
+        _slices[name] = _index(_tables[name], key) if key else None
+
+    _keyword_index = keyword_index_utils.KeywordIndex(_tables["keywords"].column("name").to_pylist())
+    _keyword_options = _tables["keyword_options"].column("name").to_pylist()
+    _similarity_index = None
+    _trend_index = None
+    scores = _tables["university_keyword_scores"]
+    top = pc.select_k_unstable(scores, 10, [("total_keyword_score", "descending")]) if scores.num_rows else []
+    _top_keyword_scores = [(row["university_name"], row["total_keyword_score"]) for row in scores.take(top).to_pylist()] if scores.num_rows else []
+    print(f"Serving snapshot exported at {time.ctime(_manifest['exported_at'])} from {directory}")
+
+
+def manifest():
+    """
+    Returns the manifest of the open snapshot.
+    """
+
+    return _manifest
+
+
+def _rows(name, value):
+    """
+    Returns the rows of a table whose key equals value, as a zero-copy slice.
+    """
+
+    offset, length = _slices[name].get(value, (0, 0))
+    return _tables[name].slice(offset, length)
+
+
+## Read functions with the same signatures as the database utils modules
+@metrics_utils.timed_query("snapshot")
+def get_all_universities():
+    """
+    Returns a list of all universities for dropdown options.
+    """
+
+    return _tables["universities"].column("name").to_pylist()
+
+
+@metrics_utils.timed_query("snapshot")
+def get_publication_year_range():
+    """
+    Returns the [min, max] range of publication years.
+    """
+
+    return _manifest["publication_year_range"]
+
+
+@metrics_utils.timed_query("snapshot")
+def get_citation_ranking(name):
+    """
+    Returns the top 10 faculty of a university by total citations, like mysql_utils.get_citation_ranking.
+    """
+
+    return _rows("faculty_citations", name).slice(0, 10).select(["name", "totalCitations"]).to_pylist()
+
+
+@metrics_utils.timed_query("snapshot")
+def get_impact_ranking(name, metric = "h_index"):
+    """
+    Returns the top 10 faculty of a university by h-index or i10-index, like mysql_utils.get_impact_ranking.
+    """
+
+    if metric not in ("h_index", "i10_index"):
+        raise ValueError("The metric must be h_index or i10_index.")
+    table = _rows("faculty_impact", name)
+    if metric != "h_index":
+        table = table.sort_by([(metric, "descending"), ("totalCitations", "descending")])
+    return table.slice(0, 10).select(["name", "h_index", "i10_index", "totalCitations"]).to_pylist()
+
+
+@metrics_utils.timed_query("snapshot")
+def get_university_impact(name):
+    """
+    Returns the h-index and i10-index of a university, like mysql_utils.get_university_impact.
+    """
+
+    rows = _rows("university_impact", name).select(["h_index", "i10_index", "publications"]).to_pylist()
+    return rows[0] if rows else None
+
+
+@metrics_utils.timed_query("snapshot")
+def top_right_query(universities = None, years = None):
+    """
+    Returns publication counts by university and year, like mongodb_utils.top_right_query.
+    """
+
+    if universities and not all(isinstance(u, str) for u in universities):
+        raise ValueError("All university names must be strings.")
+    if years and not all(isinstance(y, int) for y in years):
+        raise ValueError("All years must be integers.")
+
+    if universities:
+        tables = [_rows("university_year_counts", university) for university in sorted(set(universities))]
+        table = pa.concat_tables(tables) if tables else _tables["university_year_counts"].slice(0, 0)
+    else:
+        table = _tables["university_year_counts"]
+    if years and len(years) == 2:
+        table = table.filter(pc.and_(pc.greater_equal(table["year"], years[0]), pc.less_equal(table["year"], years[1])))
+    return [
+        {"_id": {"university": row["university"], "year": row["year"]}, "university_publications": row["university_publications"]}
+        for row in table.to_pylist()
+    ]
+
+
+@metrics_utils.timed_query("snapshot")
+def validate_keywords(keywords):
+    """
+    Returns the keywords that exist in the keyword table, correcting typos, like
+    mysql_utils.validate_keywords.
+    """
+
+    if not keywords:
+        return []
+    return _keyword_index.resolve(keywords)
+
+
+@metrics_utils.timed_query("snapshot")
+def middle_left_query(keywords = None):
+    """
+    Returns the top 10 universities by keyword score, like mysql_utils.middle_left_query.
+    """
+
+    valid_keywords = validate_keywords(keywords) if keywords else []
+    if keywords and not valid_keywords:
+        return [("No matching keywords found", 0)]
+    if not keywords:
+        return list(_top_keyword_scores)
+
+    table = pa.concat_tables([_rows("university_keyword_scores", keyword) for keyword in valid_keywords])
+    if table.num_rows == 0:
+        return []
+    top = table.take(pc.select_k_unstable(table, 10, [("total_keyword_score", "descending")]))
+    return [(row["university_name"], row["total_keyword_score"]) for row in top.to_pylist()]
+
+
+@metrics_utils.timed_query("snapshot")
+def get_all_keywords():
+    """
+    Returns a list of all keywords for dropdown options.
+    """
+
+    return list(_keyword_options)
+
+
+@metrics_utils.timed_query("snapshot")
+def search_keywords_by_prefix(search_term):
+    """
+    Returns keywords that start with the search term followed by other matches, or the
+    closest match if there are none, like mysql_utils.search_keywords_by_prefix.
+    """
+
+    if not search_term:
+        return []
+    return _keyword_index.suggest(search_term)
+
+
+@metrics_utils.timed_query("snapshot")
+def get_krc(keyword):
+    """
+    Returns the top 10 universities by KRC for a keyword, like neo4j_utils.get_krc.
+    """
+
+    return _rows("krc_scores", keyword).slice(0, 10).select(["university", "totalKRC"]).to_pylist()
+
+
+@metrics_utils.timed_query("snapshot")
+def get_top_faculty(keyword = None, k = 10):
+    """
+    Returns the top k faculty by total citations, overall or among the faculty with a
+    keyword, like leaderboard_utils.get_top_faculty.
+    """
+
+    table = _rows("keyword_top_faculty", keyword) if keyword else _tables["top_faculty"]
+    return table.slice(0, k).select(["id", "name", "university", "totalCitations"]).to_pylist()
+
+
+@metrics_utils.timed_query("snapshot")
+def get_similar_universities(university = None, keywords = None, k = 10):
+    """
+    Returns the universities with the most similar keyword profiles to a university or a
+    set of interest keywords, like mysql_utils.get_similar_universities. The similarity
+    index is built from the keyword scores on first use.
+    """
+
+    global _similarity_index
+    if not university and not keywords:
+        return []
+    with _similarity_lock:
+        if _similarity_index is None:
+            scores = _tables["university_keyword_scores"]
+            _similarity_index = similarity_utils.SimilarityIndex(
+                scores.column("university_name").to_pylist(),
+                scores.column("keyword_name").to_pylist(),
+                scores.column("total_keyword_score").to_numpy()
+            )
+    if university:
+        return _similarity_index.similar_to_university(university, k)
+    return _similarity_index.similar_to_keywords(validate_keywords(keywords), k)
+
+
+@metrics_utils.timed_query("snapshot")
+def get_keyword_trends(university = None, metric = "publications", k = 10):
+    """
+    Returns the rising and declining keywords, like mysql_utils.get_keyword_trends. The
+    trend index is built from the keyword x year cells on first use.
+    """
+
+    global _trend_index
+    with _trend_lock:
+        if _trend_index is None:
+            cells = _tables["keyword_trends"]
+            university_codes, universities = pd.factorize(cells.column("university").to_pandas())
+            keyword_codes, keywords = pd.factorize(cells.column("keyword").to_pandas())
+            _trend_index = trend_utils.TrendIndex(
+                universities, keywords, university_codes, keyword_codes,
+                cells.column("year").to_numpy(), cells.column("publications").to_numpy(), cells.column("score").to_numpy()
+            )
+    return _trend_index.trends(university, metric, k)
+
+
+@metrics_utils.timed_query("snapshot")
+def get_faculty_by_university(university_name):
+    """
+    Returns the faculty of a university, like mysql_utils.get_faculty_by_university.
+    """
+
+    return _rows("faculty", university_name).select(["name", "id"]).to_pylist()
+
+
+@metrics_utils.timed_query("snapshot")
+def search_faculty(university_name, search = None, after = None, limit = 50):
+    """
+    Returns one page of the faculty of a university, like mysql_utils.search_faculty.
+    """
+
+    rows = _rows("faculty", university_name).select(["name", "id"]).to_pylist()
+    if search:
+        term = search.lower()
+        rows = [row for row in rows if row["name"].lower().startswith(term) or f" {term}" in row["name"].lower()]
+    if after:
+        rows = [row for row in rows if (row["name"], row["id"]) > tuple(after)]
+    rows = rows[:limit]
+    return rows, ([rows[-1]["name"], rows[-1]["id"]] if len(rows) == limit else None)
+
+
+@metrics_utils.timed_query("snapshot")
+def search_publications(faculty_id, search = None, after = None, limit = 50):
+    """
+    Publications are only needed to edit them, which a snapshot does not support.
+    """
+
+    return [], None
+
+
+@metrics_utils.timed_query("snapshot")
+def get_similar_faculty(faculty_id, k = 10):
+    """
+    Returns no faculty: snapshots do not include the faculty keyword vectors that
+    collaborator_utils.get_similar_faculty searches.
+    """
+
+    return []
+
+
+@metrics_utils.timed_query("snapshot")
+def get_publications_by_faculty(faculty_id):
+    """
+    Publications are only needed to edit them, which a snapshot does not support.
+    """
+
+    return []
+
+
+@metrics_utils.timed_query("snapshot")
+def get_publication(pub_id):
+    """
+    Publications cannot be edited on a snapshot.
+    """
+
+    return None
+
+
+def get_aggregate_freshness():
+    """
+    Returns the freshness of the snapshot, in the form of mysql_utils.get_aggregate_freshness:
+    every widget is precomputed when the snapshot is exported and never changes.
+    """
+
+    return [{
+        "name": "snapshot",
+        "built_at": _manifest["exported_at"],
+        "mode": "snapshot",
+        "partitions": 1,
+        "row_count": sum(_manifest["rows"].values()),
+        "seconds": _manifest["export_seconds"],
+        "current": True
+    }]
+
+
+## Write functions are not available on a snapshot
+def _read_only(*args, **kwargs):
+    raise ReadOnlySnapshotError("The dashboard is serving a read-only snapshot.")
+
+
+insert_university = delete_university = add_publication = update_publication = delete_publication = _read_only
@@ -0,0 +1,164 @@
+import queue
+from collections import OrderedDict
+from contextlib import contextmanager
+import mysql.connector
+from . import metrics_utils
+
+
+## Statement cache configuration
+# IN lists are padded to the next of these lengths, so that lists of similar length share
+# one prepared statement instead of each length preparing its own
+IN_LIST_SIZES = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+STATEMENTS = metrics_utils.counter(
+    "uri_mysql_prepared_statements_total",
+    "Prepared statement lookups, by result (hit: reused from the connection's cache, miss: prepared on the server).",
+    ("result", )
+)
+
+# Connection errors after which a pooled connection is closed rather than reused
+CONNECTION_ERRORS = (mysql.connector.errors.OperationalError, mysql.connector.errors.InterfaceError)
+
+
+def normalize(query):
+    """
+    Returns the cache key of a statement: its text with every run of whitespace collapsed
+    to one space, so the same query indented differently shares one statement. Statements
+    are expected to pass values as parameters rather than literals.
+    """
+
+    return " ".join(query.split())
+
+
+def in_list(values):
+    """
+    Returns (placeholders, params) for an IN list of values, padded to the next length in
+    IN_LIST_SIZES by repeating the last value, which does not change the result. Lists
+    longer than the largest size are not padded.
+
+    Parameters
+    ----------
+    values : list
+        The values of the IN list, at least one.
+    """
+
+    values = list(values)
+    size = next((size for size in IN_LIST_SIZES if size >= len(values)), len(values))
+    return ", ".join(["%s"] * size), values + values[-1:] * (size - len(values))
+
+
+class StatementCache:
+    """
+    The server-side prepared statements of one connection, keyed by normalized SQL. Each
+    statement keeps its own prepared cursor; beyond capacity the least recently used one is
+    closed, which deallocates it on the server.
+    """
+
+    def __init__(self, connection, capacity):
+        self.connection = connection
+        self.capacity = capacity
+        self.cursors = OrderedDict()
+
+    def get(self, query):
+        """
+        Returns (cursor, statement): a prepared cursor and the statement text to execute on
+        it. The cursor only skips preparing again when given this exact statement object.
+        """
+
+        statement = normalize(query)
+        cached = self.cursors.get(statement)
+        if cached is not None:
+            self.cursors.move_to_end(statement)
+            STATEMENTS.inc(("hit", ))
+            return cached
+
+        STATEMENTS.inc(("miss", ))
+        self.cursors[statement] = (self.connection.cursor(prepared = True), statement)
+        if len(self.cursors) > self.capacity:
+            _, (evicted, _) = self.cursors.popitem(last = False)
+            evicted.close()
+        return self.cursors[statement]
+
+    def close(self):
+        for cursor, _ in self.cursors.values():
+            try:
+                cursor.close()
+            except mysql.connector.Error:
+                pass
+        self.cursors.clear()
+
+
+class ConnectionPool:
+    """
+    Long-lived autocommit connections for read-only queries, each with its own
+    StatementCache, so that a statement is parsed once per connection instead of once per
+    call. A borrowed connection is returned to the pool unless it failed; when every pooled
+    connection is in use a new one is opened, and it is closed on return if the pool is full.
+
+    Parameters
+    ----------
+    connect : callable
+        Opens a new connection.
+    size : int
+        Number of idle connections kept.
+    statement_cache_size : int
+        Number of prepared statements kept per connection.
+    """
+
+    def __init__(self, connect, size, statement_cache_size):
+        self.connect = connect
+        self.size = size
+        self.statement_cache_size = statement_cache_size
+        self.idle = queue.LifoQueue()
+
+    def _open(self):
+        connection = self.connect()
+        # Autocommit, so reads on a reused connection never see an old snapshot
+        connection.autocommit = True
+        return StatementCache(connection, self.statement_cache_size)
+
+    @staticmethod
+    def _close(statements):
+        statements.close()
+        try:
+            statements.connection.close()
+        except mysql.connector.Error:
+            pass
+
+    @contextmanager
+    def statements(self):
+        """
+        Borrows a connection, as its StatementCache.
+        """
+
+        try:
+            statements = self.idle.get_nowait()
+        except queue.Empty:
+            statements = self._open()
+        try:
+            yield statements
+        except CONNECTION_ERRORS:
+            self._close(statements)
+            raise
+        except BaseException:
+            self._release(statements)
+            raise
+        else:
+            self._release(statements)
+
+    def _release(self, statements):
+        if self.idle.qsize() < self.size:
+            self.idle.put(statements)
+        else:
+            self._close(statements)
+
+    def clear(self):
+        """
+        Closes every idle connection.
+        """
+
+        while True:
+            try:
+                self._close(self.idle.get_nowait())
+            except queue.Empty:
+                return
@@ -0,0 +1,336 @@
+import os
+import sys
+import json
+import time
+import queue
+import random
+import threading
+import contextvars
+import urllib.request
+from collections import Counter
+from flask import request, g
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+## Tracing configuration
+# Fraction of Dash callback requests traced; 0 turns tracing off, leaving one context
+# variable lookup per instrumented function
+sample_rate = float(os.getenv("TRACE_SAMPLE_RATE", "0"))
+
+# Spans are sent to a Zipkin-compatible collector if TRACE_COLLECTOR is set, e.g.
+# http://localhost:9411/api/v2/spans, and otherwise appended to TRACE_FILE as one Zipkin
+# JSON span per line
+collector = os.getenv("TRACE_COLLECTOR") or None
+trace_file = os.getenv("TRACE_FILE", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "traces.jsonl"))
+
+SERVICE_NAME = "uri-dashboard"
+
+
+## Profiling configuration
+# Fraction of Dash callback requests profiled. A request is also profiled on demand when
+# it carries an X-URI-Profile: 1 header or a uri_profile=1 cookie and is allowed to see the
+# debug endpoints (see metrics_utils.is_local_request)
+profile_rate = float(os.getenv("PROFILE_RATE", "0"))
+
+# Milliseconds between stack samples, and the directory profiles are written to
+profile_interval = float(os.getenv("PROFILE_INTERVAL_MS", "5")) / 1000
+profile_dir = os.getenv("PROFILE_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "profiles"))
+
+
+## Spans
+_current = contextvars.ContextVar("span", default = None)
+
+# Trace ID -> threads currently running work of the trace, which a profile of the trace
+# samples too
+_trace_threads = {}
+_trace_threads_lock = threading.Lock()
+
+
+class Span:
+    """
+    One timed operation of a trace, the child of the span that was current when it started.
+    Used as a context manager, it is the current span while it runs.
+    """
+
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "tags", "timestamp", "start", "duration", "_token")
+
+    def __init__(self, name, parent = None, tags = None):
+        self.trace_id = parent.trace_id if parent else f"{random.getrandbits(128):032x}"
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent.span_id if parent else None
+        self.name = name
+        self.tags = {key: str(value) for key, value in (tags or {}).items()}
+        self.timestamp = time.time()
+        self.start = time.perf_counter()
+        self.duration = None
+
+    def tag(self, key, value):
+        self.tags[key] = str(value)
+
+    def __enter__(self):
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.tags["error"] = exc_type.__name__
+        self.finish()
+        _current.reset(self._token)
+        return False
+
+    def finish(self):
+        self.duration = time.perf_counter() - self.start
+        _exporter.export(self)
+
+    def to_zipkin(self):
+        span = {
+            "traceId": self.trace_id,
+            "id": self.span_id,
+            "name": self.name,
+            "timestamp": int(self.timestamp * 1e6),
+            "duration": max(int(self.duration * 1e6), 1),
+            "localEndpoint": {"serviceName": SERVICE_NAME},
+            "tags": self.tags
+        }
+        if self.parent_id:
+            span["parentId"] = self.parent_id
+        return span
+
+
+class _NoSpan:
+    """
+    Stands in for a span outside of a sampled trace.
+    """
+
+    def tag(self, key, value):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+# Function to time an operation as part of the current trace
+def span(name, **tags):
+    """
+    Returns a context manager timing an operation as a child of the current span, or doing
+    nothing if no trace is being sampled.
+
+    Parameters
+    ----------
+    name : str
+        The operation, e.g. "query" or "figure".
+    **tags
+        Attributes of the operation, e.g. backend = "mysql".
+    """
+
+    parent = _current.get()
+    if parent is None:
+        return _NO_SPAN
+    return Span(name, parent, tags)
+
+
+def current_trace_id():
+    """
+    Returns the ID of the trace being sampled, or None.
+    """
+
+    parent = _current.get()
+    return parent.trace_id if parent else None
+
+
+def propagate(function):
+    """
+    Returns function bound to the current trace, to run it on another thread (e.g. a thread
+    pool) as part of the same trace.
+    """
+
+    parent = _current.get()
+    if parent is None:
+        return function
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        thread_id = threading.get_ident()
+        with _trace_threads_lock:
+            _trace_threads.setdefault(parent.trace_id, set()).add(thread_id)
+        try:
+            return context.run(function, *args, **kwargs)
+        finally:
+            with _trace_threads_lock:
+                threads = _trace_threads.get(parent.trace_id)
+                if threads is not None:
+                    threads.discard(thread_id)
+                    if not threads:
+                        del _trace_threads[parent.trace_id]
+
+    return run
+
+
+## Export
+class Exporter:
+    """
+    Sends finished spans in batches from a background thread, so a traced request never
+    waits for the file or collector. Spans are dropped while the queue is full.
+    """
+
+    def __init__(self, capacity = 10000, batch_size = 200, flush_interval = 1.0):
+        self.spans = queue.Queue(capacity)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def export(self, span):
+        if self._thread is None:
+            self._start()
+        try:
+            self.spans.put_nowait(span)
+        except queue.Full:
+            pass
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target = self.run, name = "trace-exporter", daemon = True)
+                self._thread.start()
+
+    def run(self):
+        while True:
+            batch = [self.spans.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.spans.get(timeout = max(deadline - time.monotonic(), 0)))
+                except queue.Empty:
+                    break
+            try:
+                self.write([span.to_zipkin() for span in batch])
+            except Exception as e:
+                print("Error exporting trace spans:", e)
+
+    def write(self, spans):
+        if collector:
+            body = json.dumps(spans).encode()
+            http_request = urllib.request.Request(collector, data = body, headers = {"Content-Type": "application/json"}, method = "POST")
+            urllib.request.urlopen(http_request, timeout = 5).close()
+        else:
+            with open(trace_file, "a") as f:
+                f.writelines(json.dumps(span) + "\n" for span in spans)
+
+
+_exporter = Exporter()
+
+
+## Sampling profiler
+class Profiler:
+    """
+    Samples the call stack of a request's thread, and of the threads running work of its
+    trace (see propagate), every profile_interval seconds from a background thread. The
+    samples are written in the folded format read by flamegraph.pl, speedscope and most
+    other flame graph viewers: one "outer;...;inner count" line per stack.
+    """
+
+    def __init__(self, thread_id, trace_id):
+        self.thread_id = thread_id
+        self.trace_id = trace_id
+        self.samples = Counter()
+        self.stop_event = threading.Event()
+        self._thread = threading.Thread(target = self.run, name = "profiler", daemon = True)
+
+    @staticmethod
+    def _frame_name(frame):
+        code = frame.f_code
+        return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+    def run(self):
+        while not self.stop_event.wait(profile_interval):
+            with _trace_threads_lock:
+                workers = set(_trace_threads.get(self.trace_id, ()))
+            frames = sys._current_frames()
+            for thread_id in [self.thread_id, *workers]:
+                frame = frames.get(thread_id)
+                # Worker stacks are rooted at their own frame, next to the request's stack
+                stack = []
+                while frame is not None:
+                    stack.append(self._frame_name(frame))
+                    frame = frame.f_back
+                if stack:
+                    if thread_id != self.thread_id:
+                        stack.append("worker thread")
+                    self.samples[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self, name):
+        """
+        Stops sampling and writes the profile to profile_dir, returning its path.
+        """
+
+        self.stop_event.set()
+        self._thread.join()
+        os.makedirs(profile_dir, exist_ok = True)
+        path = os.path.join(profile_dir, f"{time.strftime('%Y%m%d-%H%M%S')}-{name}.folded")
+        with open(path, "w") as f:
+            f.writelines(f"{stack} {count}\n" for stack, count in self.samples.items())
+        return path
+
+
+## Flask integration
+def _profile_requested():
+    from .metrics_utils import is_local_request
+
+    on_demand = request.headers.get("X-URI-Profile") == "1" or request.cookies.get("uri_profile") == "1"
+    if on_demand and is_local_request():
+        return True
+    return profile_rate > 0 and random.random() < profile_rate
+
+
+def register_tracing(server):
+    """
+    Starts a trace for a sampled fraction of the Dash callback requests on the Flask server,
+    with the callback, query and figure spans inside it, and profiles the requests asked for.
+
+    Parameters
+    ----------
+    server : flask.Flask
+        The Flask server behind the Dash app (app.server).
+    """
+
+    @server.before_request
+    def start_request():
+        if not request.path.endswith("_dash-update-component"):
+            return
+        profile = _profile_requested()
+        if profile or (sample_rate > 0 and random.random() < sample_rate):
+            g.trace_span = Span("request", tags = {"http.path": request.path})
+            g.trace_token = _current.set(g.trace_span)
+        if profile:
+            g.profiler = Profiler(threading.get_ident(), g.trace_span.trace_id).start()
+
+    @server.teardown_request
+    def finish_request(error = None):
+        root = g.pop("trace_span", None)
+        if root is None:
+            return
+        callback = g.get("callback_name")
+        if callback:
+            root.tag("callback", callback)
+        if error is not None:
+            root.tag("error", type(error).__name__)
+        root.finish()
+        _current.reset(g.pop("trace_token"))
+
+        profiler = g.pop("profiler", None)
+        if profiler is not None:
+            path = profiler.stop(f"{callback or 'request'}-{root.trace_id[:16]}")
+            print(f"Wrote the profile of {callback or request.path} to {path}")
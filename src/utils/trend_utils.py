@@ -0,0 +1,197 @@
+import numpy as np
+
+
+## Trend configuration
+# Years in each of the two windows compared, i.e. the last WINDOW years against the
+# WINDOW years before them
+WINDOW = 5
+
+# Fewest publications over both windows for a keyword to be ranked across all universities
+# and within a university, so a keyword going from 1 to 3 publications is not the fastest
+# rising topic
+MIN_PUBLICATIONS = 10
+MIN_UNIVERSITY_PUBLICATIONS = 3
+
+METRICS = ("publications", "citations")
+
+
+## Keyword x year matrices
+class TrendIndex:
+    """
+    Publication counts and citation-weighted scores of every keyword per year, across all
+    universities and per university, with rising and declining keywords ranked from them.
+
+    The across-universities matrices are dense keyword x year arrays. The per-university
+    cells are kept as one sorted array of (university, keyword, year) keys, so the
+    matrices of a university are a contiguous slice scattered with one bincount.
+
+    Parameters
+    ----------
+    universities, keywords : sequences of str
+        Names of the university and keyword codes.
+    university, keyword, year, publications, scores : sequences of equal length
+        One cell per (university code, keyword code, year), with the number of
+        publications labelled with the keyword and the sum of their citations x label
+        score. University code -1 holds the cells across all universities.
+    """
+
+    def __init__(self, universities, keywords, university, keyword, year, publications, scores):
+        self.universities = list(universities)
+        self.keywords = list(keywords)
+        self.position = {name: i for i, name in enumerate(self.universities)}
+        university = np.asarray(university, dtype = np.int64)
+        keyword = np.asarray(keyword, dtype = np.int64)
+        year = np.asarray(year, dtype = np.int64)
+        publications = np.asarray(publications, dtype = np.float64)
+        scores = np.asarray(scores, dtype = np.float64)
+
+        self.first_year = int(year.min()) if len(year) else 0
+        self.n_years = int(year.max()) - self.first_year + 1 if len(year) else 0
+        self.cells_per_university = len(self.keywords) * self.n_years
+        flat = keyword * self.n_years + (year - self.first_year)
+
+        overall = university < 0
+        self.overall = (
+            self._matrix(flat[overall], publications[overall]),
+            self._matrix(flat[overall], scores[overall])
+        )
+        keys = university[~overall] * self.cells_per_university + flat[~overall]
+        order = np.argsort(keys, kind = "stable")
+        self.keys = keys[order]
+        self.publications = publications[~overall][order]
+        self.scores = scores[~overall][order]
+        self._cache = {}
+
+    @classmethod
+    def from_labels(cls, universities, keywords, label_publication, label_keyword, label_year, label_weight, affiliation_publication, affiliation_university):
+        """
+        Aggregates the keyword labels of every publication in one vectorized pass.
+
+        Parameters
+        ----------
+        universities, keywords : sequences of str
+            Names of the university and keyword codes.
+        label_publication, label_keyword, label_year, label_weight : arrays of equal length
+            One row per publication keyword label: publication id, keyword code, publication
+            year and citations x label score.
+        affiliation_publication, affiliation_university : arrays of equal length
+            One row per distinct (publication id, university code) through its authors.
+        """
+
+        label_publication = np.asarray(label_publication, dtype = np.int64)
+        label_keyword = np.asarray(label_keyword, dtype = np.int64)
+        year = np.asarray(label_year, dtype = np.int64)
+        weight = np.asarray(label_weight, dtype = np.float64)
+
+        # Every label once per university its publication is affiliated with
+        order = np.argsort(affiliation_publication, kind = "stable")
+        affiliation_publication = np.asarray(affiliation_publication, dtype = np.int64)[order]
+        affiliation_university = np.asarray(affiliation_university, dtype = np.int64)[order]
+        starts = np.searchsorted(affiliation_publication, label_publication, side = "left")
+        counts = np.searchsorted(affiliation_publication, label_publication, side = "right") - starts
+        label = np.repeat(np.arange(len(label_publication)), counts)
+        offsets = np.arange(len(label)) - np.repeat(np.cumsum(counts) - counts, counts)
+        university = affiliation_university[np.repeat(starts, counts) + offsets]
+
+        # Sum labels sharing a (university, keyword, year) cell
+        first_year = int(year.min()) if len(year) else 0
+        n_years = int(year.max()) - first_year + 1 if len(year) else 1
+        cells = []
+        for codes, rows in ((np.full(len(label_publication), -1), np.arange(len(label_publication))), (university, label)):
+            key = ((codes + 1) * len(keywords) + label_keyword[rows]) * n_years + (year[rows] - first_year)
+            unique, inverse = np.unique(key, return_inverse = True)
+            cells.append((
+                unique // n_years // len(keywords) - 1,
+                unique // n_years % len(keywords),
+                unique % n_years + first_year,
+                np.bincount(inverse, minlength = len(unique)),
+                np.bincount(inverse, weights = weight[rows], minlength = len(unique))
+            ))
+        return cls(universities, keywords, *(np.concatenate(columns) for columns in zip(*cells)))
+
+    def _matrix(self, flat, values):
+        return np.bincount(flat, weights = values, minlength = self.cells_per_university).reshape(len(self.keywords), self.n_years)
+
+    def cells(self):
+        """
+        Returns (university, keyword, year, publications, scores) arrays of every nonzero
+        cell, the inverse of the constructor.
+        """
+
+        keyword, year = np.nonzero(self.overall[0])
+        university = self.keys // max(self.cells_per_university, 1)
+        flat = self.keys % max(self.cells_per_university, 1)
+        return (
+            np.concatenate([np.full(len(keyword), -1), university]),
+            np.concatenate([keyword, flat // self.n_years]),
+            np.concatenate([year, flat % self.n_years]) + self.first_year,
+            np.concatenate([self.overall[0][keyword, year], self.publications]),
+            np.concatenate([self.overall[1][keyword, year], self.scores])
+        )
+
+    def matrices(self, university = None):
+        """
+        Returns the keyword x year (publications, scores) matrices of a university, or
+        across all universities, or None for an unknown university.
+        """
+
+        if not university:
+            return self.overall
+        i = self.position.get(university)
+        if i is None:
+            return None
+        start, stop = np.searchsorted(self.keys, [i * self.cells_per_university, (i + 1) * self.cells_per_university])
+        flat = self.keys[start:stop] - i * self.cells_per_university
+        return self._matrix(flat, self.publications[start:stop]), self._matrix(flat, self.scores[start:stop])
+
+    def trends(self, university = None, metric = "publications", k = 10):
+        """
+        Returns the k fastest rising and declining keywords of a university, or across all
+        universities, by annual growth of their publications or citation-weighted score
+        over the last WINDOW years compared with the WINDOW years before.
+
+        Returns
+        -------
+        dict
+            {"years": [first, last], "rising": [...], "declining": [...]}, each keyword as
+            {"keyword", "growth", "recent", "previous"}, fastest changing first.
+        """
+
+        key = (university or None, metric, k)
+        if key not in self._cache:
+            self._cache[key] = self._trends(university, metric, k)
+        return self._cache[key]
+
+    def _trends(self, university, metric, k):
+        empty = {"years": [], "rising": [], "declining": []}
+        matrices = self.matrices(university)
+        if matrices is None or not self.n_years:
+            return empty
+
+        publications, values = matrices[0], matrices[METRICS.index(metric)]
+        end = self.n_years
+        middle = max(end - WINDOW, 0)
+        start = max(middle - WINDOW, 0)
+        if middle == start:
+            return empty
+        recent = values[:, middle:end].sum(axis = 1)
+        previous = values[:, start:middle].sum(axis = 1)
+
+        # Annual growth between the window means, add-one smoothed for unseen keywords
+        ratio = ((recent + 1) / (end - middle)) / ((previous + 1) / (middle - start))
+        growth = ratio ** (1 / WINDOW) - 1
+        supported = publications[:, start:end].sum(axis = 1) >= (MIN_UNIVERSITY_PUBLICATIONS if university else MIN_PUBLICATIONS)
+
+        def ranked(candidates, descending):
+            candidates = np.flatnonzero(candidates)
+            order = candidates[np.argsort(-growth[candidates] if descending else growth[candidates], kind = "stable")][:k]
+            return [
+                {"keyword": self.keywords[i], "growth": round(float(growth[i]), 4), "recent": round(float(recent[i]), 2), "previous": round(float(previous[i]), 2)}
+                for i in order
+            ]
+
+        return {
+            "years": [self.first_year + start, self.first_year + end - 1],
+            "rising": ranked(supported & (growth > 0), True),
+            "declining": ranked(supported & (growth < 0), False)
+        }
@@ -0,0 +1,15 @@
+"""
+WSGI entry point of the dashboard. Starts the background workers of app.py (edit
+propagation, leaderboard and collaborator updates, index warming and prewarming) in each
+server process and exposes the Flask server of the Dash app as `server`.
+
+Run from the src folder, e.g.
+
+    gunicorn --workers 4 --bind 0.0.0.0:8050 wsgi:server
+"""
+
+import app as dashboard
+
+
+dashboard.start_background_workers()
+server = dashboard.app.server